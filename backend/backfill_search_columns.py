@@ -0,0 +1,34 @@
+"""
+Build the certificate search index and backfill the search columns.
+On Postgres first adds the generated search_vector column (this rewrites the
+certificates table under an exclusive lock, so run it in a maintenance window)
+and builds the search indexes concurrently. Then copies student_name,
+course_name and issue_date out of certificate_data into their own indexed
+columns for certificates created before those columns existed, in batches,
+then rebuilds the SQLite FTS5 index. Safe to re-run (also after VACUUM on
+SQLite).
+
+Usage: python backfill_search_columns.py [--batch-size 1000]
+"""
+import argparse
+import asyncio
+
+from database import init_db, close_db
+from services.certificate_search import certificate_search, BACKFILL_BATCH_SIZE
+
+
+async def backfill(batch_size: int):
+    await init_db()
+    try:
+        await certificate_search.setup_index()
+        updated = await certificate_search.backfill(batch_size)
+    finally:
+        await close_db()
+    print(f"Backfilled {updated} certificates")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(backfill(args.batch_size))
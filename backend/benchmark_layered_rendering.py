@@ -0,0 +1,87 @@
+"""
+Benchmark layered PDF rendering.
+Renders the same rows with a standard render (the whole template laid out
+per certificate) and with render_layered_pdf (the static layer laid out once,
+then only each certificate's values) and reports throughput.
+
+Usage: python benchmark_layered_rendering.py [--template luxury_marble_template.html] [--rows 64]
+"""
+import argparse
+import time
+from pathlib import Path
+
+from config import get_settings
+from services.certificate_service import rendering_service
+from services.layered_rendering import strip_variable_markers
+from services.render_metrics import render_metrics
+
+settings = get_settings()
+
+
+def sample_rows(count: int) -> list:
+    """Rows with varying names so every certificate differs."""
+    return [
+        {
+            'student_name': f'Student Number {i + 1}',
+            'course_name': 'Sample Course Certificate',
+            'issue_date': '2026-01-20',
+            'certificate_id': f'BENCH-{i + 1:05d}',
+            'issuing_authority': 'NetworkersHome',
+            'signature_name': 'Director',
+            'logo_url': None,
+            'signature_image_url': None
+        }
+        for i in range(count)
+    ]
+
+
+def benchmark(template_file: str, rows: int):
+    html_path = Path(settings.TEMPLATES_PATH) / template_file
+    html_content = html_path.read_text(encoding='utf-8')
+    documents = [
+        rendering_service.render_document(html_content, row, template_id=html_path.stem, layered=True)
+        for row in sample_rows(rows)
+    ]
+    css, stylesheet_key = documents[0].css, documents[0].stylesheet_key
+
+    def standard(document):
+        rendering_service.render_pdf(strip_variable_markers(document.html), css, stylesheet_key)
+
+    def layered(document):
+        rendering_service.render_layered_pdf(document.html, css, stylesheet_key, document.layer_key)
+
+    # Warm-up: fonts, parsed stylesheet and the cached static layer
+    standard(documents[0])
+    layered(documents[0])
+    render_metrics.drain()
+
+    print(f"Template {template_file}, {rows} rows\n")
+    header = f"{'mode':>10}{'seconds':>12}{'certs/sec':>12}{'ms/cert':>12}{'speedup':>10}"
+    print(header)
+    print("-" * len(header))
+
+    baseline = None
+    for mode, render in (('standard', standard), ('layered', layered)):
+        start = time.perf_counter()
+        for document in documents:
+            render(document)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{mode:>10}{elapsed:>12.2f}{rows / elapsed:>12.1f}"
+              f"{elapsed * 1000 / rows:>12.1f}{baseline / elapsed:>9.2f}x")
+
+    stages = render_metrics.stats()
+    print()
+    for stage in ("layered_hit", "layered_fallback", "layered_unsupported", "variable_layout", "layer_merge"):
+        if stage in stages:
+            print(f"{stage:>20}: {stages[stage]['count']} x {stages[stage]['avg_ms']} ms")
+    if "layered_hit" not in stages:
+        print("Warning: no certificate used the variable layer (see the log for why the template is unsupported)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--template', default='luxury_marble_template.html')
+    parser.add_argument('--rows', type=int, default=64)
+    args = parser.parse_args()
+    benchmark(args.template, args.rows)
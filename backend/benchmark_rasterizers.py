@@ -0,0 +1,101 @@
+"""
+Benchmark PDF rasterizer backends on the bundled templates.
+Renders each template to PDF once, then times every available
+rasterizer converting that PDF to an image.
+
+Usage: python benchmark_rasterizers.py [--dpi 300] [--iterations 5]
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from config import get_settings
+from services.certificate_service import rendering_service
+from services.rasterizers import RASTERIZERS
+
+settings = get_settings()
+
+# Sample data used to fill every template
+SAMPLE_DATA = {
+    'student_name': 'John Doe',
+    'course_name': 'Sample Course Certificate',
+    'issue_date': '2026-01-20',
+    'certificate_id': 'BENCH-001',
+    'issuing_authority': 'NetworkersHome',
+    'signature_name': 'Director',
+    'logo_url': None,
+    'signature_image_url': None
+}
+
+
+def load_backends() -> dict:
+    """Instantiate every rasterizer whose dependencies are installed."""
+    backends = {}
+    for name, backend_cls in RASTERIZERS.items():
+        try:
+            backends[name] = backend_cls()
+        except ImportError as e:
+            print(f"  [SKIP] {name}: {e}")
+    return backends
+
+
+def render_template_pdfs(templates_dir: Path) -> dict:
+    """Render every bundled template to PDF bytes."""
+    pdfs = {}
+    for html_file in sorted(templates_dir.glob('*.html')):
+        html = rendering_service.render_html(html_file.read_text(encoding='utf-8'), SAMPLE_DATA)
+        pdfs[html_file.stem] = rendering_service.render_pdf(html)
+    return pdfs
+
+
+def benchmark(dpi: int, iterations: int):
+    templates_dir = Path(settings.TEMPLATES_PATH)
+    backends = load_backends()
+    if not backends:
+        print("No rasterizer backends available")
+        return
+
+    print(f"Rendering templates from {templates_dir.absolute()}...")
+    pdfs = render_template_pdfs(templates_dir)
+    print(f"Benchmarking {len(pdfs)} templates at {dpi} DPI, {iterations} iterations each\n")
+
+    timings = {name: [] for name in backends}
+    header = f"{'template':<40}" + "".join(f"{name + ' (ms)':>18}" for name in backends)
+    print(header)
+    print("-" * len(header))
+
+    for template_name, pdf_bytes in pdfs.items():
+        row = f"{template_name:<40}"
+        for name, backend in backends.items():
+            # Warm-up run (loads libraries, fills OS caches)
+            backend.rasterize(pdf_bytes, dpi)
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                backend.rasterize(pdf_bytes, dpi)
+                samples.append((time.perf_counter() - start) * 1000)
+            median = statistics.median(samples)
+            timings[name].append(median)
+            row += f"{median:>18.1f}"
+        print(row)
+
+    print("-" * len(header))
+    summary = f"{'median of medians':<40}" + "".join(
+        f"{statistics.median(values):>18.1f}" for values in timings.values()
+    )
+    print(summary)
+
+    if len(timings) > 1:
+        baseline = statistics.median(timings['pdf2image']) if 'pdf2image' in timings else None
+        for name, values in timings.items():
+            if baseline and name != 'pdf2image':
+                print(f"{name} speedup vs pdf2image: {baseline / statistics.median(values):.2f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.dpi, args.iterations)
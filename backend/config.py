@@ -47,12 +47,19 @@ class Settings(BaseSettings):
     OTP_RATE_LIMIT_MINUTES: int = 15
     
     # Storage
-    STORAGE_TYPE: str = "local"  # "local", "s3", or "supabase"
+    STORAGE_TYPE: str = "local"  # "local", "s3", "supabase", or "memory" (in-process fake for tests)
     STORAGE_PATH: str = "./storage"
+    STORAGE_CONCURRENCY: int = 16  # Storage requests in flight per process (also the HTTP connection pool size)
+    STORAGE_RETRIES: int = 3  # Retries after a connection error, 429 or 5xx
+    STORAGE_RETRY_BACKOFF_SECONDS: float = 0.5  # First retry delay; doubles on each retry
+    STORAGE_TIMEOUT_SECONDS: float = 60.0  # Per storage HTTP request
     S3_BUCKET: Optional[str] = None
     S3_ACCESS_KEY: Optional[str] = None
     S3_SECRET_KEY: Optional[str] = None
-    S3_ENDPOINT: Optional[str] = None
+    S3_ENDPOINT: Optional[str] = None  # Unset for AWS; e.g. http://localhost:9000 for MinIO
+    S3_REGION: Optional[str] = None  # Signing region; us-east-1 when unset
+    S3_ADDRESSING_STYLE: str = "auto"  # "path" for MinIO and most self-hosted stores, or "virtual"
+    S3_MULTIPART_PART_SIZE_MB: int = 8  # Larger files are uploaded in parts of this size (min 5)
     # Supabase Storage
     SUPABASE_STORAGE_BUCKET: Optional[str] = Field(
         default="certificates",
@@ -62,9 +69,36 @@ class Settings(BaseSettings):
         default=None,
         description="Supabase service role key for storage operations"
     )
+    SUPABASE_STORAGE_PUBLIC: bool = True  # False for a private bucket: download URLs are signed
     
     # Templates
     TEMPLATES_PATH: str = "./templates"
+    TEMPLATE_CACHE_SIZE: int = 64  # Max compiled Jinja templates kept in memory
+    
+    # Render worker pool (WeasyPrint / rasterization run off the event loop)
+    RENDER_POOL_SIZE: int = 2  # Worker processes; 0 renders in threads instead
+    RENDER_QUEUE_DEPTH: int = 16  # Tasks allowed to wait for a free worker
+    RENDER_TASK_TIMEOUT: int = 90  # Seconds per render task (keep below gunicorn --timeout)
+    RENDER_BATCH_SIZE: int = 8  # Bulk certificates rendered per WeasyPrint document; 1 disables batching
+    BULK_RENDER_CONCURRENCY: int = 4  # Concurrent render batches per bulk request
+    BULK_RENDER_GLOBAL_CONCURRENCY: int = 8  # Concurrent render batches across all bulk requests in a process
+    BULK_ZIP_COMPRESSION_LEVEL: int = 6  # Deflate level (1-9) for compressible ZIP entries; 0 stores every file
+    ZIP_DOWNLOAD_PREFETCH: int = 8  # Files fetched from storage ahead of a streamed ZIP download
+    ZIP_DOWNLOAD_MAX_CERTIFICATES: int = 10000  # Max certificates per streamed ZIP download
+    RASTERIZER_BACKEND: str = "pdfium"  # "pdfium" (in-process) or "pdf2image" (poppler subprocess)
+    RASTER_FAST_PATH: bool = True  # Image-only output of layered templates skips the per-certificate PDF
+    RASTER_CACHE_SIZE: int = 4  # Cached template backgrounds per worker (~25MB each at 300 DPI)
+    
+    # Background bulk jobs (database-backed queue, no external broker)
+    BULK_JOB_WORKERS: int = 1  # Jobs processed concurrently per app process; 0 disables the runner
+    BULK_JOB_MAX_ROWS: int = 50000  # Max rows per bulk job
+    BULK_JOB_POLL_SECONDS: float = 2.0  # Idle workers check for queued jobs this often
+    BULK_JOB_STALE_SECONDS: int = 300  # Jobs without a heartbeat this long are resumed by another worker
+    BULK_JOB_INPUT_IDLE_SECONDS: int = 900  # A streamed upload sending no rows this long is treated as abandoned
+    
+    # Admin statistics (counters maintained on every change)
+    STATS_RECONCILE_SECONDS: int = 3600  # Recount totals and recent daily stats this often; 0 disables
+    STATS_RECONCILE_DAYS: int = 2  # Days of daily stats rebuilt by each reconciliation
     
     # CORS
     CORS_ORIGINS: str = "*"
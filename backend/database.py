@@ -62,6 +62,31 @@ class Base(DeclarativeBase):
     pass
 
 
+def dialect_insert():
+    """insert() with ON CONFLICT support for the configured database, or None"""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+# Escape character for LIKE patterns built by contains_pattern
+LIKE_ESCAPE = "\\"
+
+
+def contains_pattern(value: str) -> str:
+    """
+    LIKE pattern matching value anywhere in a column, with the wildcards in
+    value escaped. Pass escape=LIKE_ESCAPE to like()/ilike().
+    """
+    for char in (LIKE_ESCAPE, "%", "_"):
+        value = value.replace(char, LIKE_ESCAPE + char)
+    return f"%{value}%"
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency that provides database session.
@@ -95,40 +120,96 @@ async def get_db_context() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+async def _create_index(name: str, definition: str) -> bool:
+    """
+    Create an index if missing. On Postgres it is built CONCURRENTLY (outside a
+    transaction), so building it on a large existing table doesn't block writes.
+    """
+    from sqlalchemy import text
+    try:
+        if engine.dialect.name == "postgresql":
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+        else:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}"))
+        return True
+    except Exception as e:
+        print(f"Warning: Could not create index {name}: {e}")
+        if engine.dialect.name == "postgresql":
+            # A failed concurrent build leaves an invalid index that IF NOT EXISTS would skip forever
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            except Exception:
+                pass
+        return False
+
+
 async def init_db():
     """Initialize database tables and run manual migrations."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     
-    # Manual migration for missing columns (since create_all doesn't alter existing tables)
-    # This is idempotent (ADD COLUMN IF NOT EXISTS)
+    # Manual migration for missing columns (since create_all doesn't alter existing tables).
+    # Each statement runs in its own transaction: on Postgres a failed statement
+    # (e.g. a column that already exists) aborts the transaction it runs in.
     from sqlalchemy import text
-    async with engine.connect() as conn:
+    # Postgres adds columns with IF NOT EXISTS; SQLite doesn't support it in ALTER TABLE,
+    # so there adding an existing column fails with "duplicate column name" and is skipped
+    statements = [
+        "ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT FALSE",
+        "ALTER TABLE users ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP",
+        "ALTER TABLE certificates ADD COLUMN is_revoked BOOLEAN DEFAULT FALSE",
+        "ALTER TABLE certificates ADD COLUMN revoked_at TIMESTAMP WITH TIME ZONE",
+        "ALTER TABLE certificates ADD COLUMN revoked_by UUID",
+        "ALTER TABLE certificates ADD COLUMN revoke_reason TEXT",
+        "ALTER TABLE templates ADD COLUMN render_mode VARCHAR(20) DEFAULT 'standard'",
+        "ALTER TABLE certificates ADD COLUMN student_name VARCHAR(255)",
+        "ALTER TABLE certificates ADD COLUMN course_name VARCHAR(255)",
+        "ALTER TABLE certificates ADD COLUMN issue_date VARCHAR(20)"
+    ]
+    # Indexes for existing tables, (name, definition); keyset paging relies on the (created_at, id) ones
+    indexes = [
+        ("idx_certificates_created", "certificates (created_at, id)"),
+        ("idx_users_created", "users (created_at, id)"),
+        ("idx_certificates_user_created", "certificates (user_id, created_at, id)"),
+        ("idx_certificates_issue_date", "certificates (issue_date)"),
+    ]
+    
+    if engine.dialect.name == "postgresql":
+        statements = [stmt.replace(" ADD COLUMN ", " ADD COLUMN IF NOT EXISTS ") for stmt in statements]
+    
+    failed = 0
+    for stmt in statements:
         try:
-            # Sync users table
-            # SQLite doesn't support IF NOT EXISTS in ALTER TABLE
-            # We run each statement in a try/except block
-            statements = [
-                "ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT FALSE",
-                "ALTER TABLE users ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP",
-                "ALTER TABLE certificates ADD COLUMN is_revoked BOOLEAN DEFAULT FALSE",
-                "ALTER TABLE certificates ADD COLUMN revoked_at TIMESTAMP WITH TIME ZONE",
-                "ALTER TABLE certificates ADD COLUMN revoked_by UUID",
-                "ALTER TABLE certificates ADD COLUMN revoke_reason TEXT"
-            ]
-            
-            for stmt in statements:
-                try:
-                    await conn.execute(text(stmt))
-                except Exception:
-                    # Column likely already exists
-                    pass
-            
-            await conn.commit()
-            print("Database schema synchronization complete")
+            async with engine.begin() as conn:
+                await conn.execute(text(stmt))
         except Exception as e:
-            await conn.rollback()
-            print(f"Warning: Manual migration failed: {e}")
+            if "duplicate column" in str(e).lower():
+                continue
+            failed += 1
+            print(f"Warning: Migration statement failed: {stmt}: {e}")
+    
+    for name, definition in indexes:
+        if not await _create_index(name, definition):
+            failed += 1
+    try:
+        async with engine.begin() as conn:
+            # Prefix of idx_certificates_user_created
+            await conn.execute(text("DROP INDEX IF EXISTS idx_certificates_user"))
+    except Exception as e:
+        print(f"Warning: Could not drop idx_certificates_user: {e}")
+    
+    if failed:
+        print(f"Database schema synchronization finished with {failed} failed statements")
+    else:
+        print("Database schema synchronization complete")
+    
+    # Full-text search index (FTS5 on SQLite, tsvector + trigram on Postgres)
+    from services.certificate_search import certificate_search
+    await certificate_search.ensure_index()
 
 
 async def close_db():
@@ -2,9 +2,9 @@
 SQLAlchemy ORM Models for Certificate Generation System
 """
 
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from typing import Optional
-from sqlalchemy import String, Boolean, DateTime, Integer, Text, ForeignKey, Index, CheckConstraint, JSON, UUID
+from sqlalchemy import String, Boolean, Date, DateTime, Integer, BigInteger, Text, ForeignKey, Index, CheckConstraint, JSON, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import uuid
 
@@ -51,6 +51,7 @@ class User(Base):
         CheckConstraint("email IS NOT NULL OR phone IS NOT NULL", name="chk_contact_method"),
         Index("idx_users_email", "email"),
         Index("idx_users_phone", "phone"),
+        Index("idx_users_created", "created_at", "id"),  # keyset pagination
     )
 
 
@@ -102,6 +103,8 @@ class Template(Base):
     html_content: Mapped[str] = mapped_column(Text, nullable=False)
     css_content: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     thumbnail_url: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    # "standard" or "layered" (static layer rendered once, variable text composited per certificate)
+    render_mode: Mapped[str] = mapped_column(String(20), default="standard")
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_by: Mapped[Optional[uuid.UUID]] = mapped_column(
         UUID(as_uuid=True),
@@ -147,6 +150,10 @@ class Certificate(Base):
         nullable=True
     )
     certificate_data: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # Copies of certificate_data fields for search (see services/certificate_search.py)
+    student_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    course_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    issue_date: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)  # YYYY-MM-DD
     pdf_path: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     png_path: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     jpg_path: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
@@ -180,8 +187,40 @@ class Certificate(Base):
     
     __table_args__ = (
         CheckConstraint("status IN ('pending', 'generated', 'failed')", name="chk_status"),
-        Index("idx_certificates_user", "user_id"),
+        Index("idx_certificates_user_created", "user_id", "created_at", "id"),  # history pages, per-user counts
         Index("idx_certificates_status", "status"),
+        Index("idx_certificates_created", "created_at", "id"),  # keyset pagination
+        Index("idx_certificates_issue_date", "issue_date"),
+    )
+
+
+class CertificateIdCounter(Base):
+    """Next sequential certificate ID number (NH-YYYY-NNNNN) per year"""
+    __tablename__ = "certificate_id_counters"
+    
+    year: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    next_value: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+
+
+class StatCounter(Base):
+    """Running total behind /admin/stats, updated in the same transaction as the change it counts"""
+    __tablename__ = "stat_counters"
+    
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class DailyCertificateStat(Base):
+    """Certificates generated per UTC day, per template and per user"""
+    __tablename__ = "daily_certificate_stats"
+    
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    dimension: Mapped[str] = mapped_column(String(20), primary_key=True)  # template, user
+    subject_id: Mapped[str] = mapped_column(String(36), primary_key=True)  # template or user UUID
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        CheckConstraint("dimension IN ('template', 'user')", name="chk_daily_stat_dimension"),
     )
 
 
@@ -205,3 +244,74 @@ class RateLimit(Base):
     __table_args__ = (
         Index("idx_rate_limits_lookup", "identifier", "action_type", "window_start"),
     )
+
+
+class BulkJob(Base):
+    """Background bulk generation job"""
+    __tablename__ = "bulk_jobs"
+    
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4
+    )
+    user_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="SET NULL"),
+        nullable=True
+    )
+    template_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("templates.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    status: Mapped[str] = mapped_column(String(20), default="queued")
+    output_formats: Mapped[list] = mapped_column(JSON, nullable=False)
+    options: Mapped[dict] = mapped_column(JSON, default=dict)  # combined_pdf, combined_pdf_nup
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    processed: Mapped[int] = mapped_column(Integer, default=0)
+    successful: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    input_complete: Mapped[bool] = mapped_column(Boolean, default=True)  # False while rows are still arriving
+    zip_url: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    combined_pdf_url: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    claimed_by: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc)
+    )
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        CheckConstraint("status IN ('queued', 'running', 'completed', 'failed')", name="chk_bulk_job_status"),
+        Index("idx_bulk_jobs_status", "status", "created_at"),
+        Index("idx_bulk_jobs_user", "user_id"),
+    )
+
+
+class BulkJobItem(Base):
+    """One input row of a bulk job"""
+    __tablename__ = "bulk_job_items"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    job_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("bulk_jobs.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    row_index: Mapped[int] = mapped_column(Integer, nullable=False)
+    line_number: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # CSV or NDJSON line, for error reports
+    certificate_id: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    certificate_data: Mapped[dict] = mapped_column(JSON, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    download_urls: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    
+    __table_args__ = (
+        CheckConstraint("status IN ('pending', 'done', 'failed')", name="chk_bulk_job_item_status"),
+        Index("idx_bulk_job_items_row", "job_id", "row_index", unique=True),
+        Index("idx_bulk_job_items_status", "job_id", "status"),
+    )
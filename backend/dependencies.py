@@ -212,6 +212,7 @@ async def get_current_user(
     try:
         from database import async_session
         from db_models import User
+        from services.stats import stats_service
         from sqlalchemy import select
         import uuid
         
@@ -236,6 +237,7 @@ async def get_current_user(
                     is_admin=should_be_admin
                 )
                 db.add(new_user)
+                stats_service.user_created(db)
                 await db.commit()
                 print(f"Auto-created user: {user_id} (Admin: {should_be_admin})")
             elif should_be_admin and not existing_user.is_admin:
@@ -12,6 +12,10 @@ from fastapi.responses import JSONResponse
 from routers import auth, templates, certificates, uploads, admin, users
 from database import init_db, close_db
 from config import get_settings
+from services.render_pool import render_pool
+from services.bulk_jobs import bulk_job_runner
+from services.stats import stats_reconciler
+from services.storage import storage_backend
 
 settings = get_settings()
 
@@ -29,6 +33,9 @@ async def lifespan(app: FastAPI):
     Path(settings.TEMPLATES_PATH).mkdir(parents=True, exist_ok=True)
     Path(settings.STORAGE_PATH + "/uploads").mkdir(parents=True, exist_ok=True)
     
+    # Start render workers before seeding so they warm up in parallel
+    await render_pool.start()
+    
     # Auto-seed templates if none exist
     try:
         from seed_templates import seed_templates_if_empty
@@ -44,12 +51,22 @@ async def lifespan(app: FastAPI):
         # However, for now, we'll just log it clearly. In a stricter environment, we'd raise an exception.
         # raise RuntimeError("Insecure JWT_SECRET_KEY in production")
     
+    # Background bulk jobs (also resumes jobs left unfinished by a previous run)
+    await bulk_job_runner.start()
+    
+    # Periodic recount of the admin statistics counters
+    await stats_reconciler.start()
+    
     print("Certificate Generation System started")
     
     yield
     
     # Shutdown
     print("Shutting down...")
+    await stats_reconciler.shutdown()
+    await bulk_job_runner.shutdown()
+    await render_pool.shutdown()
+    await storage_backend.close()
     await close_db()
     print("Certificate Generation System stopped")
 
@@ -157,54 +174,35 @@ async def health_check():
 @app.get("/health/storage", tags=["Health"])
 async def health_check_storage():
     """Health check for storage connection."""
-    from config import get_settings
-    from pathlib import Path
-    
-    settings = get_settings()
-    
     try:
-        if settings.STORAGE_TYPE == "supabase":
-            # Test Supabase Storage connection
-            from supabase import create_client
-            
-            if not settings.SUPABASE_URL or not settings.SUPABASE_SERVICE_ROLE_KEY:
-                return {
-                    "status": "unhealthy",
-                    "storage_type": "supabase",
-                    "error": "SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY not set"
-                }
-            
-            supabase = create_client(
-                settings.SUPABASE_URL,
-                settings.SUPABASE_SERVICE_ROLE_KEY
-            )
-            bucket_name = settings.SUPABASE_STORAGE_BUCKET or "certificates"
-            
-            # Try to list files (this will fail if bucket doesn't exist or no access)
-            files = supabase.storage.from_(bucket_name).list()
-            return {
-                "status": "healthy",
-                "storage_type": "supabase",
-                "bucket": bucket_name,
-                "connected": True
-            }
-        else:
-            # Local storage - just check if directory exists
-            storage_path = Path(settings.STORAGE_PATH)
-            return {
-                "status": "healthy",
-                "storage_type": "local",
-                "path": str(storage_path),
-                "exists": storage_path.exists()
-            }
+        return {
+            "status": "healthy",
+            "storage_type": storage_backend.name,
+            **(await storage_backend.check())
+        }
     except Exception as e:
         return {
             "status": "unhealthy",
-            "storage_type": settings.STORAGE_TYPE,
+            "storage_type": storage_backend.name,
             "error": str(e)
         }
 
 
+@app.get("/health/render", tags=["Health"])
+async def health_check_render():
+    """Rendering cache, worker pool and per-stage timing statistics."""
+    from services.certificate_service import rendering_service
+    from services.render_metrics import render_metrics
+    
+    return {
+        "status": "healthy",
+        "template_cache": rendering_service.get_template_cache_stats(),
+        "render_pool": render_pool.stats(),
+        "bulk_jobs": bulk_job_runner.stats(),
+        "timings": render_metrics.stats()
+    }
+
+
 @app.get("/", tags=["Root"])
 async def root():
     """Root endpoint with API information."""
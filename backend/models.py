@@ -3,7 +3,7 @@ Pydantic Models for Certificate Generation System
 Request and Response models for all API endpoints
 """
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List, Any
 from pydantic import BaseModel, EmailStr, Field, HttpUrl
 from enum import Enum
@@ -24,6 +24,13 @@ class CertificateStatus(str, Enum):
     FAILED = "failed"
 
 
+class BulkJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
 class OutputFormat(str, Enum):
     PDF = "pdf"
     PNG = "png"
@@ -154,7 +161,10 @@ class BulkGenerateRequest(BaseModel):
     """Request model for bulk certificate generation"""
     template_id: str
     certificates: List[CertificateInput]
-    output_formats: List[OutputFormat] = [OutputFormat.PDF]
+    output_formats: List[OutputFormat] = [OutputFormat.PDF]  # May be empty when combined_pdf is set
+    combined_pdf: bool = False  # Also write every certificate into one print-ready PDF
+    combined_pdf_nup: int = Field(1, ge=1, le=16)  # Certificates per sheet in the combined PDF
+    zip_compression_level: Optional[int] = Field(None, ge=0, le=9)  # ZIP deflate level; 0 stores every file, unset uses BULK_ZIP_COMPRESSION_LEVEL
 
 
 class BulkCertificateResult(BaseModel):
@@ -163,6 +173,7 @@ class BulkCertificateResult(BaseModel):
     success: bool
     error: Optional[str] = None
     download_urls: Optional[dict[str, str]] = None
+    line_number: Optional[int] = None  # CSV line of the row, for CSV uploads
 
 
 class BulkGenerateResponse(BaseModel):
@@ -173,6 +184,53 @@ class BulkGenerateResponse(BaseModel):
     failed: int
     results: List[BulkCertificateResult]
     zip_download_url: Optional[str] = None
+    combined_pdf_url: Optional[str] = None
+
+
+class BulkJobResponse(BaseModel):
+    """Response model for a submitted background bulk job"""
+    job_id: str
+    status: BulkJobStatus
+    total: int
+    status_url: str
+
+
+class BulkJobError(BaseModel):
+    """A failed row of a bulk job"""
+    row: int
+    line_number: Optional[int] = None  # Input line, for CSV and NDJSON submissions
+    certificate_id: Optional[str] = None
+    error: str
+
+
+class BulkJobStatusResponse(BaseModel):
+    """Progress and outputs of a background bulk job"""
+    job_id: str
+    status: BulkJobStatus
+    total: int
+    processed: int
+    successful: int
+    failed: int
+    progress: float  # 0.0 - 1.0
+    input_complete: bool
+    zip_download_url: Optional[str] = None
+    combined_pdf_url: Optional[str] = None
+    error: Optional[str] = None
+    errors: List[BulkJobError] = []  # First failed rows
+    results: Optional[List[BulkCertificateResult]] = None  # Only when include_results is set
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+class CertificateZipRequest(BaseModel):
+    """Certificates to download as one ZIP: the listed IDs, or the history filters"""
+    certificate_ids: Optional[List[str]] = Field(None, max_length=1000)
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    template_id: Optional[str] = None
+    course: Optional[str] = None
+    formats: Optional[List[OutputFormat]] = None  # Default: every stored format
 
 
 # ============================================
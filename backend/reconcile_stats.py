@@ -0,0 +1,32 @@
+"""
+Recount the admin statistics.
+Rebuilds stat_counters from the certificates and users tables and the daily
+per-template / per-user rows of the last --days days. The app does this for
+the last STATS_RECONCILE_DAYS days every STATS_RECONCILE_SECONDS; run this
+script once with a long window to backfill history after upgrading.
+
+Usage: python reconcile_stats.py [--days 365]
+"""
+import argparse
+import asyncio
+
+from database import init_db, close_db
+from services.stats import stats_service
+
+
+async def reconcile(days: int):
+    await init_db()
+    try:
+        result = await stats_service.reconcile(days)
+    finally:
+        await close_db()
+    print(f"Certificates: {result['certificates_total']} ({result['certificates_revoked']} revoked)")
+    print(f"Users: {result['users_total']}")
+    print(f"Daily rows written for the last {days} days: {result['daily_rows']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+    asyncio.run(reconcile(args.days))
@@ -3,10 +3,11 @@ Admin Router - Certificate Management
 Provides endpoints for admin users to view and revoke certificates
 """
 
-from datetime import datetime, timezone
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, func
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
@@ -14,6 +15,9 @@ from database import get_db
 from db_models import Certificate, User, Template
 from routers.certificates import get_current_user
 from services.certificate_service import storage_service
+from services.certificate_search import certificate_search
+from services.pagination import keyset_page, next_page_cursor
+from services.stats import CERTIFICATES_REVOKED, CERTIFICATES_TOTAL, USERS_TOTAL, stats_service
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -46,6 +50,21 @@ class AdminStatsResponse(BaseModel):
     total_users: int
 
 
+class DailyGenerationCount(BaseModel):
+    day: date
+    subject_id: str
+    name: Optional[str]  # Template name or user email
+    count: int
+
+
+class DailyAnalyticsResponse(BaseModel):
+    group_by: str
+    start: date
+    end: date
+    total: int
+    days: List[DailyGenerationCount]
+
+
 async def get_admin_user(
     db: AsyncSession = Depends(get_db),
     current_user: str = Depends(get_current_user)
@@ -96,121 +115,227 @@ async def get_admin_stats(
     db: AsyncSession = Depends(get_db),
     admin: User = Depends(get_admin_user)
 ):
-    """Get admin dashboard statistics."""
-    # Total certificates
-    total_result = await db.execute(select(func.count(Certificate.id)))
-    total_certificates = total_result.scalar() or 0
-    
-    # Revoked certificates
-    revoked_result = await db.execute(
-        select(func.count(Certificate.id)).where(Certificate.is_revoked == True)
-    )
-    revoked_certificates = revoked_result.scalar() or 0
-    
-    # Active certificates
-    active_certificates = total_certificates - revoked_certificates
-    
-    # Total users
-    users_result = await db.execute(select(func.count(User.id)))
-    total_users = users_result.scalar() or 0
+    """Get admin dashboard statistics (maintained counters, no table scans)."""
+    counters = await stats_service.get_counters(db)
+    total_certificates = counters[CERTIFICATES_TOTAL]
+    revoked_certificates = counters[CERTIFICATES_REVOKED]
     
     return AdminStatsResponse(
         total_certificates=total_certificates,
-        active_certificates=active_certificates,
+        active_certificates=total_certificates - revoked_certificates,
         revoked_certificates=revoked_certificates,
-        total_users=total_users
+        total_users=counters[USERS_TOTAL]
+    )
+
+
+@router.get("/analytics/daily", response_model=DailyAnalyticsResponse)
+async def get_daily_analytics(
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+    group_by: str = Query("template", pattern="^(template|user)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    subject_id: Optional[str] = None
+):
+    """
+    Certificates generated per UTC day, per template or per user.
+    Defaults to the last 30 days; ranges are limited to 366 days.
+    """
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end or (end - start).days > 365:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end and the range at most 366 days"
+        )
+    
+    stats = await stats_service.get_daily(db, group_by, start, end, subject_id)
+    
+    # Names for the subjects in the result, in one query
+    subject_ids = set()
+    for stat in stats:
+        try:
+            subject_ids.add(uuid.UUID(stat.subject_id))
+        except ValueError:
+            pass
+    names = {}
+    if subject_ids:
+        model, name_column = (Template, Template.name) if group_by == "template" else (User, User.email)
+        result = await db.execute(select(model.id, name_column).where(model.id.in_(subject_ids)))
+        names = {str(subject): name for subject, name in result.all()}
+    
+    return DailyAnalyticsResponse(
+        group_by=group_by,
+        start=start,
+        end=end,
+        total=sum(stat.count for stat in stats),
+        days=[
+            DailyGenerationCount(
+                day=stat.day,
+                subject_id=stat.subject_id,
+                name=names.get(stat.subject_id),
+                count=stat.count
+            )
+            for stat in stats
+        ]
+    )
+
+
+def _certificate_list_query():
+    """
+    One query for a page of certificates: names come from joins, display
+    fields from the search columns (or the JSON for rows not backfilled yet).
+    """
+    data = Certificate.certificate_data
+    return (
+        select(
+            Certificate.id,
+            Certificate.certificate_id,
+            func.coalesce(Certificate.student_name, data['student_name'].as_string()).label('student_name'),
+            func.coalesce(Certificate.course_name, data['course_name'].as_string()).label('course_name'),
+            func.coalesce(Certificate.issue_date, data['issue_date'].as_string()).label('issue_date'),
+            Certificate.generated_at,
+            Certificate.status,
+            Certificate.is_revoked,
+            Certificate.revoked_at,
+            Certificate.revoke_reason,
+            Certificate.pdf_path,
+            Certificate.png_path,
+            Certificate.jpg_path,
+            Certificate.created_at,
+            User.email.label('user_email'),
+            Template.name.label('template_name')
+        )
+        .outerjoin(User, User.id == Certificate.user_id)
+        .outerjoin(Template, Template.id == Certificate.template_id)
+    )
+
+
+async def _certificate_items(rows) -> list:
+    """CertificateListItem dicts for rows of _certificate_list_query"""
+    # Build every download URL of the page in one go
+    urls = await storage_service.get_download_urls(
+        path for row in rows for path in (row.pdf_path, row.png_path, row.jpg_path)
     )
+    
+    items = []
+    for row in rows:
+        download_urls = {}
+        for fmt, path in (("pdf", row.pdf_path), ("png", row.png_path), ("jpg", row.jpg_path)):
+            if path and path in urls:
+                download_urls[fmt] = urls[path]
+        
+        items.append({
+            "id": str(row.id),
+            "certificate_id": row.certificate_id,
+            "student_name": row.student_name or "",
+            "course_name": row.course_name or "",
+            "issue_date": row.issue_date or "",
+            "generated_at": row.generated_at.isoformat() if row.generated_at else None,
+            "status": row.status,
+            "is_revoked": bool(row.is_revoked),
+            "revoked_at": row.revoked_at.isoformat() if row.revoked_at else None,
+            "revoke_reason": row.revoke_reason,
+            "user_email": row.user_email,
+            "template_name": row.template_name,
+            "download_urls": download_urls
+        })
+    return items
 
 
 @router.get("/certificates")
 async def list_all_certificates(
     db: AsyncSession = Depends(get_db),
     admin: User = Depends(get_admin_user),
-    page: int = 1,
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=200),
     status_filter: Optional[str] = None,
-    revoked_only: bool = False
+    revoked_only: bool = False,
+    cursor: Optional[str] = None,
+    include_total: bool = False
 ):
-    """List all certificates for admin management."""
-    offset = (page - 1) * limit
-    
-    # Build query
-    query = select(Certificate).order_by(Certificate.created_at.desc())
-    
+    """
+    List all certificates for admin management, newest first.
+    Pass next_cursor back as cursor for the next page (keyset paging, no OFFSET).
+    total comes from the maintained counters; with status_filter it is only
+    counted when include_total=true.
+    """
+    filters = []
     if status_filter:
-        query = query.where(Certificate.status == status_filter)
-    
+        filters.append(Certificate.status == status_filter)
     if revoked_only:
-        query = query.where(Certificate.is_revoked == True)
-    
-    query = query.offset(offset).limit(limit)
+        filters.append(Certificate.is_revoked == True)
+    query = keyset_page(_certificate_list_query().where(*filters), Certificate.created_at, Certificate.id, cursor, limit)
     
     result = await db.execute(query)
-    certificates = result.scalars().all()
+    rows, next_cursor = next_page_cursor(result.all(), limit, lambda row: (row.created_at, row.id))
     
-    # Get total count
-    count_query = select(func.count(Certificate.id))
-    if status_filter:
-        count_query = count_query.where(Certificate.status == status_filter)
-    if revoked_only:
-        count_query = count_query.where(Certificate.is_revoked == True)
+    total = None
+    if not status_filter:
+        counters = await stats_service.get_counters(db)
+        total = counters[CERTIFICATES_REVOKED if revoked_only else CERTIFICATES_TOTAL]
+    elif include_total:
+        total = await db.scalar(select(func.count(Certificate.id)).where(*filters)) or 0
     
-    count_result = await db.execute(count_query)
-    total = count_result.scalar() or 0
+    return {
+        "certificates": await _certificate_items(rows),
+        "total": total,
+        "limit": limit,
+        "next_cursor": next_cursor
+    }
+
+
+@router.get("/certificates/search")
+async def search_certificates(
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+    q: Optional[str] = Query(None, max_length=200),
+    student: Optional[str] = Query(None, max_length=255),
+    course: Optional[str] = Query(None, max_length=255),
+    issued_from: Optional[date] = None,
+    issued_to: Optional[date] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
+):
+    """
+    Search certificates by student name, course name and issue date, newest first.
+    q matches words in either name; e.g. student=Priya&course=AWS.
+    """
+    filters = certificate_search.filters(q, student, course)
+    if issued_from:
+        filters.append(Certificate.issue_date >= issued_from.isoformat())
+    if issued_to:
+        filters.append(Certificate.issue_date <= issued_to.isoformat())
+    if not filters:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide q, student, course or an issue date range"
+        )
     
-    # Format response
-    items = []
-    for cert in certificates:
-        # Get user email
-        user_email = None
-        if cert.user_id:
-            user_result = await db.execute(
-                select(User.email).where(User.id == cert.user_id)
-            )
-            user_email = user_result.scalar()
-        
-        # Get template name
-        template_name = None
-        if cert.template_id:
-            template_result = await db.execute(
-                select(Template.name).where(Template.id == cert.template_id)
-            )
-            template_name = template_result.scalar()
-        
-        # Build download URLs
-        download_urls = {}
-        if cert.pdf_path:
-            download_urls["pdf"] = storage_service.get_download_url(cert.pdf_path)
-        if cert.png_path:
-            download_urls["png"] = storage_service.get_download_url(cert.png_path)
-        if cert.jpg_path:
-            download_urls["jpg"] = storage_service.get_download_url(cert.jpg_path)
-        
-        items.append({
-            "id": str(cert.id),
-            "certificate_id": cert.certificate_id,
-            "student_name": cert.certificate_data.get("student_name", ""),
-            "course_name": cert.certificate_data.get("course_name", ""),
-            "issue_date": cert.certificate_data.get("issue_date", ""),
-            "generated_at": cert.generated_at.isoformat() if cert.generated_at else None,
-            "status": cert.status,
-            "is_revoked": cert.is_revoked if hasattr(cert, 'is_revoked') else False,
-            "revoked_at": cert.revoked_at.isoformat() if hasattr(cert, 'revoked_at') and cert.revoked_at else None,
-            "revoke_reason": cert.revoke_reason if hasattr(cert, 'revoke_reason') else None,
-            "user_email": user_email,
-            "template_name": template_name,
-            "download_urls": download_urls
-        })
+    query = keyset_page(_certificate_list_query().where(*filters), Certificate.created_at, Certificate.id, cursor, limit)
+    result = await db.execute(query)
+    rows, next_cursor = next_page_cursor(result.all(), limit, lambda row: (row.created_at, row.id))
     
     return {
-        "certificates": items,
-        "total": total,
-        "page": page,
+        "certificates": await _certificate_items(rows),
         "limit": limit,
-        "pages": (total + limit - 1) // limit
+        "next_cursor": next_cursor
     }
 
 
+async def _raise_revoke_conflict(db: AsyncSession, certificate_id: str, detail: str):
+    """A revoke/restore update matched no row: 404 if the certificate is missing, else 400"""
+    exists = await db.scalar(select(Certificate.id).where(Certificate.certificate_id == certificate_id))
+    if exists is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Certificate not found"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=detail
+    )
+
+
 @router.post("/certificates/{certificate_id}/revoke")
 async def revoke_certificate(
     certificate_id: str,
@@ -219,29 +344,19 @@ async def revoke_certificate(
     admin: User = Depends(get_admin_user)
 ):
     """Revoke a certificate making it invalid."""
-    # Find certificate
+    revoked_at = datetime.now(timezone.utc)
+    # Conditional update, so of two concurrent revokes only one counts
     result = await db.execute(
-        select(Certificate).where(Certificate.certificate_id == certificate_id)
+        update(Certificate)
+        .where(Certificate.certificate_id == certificate_id, Certificate.is_revoked.is_not(True))
+        .values(is_revoked=True, revoked_at=revoked_at, revoked_by=admin.id, revoke_reason=request.reason)
+        .execution_options(synchronize_session=False)
     )
-    cert = result.scalar_one_or_none()
     
-    if not cert:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Certificate not found"
-        )
-    
-    if cert.is_revoked:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Certificate is already revoked"
-        )
+    if result.rowcount != 1:
+        await _raise_revoke_conflict(db, certificate_id, "Certificate is already revoked")
     
-    # Revoke the certificate
-    cert.is_revoked = True
-    cert.revoked_at = datetime.now(timezone.utc)
-    cert.revoked_by = admin.id
-    cert.revoke_reason = request.reason
+    stats_service.certificates_revoked(db)
     
     await db.commit()
     
@@ -249,7 +364,7 @@ async def revoke_certificate(
         "success": True,
         "message": f"Certificate {certificate_id} has been revoked",
         "certificate_id": certificate_id,
-        "revoked_at": cert.revoked_at.isoformat()
+        "revoked_at": revoked_at.isoformat()
     }
 
 
@@ -260,29 +375,17 @@ async def restore_certificate(
     admin: User = Depends(get_admin_user)
 ):
     """Restore a revoked certificate."""
-    # Find certificate
     result = await db.execute(
-        select(Certificate).where(Certificate.certificate_id == certificate_id)
+        update(Certificate)
+        .where(Certificate.certificate_id == certificate_id, Certificate.is_revoked == True)
+        .values(is_revoked=False, revoked_at=None, revoked_by=None, revoke_reason=None)
+        .execution_options(synchronize_session=False)
     )
-    cert = result.scalar_one_or_none()
     
-    if not cert:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Certificate not found"
-        )
+    if result.rowcount != 1:
+        await _raise_revoke_conflict(db, certificate_id, "Certificate is not revoked")
     
-    if not cert.is_revoked:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Certificate is not revoked"
-        )
-    
-    # Restore the certificate
-    cert.is_revoked = False
-    cert.revoked_at = None
-    cert.revoked_by = None
-    cert.revoke_reason = None
+    stats_service.certificates_revoked(db, -1)
     
     await db.commit()
     
@@ -297,47 +400,46 @@ async def restore_certificate(
 async def list_users(
     db: AsyncSession = Depends(get_db),
     admin: User = Depends(get_admin_user),
-    page: int = 1,
-    limit: int = 50
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
 ):
-    """List all users."""
-    offset = (page - 1) * limit
-    
-    result = await db.execute(
-        select(User)
-        .order_by(User.created_at.desc())
-        .offset(offset)
-        .limit(limit)
+    """
+    List all users with their certificate counts, newest first.
+    Pass next_cursor back as cursor for the next page (keyset paging, no OFFSET);
+    total comes from the maintained counters.
+    """
+    # Counted per user of the page in the same query, through idx_certificates_user_created
+    certificate_count = (
+        select(func.count(Certificate.id))
+        .where(Certificate.user_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+        .label('certificate_count')
     )
-    users = result.scalars().all()
+    query = keyset_page(select(User, certificate_count), User.created_at, User.id, cursor, limit)
     
-    # Get total count
-    count_result = await db.execute(select(func.count(User.id)))
-    total = count_result.scalar() or 0
+    result = await db.execute(query)
+    rows, next_cursor = next_page_cursor(result.all(), limit, lambda row: (row.User.created_at, row.User.id))
+    
+    total = (await stats_service.get_counters(db))[USERS_TOTAL]
     
     items = []
-    for user in users:
-        # Count certificates for user
-        cert_count_result = await db.execute(
-            select(func.count(Certificate.id)).where(Certificate.user_id == user.id)
-        )
-        cert_count = cert_count_result.scalar() or 0
-        
+    for user, cert_count in rows:
         items.append({
             "id": str(user.id),
             "email": user.email,
             "phone": user.phone,
             "is_active": user.is_active,
-            "is_admin": user.is_admin if hasattr(user, 'is_admin') else False,
+            "is_admin": bool(user.is_admin),
             "created_at": user.created_at.isoformat(),
-            "certificate_count": cert_count
+            "certificate_count": cert_count or 0
         })
     
     return {
         "users": items,
         "total": total,
-        "page": page,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
 
 
@@ -2,20 +2,16 @@
 Certificates Router - Certificate generation endpoints
 """
 
-from datetime import datetime, timezone
-from typing import List, Optional
-import csv
-import io
-import random
-import string
-import zipfile
+from datetime import date, datetime, time, timedelta, timezone
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional, Callable, Tuple
+import asyncio
 import os
 import uuid
-from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, status
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
 
 from models import (
     GenerateCertificateRequest,
@@ -23,106 +19,163 @@ from models import (
     BulkGenerateRequest,
     BulkGenerateResponse,
     BulkCertificateResult,
+    BulkJobResponse,
+    BulkJobStatusResponse,
+    BulkJobError,
     CertificateInput,
+    CertificateZipRequest,
     OutputFormat,
     PreviewCertificateRequest,
     PreviewResponse,
     FinalizePreviewRequest
 )
-from database import get_db
-from db_models import Certificate
+from config import get_settings
+from database import LIKE_ESCAPE, contains_pattern, get_db
+from db_models import Certificate, Template
 from dependencies import get_current_user
 from services.certificate_service import certificate_service, rendering_service
+from services.certificate_ids import CertificateIdsExhausted
+from services.pdf_tools import CombinedPdfWriter
+from services.bulk_outputs import BulkZipWriter, bulk_file_path, publish_bulk_file, stream_zip
+from services.bulk_jobs import bulk_job_service, bulk_job_runner, JobRow, INSERT_CHUNK_SIZE
+from services.csv_ingest import CsvFormatError, iter_csv_chunks
+from services.json_ingest import iter_ndjson_rows, iter_json_array_rows, batch_rows
+from services.pagination import keyset_page, next_page_cursor
 
 router = APIRouter(prefix="/certificate", tags=["Certificates"])
 
+settings = get_settings()
 
-async def generate_unique_certificate_id(db: AsyncSession) -> str:
-    """Generate a unique certificate ID in format NH-YYYY-XXXXX."""
-    year = datetime.now().year
-    
-    for _ in range(10):  # Try up to 10 times
-        random_part = ''.join(random.choices(string.digits, k=5))
-        cert_id = f"NH-{year}-{random_part}"
-        
-        # Check if exists
-        result = await db.execute(
-            select(Certificate).where(Certificate.certificate_id == cert_id)
+
+async def _allocate_certificate_ids(db: AsyncSession, count: int, exclude=()) -> List[str]:
+    """Allocate certificate IDs as one block; an exhausted ID space is a 503"""
+    try:
+        return await certificate_service.allocate_certificate_ids(db, count, exclude)
+    except CertificateIdsExhausted as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
         )
-        if not result.scalar_one_or_none():
-            return cert_id
-    
-    # Fallback with longer random
-    random_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-    return f"NH-{year}-{random_part}"
 
 
-def _create_bulk_zip(successful_results: List[BulkCertificateResult]) -> Optional[str]:
-    """Helper to create a ZIP of generated certificates."""
-    from config import get_settings
-    from services.certificate_service import storage_service
-    settings = get_settings()
-    
-    # Create unique zip filename
-    zip_filename = f"bulk-certificates-{uuid.uuid4().hex[:8]}.zip"
-    
-    # We still need a local place to save the ZIP temporarily
-    storage_path = Path(settings.STORAGE_PATH)
-    storage_path.mkdir(parents=True, exist_ok=True)
-    zip_path = storage_path / zip_filename
-    
-    files_added = 0
+async def _generate_pending(
+    db: AsyncSession,
+    template: Template,
+    pending: List[tuple],
+    output_formats: List[str],
+    user_id: str,
+    results: List[Optional[BulkCertificateResult]],
+    pdf_sink: Optional[Callable[[bytes], None]] = None,
+    file_sink: Optional[Callable[[str, Dict[str, bytes]], None]] = None
+):
+    """
+    Generate validated bulk rows in concurrent render batches.
+    pending holds (index, cert_dict); each outcome is stored at results[index].
+    """
+    outcomes = await certificate_service.generate_certificates(
+        db,
+        template,
+        [cert_dict for _, cert_dict in pending],
+        output_formats,
+        user_id,
+        pdf_sink,
+        file_sink=file_sink
+    )
+    for (index, cert_dict), outcome in zip(pending, outcomes):
+        if isinstance(outcome, Exception):
+            results[index] = BulkCertificateResult(
+                certificate_id=cert_dict['certificate_id'],
+                success=False,
+                error=str(outcome)
+            )
+        else:
+            results[index] = BulkCertificateResult(
+                certificate_id=cert_dict['certificate_id'],
+                success=True,
+                download_urls=outcome
+            )
+
+
+async def _generate_with_combined_pdf(
+    db: AsyncSession,
+    template: Template,
+    pending: List[tuple],
+    output_formats: List[str],
+    user_id: str,
+    results: List[Optional[BulkCertificateResult]],
+    nup: int = 1,
+    file_sink: Optional[Callable[[str, Dict[str, bytes]], None]] = None
+) -> Optional[str]:
+    """
+    Generate bulk rows while streaming every successful certificate, in input
+    order, into one print-ready PDF. Returns the combined PDF download URL.
+    """
+    pdf_filename, pdf_path = bulk_file_path("pdf")
     try:
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for result in successful_results:
-                if result.success and result.download_urls:
-                    for fmt, url in result.download_urls.items():
-                        # Extract relative path using StorageService helper
-                        relative_path = storage_service._get_relative_path_from_url(url)
-                        print(f"ZIP: Processing result={result.certificate_id} fmt={fmt} url={url} rel={relative_path}")
-                        
-                        if relative_path:
-                            try:
-                                # Get file bytes (from local or Supabase)
-                                file_bytes = storage_service.get_file(relative_path)
-                                if file_bytes:
-                                    arc_name = f"{result.certificate_id}.{fmt}"
-                                    zipf.writestr(arc_name, file_bytes)
-                                    files_added += 1
-                                    print(f"ZIP: Successfully added {arc_name} ({len(file_bytes)} bytes)")
-                                else:
-                                    print(f"ZIP: File bytes empty for {relative_path}")
-                            except Exception as e:
-                                print(f"ZIP: Failed to add {relative_path}: {e}")
-                        else:
-                            print(f"ZIP: Could not determine relative path from URL: {url}")
-        
-        print(f"ZIP: Finished creating archive. Total files added: {files_added}")
-        
-        if files_added == 0:
-            print("ZIP: WARNING - No files were added to the ZIP archive.")
-        
-        # If using Supabase, upload the ZIP itself to Supabase
-        if settings.STORAGE_TYPE == "supabase" and files_added > 0:
-            with open(zip_path, 'rb') as f:
-                zip_bytes = f.read()
-            zip_rel_path = f"bulk_zips/{zip_filename}"
-            
-            storage_service.supabase.storage.from_(storage_service.bucket_name).upload(
-                path=zip_rel_path,
-                file=zip_bytes,
-                file_options={"content-type": "application/zip"}
+        with open(pdf_path, 'wb') as output:
+            writer = CombinedPdfWriter(output, nup)
+            await _generate_pending(
+                db, template, pending, output_formats, user_id, results,
+                pdf_sink=writer.add_pdf,
+                file_sink=file_sink
             )
-            return storage_service.get_download_url(zip_rel_path)
-        
-        # Return local path only if local exists or it's not supabase
-        if files_added > 0:
-            return f"/downloads/{zip_filename}"
+            await asyncio.to_thread(writer.close)
+    except Exception:
+        pdf_path.unlink(missing_ok=True)
+        raise
+    
+    print(f"Combined PDF: {writer.pages_added} certificates written to {pdf_filename}")
+    if writer.pages_added == 0:
+        pdf_path.unlink(missing_ok=True)
         return None
+    try:
+        return await publish_bulk_file(pdf_path, pdf_filename, "application/pdf", "bulk_pdfs")
     except Exception as e:
-        print(f"Error creating ZIP: {e}")
+        print(f"Error uploading combined PDF: {e}")
+        pdf_path.unlink(missing_ok=True)
         return None
 
+
+async def _generate_bulk(
+    db: AsyncSession,
+    template: Template,
+    pending: List[tuple],
+    output_formats: List[str],
+    user_id: str,
+    results: List[Optional[BulkCertificateResult]],
+    combined_pdf: bool = False,
+    nup: int = 1,
+    zip_compression_level: Optional[int] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Generate and commit bulk rows, returning (zip_url, combined_pdf_url).
+    Rendered files are written into the ZIP as each batch is saved, so it is
+    never rebuilt from storage.
+    """
+    zip_writer = BulkZipWriter(zip_compression_level) if output_formats else None
+    file_sink = zip_writer.add if zip_writer is not None else None
+    combined_pdf_url = None
+    try:
+        if combined_pdf:
+            combined_pdf_url = await _generate_with_combined_pdf(
+                db, template, pending, output_formats, user_id, results, nup,
+                file_sink=file_sink
+            )
+        else:
+            await _generate_pending(
+                db, template, pending, output_formats, user_id, results,
+                file_sink=file_sink
+            )
+        await db.commit()
+    except Exception:
+        if zip_writer is not None:
+            await zip_writer.abort()
+        raise
+    
+    zip_url = await zip_writer.close() if zip_writer is not None else None
+    return zip_url, combined_pdf_url
+
+
 @router.post(
     "/generate",
     response_model=GenerateCertificateResponse,
@@ -139,7 +192,7 @@ async def generate_certificate(
     # Auto-generate certificate ID if not provided
     cert_data = request.certificate_data.model_dump()
     if not cert_data.get('certificate_id'):
-        cert_data['certificate_id'] = await generate_unique_certificate_id(db)
+        cert_data['certificate_id'] = (await _allocate_certificate_ids(db, 1))[0]
     else:
         # Check uniqueness if provided
         exists = await certificate_service.check_certificate_id_exists(
@@ -206,6 +259,12 @@ async def bulk_generate_certificates(
             detail=f"Bulk generation limit exceeded. Maximum {MAX_BULK_LIMIT} certificates allowed per request."
         )
     
+    if not request.output_formats and not request.combined_pdf:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Select at least one output format or combined_pdf"
+        )
+    
     # Get template
     template = await rendering_service.get_template(db, request.template_id)
     if not template:
@@ -214,56 +273,57 @@ async def bulk_generate_certificates(
             detail="Template not found"
         )
     
-    results: List[BulkCertificateResult] = []
-    successful = 0
-    failed = 0
+    results: List[Optional[BulkCertificateResult]] = [None] * len(request.certificates)
+    pending = []  # (index, cert_dict) rows that passed validation
+    seen_ids = set()
+    
+    # Check every provided ID with one query (rows are only saved after rendering)
+    taken_ids = await certificate_service.find_existing_certificate_ids(
+        db,
+        [cert.certificate_id for cert in request.certificates if cert.certificate_id]
+    )
     
-    for cert_data in request.certificates:
+    for index, cert_data in enumerate(request.certificates):
+        # Convert to dict for manipulation
+        cert_dict = cert_data.model_dump()
         try:
-            # Convert to dict for manipulation
-            cert_dict = cert_data.model_dump()
-            
-            # Auto-generate certificate_id if not provided
-            if not cert_dict.get('certificate_id'):
-                cert_dict['certificate_id'] = await generate_unique_certificate_id(db)
-            else:
-                # Check uniqueness if provided
-                exists = await certificate_service.check_certificate_id_exists(
-                    db,
-                    cert_dict['certificate_id']
-                )
+            if cert_dict.get('certificate_id'):
+                exists = cert_dict['certificate_id'] in seen_ids or cert_dict['certificate_id'] in taken_ids
                 if exists:
                     raise ValueError(f"Certificate ID already exists")
+                seen_ids.add(cert_dict['certificate_id'])
             
-            # Generate
-            download_urls = await certificate_service.generate_certificate(
-                db,
-                template,
-                cert_dict,
-                [fmt.value for fmt in request.output_formats],
-                current_user
-            )
-            
-            results.append(BulkCertificateResult(
-                certificate_id=cert_dict['certificate_id'],
-                success=True,
-                download_urls=download_urls
-            ))
-            successful += 1
+            pending.append((index, cert_dict))
             
         except Exception as e:
             cert_id = cert_dict.get('certificate_id') or 'UNKNOWN'
-            results.append(BulkCertificateResult(
+            results[index] = BulkCertificateResult(
                 certificate_id=cert_id,
                 success=False,
                 error=str(e)
-            ))
-            failed += 1
+            )
     
-    await db.commit()
+    # Auto-generate the missing certificate IDs as one allocated block
+    unnumbered = [cert_dict for _, cert_dict in pending if not cert_dict.get('certificate_id')]
+    if unnumbered:
+        new_ids = await _allocate_certificate_ids(db, len(unnumbered), seen_ids)
+        for cert_dict, cert_id in zip(unnumbered, new_ids):
+            cert_dict['certificate_id'] = cert_id
     
-    # Create ZIP of all successful certificates
-    zip_url = _create_bulk_zip([r for r in results if r.success])
+    # Generate, several certificates per render, writing the ZIP as they are saved
+    zip_url, combined_pdf_url = await _generate_bulk(
+        db,
+        template,
+        pending,
+        [fmt.value for fmt in request.output_formats],
+        current_user,
+        results,
+        request.combined_pdf,
+        request.combined_pdf_nup,
+        request.zip_compression_level
+    )
+    successful = sum(1 for r in results if r.success)
+    failed = len(results) - successful
     
     return BulkGenerateResponse(
         success=failed == 0,
@@ -271,7 +331,8 @@ async def bulk_generate_certificates(
         successful=successful,
         failed=failed,
         results=results,
-        zip_download_url=zip_url
+        zip_download_url=zip_url,
+        combined_pdf_url=combined_pdf_url
     )
 
 
@@ -284,6 +345,9 @@ async def bulk_generate_certificates(
 async def bulk_generate_from_csv(
     template_id: str = Form(...),
     output_formats: str = Form("pdf"),
+    combined_pdf: bool = Form(False),
+    combined_pdf_nup: int = Form(1, ge=1, le=16),
+    zip_compression_level: Optional[int] = Form(None, ge=0, le=9),
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
     current_user: str = Depends(get_current_user)
@@ -305,87 +369,79 @@ async def bulk_generate_from_csv(
             detail="Template not found"
         )
     
-    # Parse output formats
-    formats = [OutputFormat(f.strip()) for f in output_formats.split(',')]
-    
-    # Read CSV
-    content = await file.read()
-    csv_file = io.StringIO(content.decode('utf-8'))
-    
-    # Count rows before processing (using a list to avoid double-reading if possible, 
-    # but for simplicity we'll just check the count)
-    rows = list(csv.DictReader(csv_file))
+    # Parse output formats (may be empty when only the combined PDF is wanted)
+    formats = [OutputFormat(f.strip()) for f in output_formats.split(',') if f.strip()]
+    if not formats and not combined_pdf:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Select at least one output format or combined_pdf"
+        )
     
+    # Parse CSV straight from the upload spool, validating rows as they are read
     MAX_BULK_LIMIT = 50
-    if len(rows) > MAX_BULK_LIMIT:
+    rows: List[JobRow] = []
+    try:
+        async with aclosing(iter_csv_chunks(file.file, MAX_BULK_LIMIT + 1)) as chunks:
+            async for chunk in chunks:
+                rows.extend(chunk)
+                if len(rows) > MAX_BULK_LIMIT:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Bulk generation limit exceeded. Maximum {MAX_BULK_LIMIT} rows allowed per CSV."
+                    )
+    except CsvFormatError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Bulk generation limit exceeded. Maximum {MAX_BULK_LIMIT} rows allowed per CSV."
+            detail=str(e)
         )
     
-    # Required columns
-    required_cols = ['student_name', 'course_name', 'issue_date', 'certificate_id', 'issuing_authority']
+    results: List[Optional[BulkCertificateResult]] = [None] * len(rows)
+    pending = []  # (index, cert_dict) rows that passed validation
+    seen_ids = set()
     
-    results: List[BulkCertificateResult] = []
-    successful = 0
-    failed = 0
+    # Check every ID with one query (rows are only saved after rendering)
+    taken_ids = await certificate_service.find_existing_certificate_ids(
+        db,
+        [row.certificate_data['certificate_id'] for row in rows if not row.error]
+    )
     
     for row in rows:
         try:
-            # Validate required columns
-            for col in required_cols:
-                if col not in row or not row[col]:
-                    raise ValueError(f"Missing required column: {col}")
-            
-            # Create certificate data
-            cert_data = CertificateInput(
-                student_name=row['student_name'],
-                course_name=row['course_name'],
-                issue_date=row['issue_date'],
-                certificate_id=row['certificate_id'],
-                issuing_authority=row['issuing_authority'],
-                signature_name=row.get('signature_name'),
-                signature_image_url=row.get('signature_image_url') or None,
-                logo_url=row.get('logo_url') or None
-            )
+            if row.error:
+                raise ValueError(row.error)
             
-            # Check uniqueness
-            exists = await certificate_service.check_certificate_id_exists(
-                db,
-                cert_data.certificate_id
-            )
+            certificate_id = row.certificate_data['certificate_id']
+            exists = certificate_id in seen_ids or certificate_id in taken_ids
             if exists:
                 raise ValueError("Certificate ID already exists")
             
-            # Generate
-            download_urls = await certificate_service.generate_certificate(
-                db,
-                template,
-                cert_data.model_dump(),
-                [fmt.value for fmt in formats],
-                current_user
-            )
-            
-            results.append(BulkCertificateResult(
-                certificate_id=cert_data.certificate_id,
-                success=True,
-                download_urls=download_urls
-            ))
-            successful += 1
+            seen_ids.add(certificate_id)
+            pending.append((row.row_index, row.certificate_data))
             
         except Exception as e:
-            cert_id = row.get('certificate_id', 'unknown')
-            results.append(BulkCertificateResult(
+            cert_id = row.certificate_data.get('certificate_id') or 'unknown'
+            results[row.row_index] = BulkCertificateResult(
                 certificate_id=cert_id,
                 success=False,
                 error=str(e)
-            ))
-            failed += 1
-    
-    await db.commit()
+            )
     
-    # Create ZIP of all successful certificates
-    zip_url = _create_bulk_zip([r for r in results if r.success])
+    # Generate, several certificates per render, writing the ZIP as they are saved
+    zip_url, combined_pdf_url = await _generate_bulk(
+        db,
+        template,
+        pending,
+        [fmt.value for fmt in formats],
+        current_user,
+        results,
+        combined_pdf,
+        combined_pdf_nup,
+        zip_compression_level
+    )
+    for row in rows:
+        results[row.row_index].line_number = row.line_number
+    successful = sum(1 for r in results if r.success)
+    failed = len(results) - successful
     
     return BulkGenerateResponse(
         success=failed == 0,
@@ -393,20 +449,340 @@ async def bulk_generate_from_csv(
         successful=successful,
         failed=failed,
         results=results,
-        zip_download_url=zip_url
+        zip_download_url=zip_url,
+        combined_pdf_url=combined_pdf_url
     )
 
 
+@router.post(
+    "/jobs",
+    response_model=BulkJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Submit a background bulk job",
+    description="Queues certificates for background generation and returns a job ID to poll."
+)
+async def submit_bulk_job(
+    request: BulkGenerateRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(get_current_user)
+) -> BulkJobResponse:
+    """Queue a bulk generation job from JSON array input."""
+    
+    if not request.certificates:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No certificates provided"
+        )
+    if len(request.certificates) > settings.BULK_JOB_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Bulk job limit exceeded. Maximum {settings.BULK_JOB_MAX_ROWS} certificates allowed per job."
+        )
+    if not request.output_formats and not request.combined_pdf:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Select at least one output format or combined_pdf"
+        )
+    
+    # Get template
+    template = await rendering_service.get_template(db, request.template_id)
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template not found"
+        )
+    
+    # Certificate IDs are assigned and checked by the worker
+    job = await bulk_job_service.create_job(
+        db,
+        template,
+        [fmt.value for fmt in request.output_formats],
+        current_user,
+        request.combined_pdf,
+        request.combined_pdf_nup,
+        zip_compression_level=request.zip_compression_level
+    )
+    await bulk_job_service.add_rows(db, job.id, [
+        JobRow(index, cert_data.model_dump())
+        for index, cert_data in enumerate(request.certificates)
+    ])
+    await db.commit()
+    bulk_job_runner.notify()
+    
+    return _job_response(job, len(request.certificates))
+
+
+@router.post(
+    "/jobs/csv",
+    response_model=BulkJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Submit a background bulk job from CSV upload",
+    description="Upload a CSV file; rows are validated now and generated in the background."
+)
+async def submit_bulk_job_from_csv(
+    template_id: str = Form(...),
+    output_formats: str = Form("pdf"),
+    combined_pdf: bool = Form(False),
+    combined_pdf_nup: int = Form(1, ge=1, le=16),
+    zip_compression_level: Optional[int] = Form(None, ge=0, le=9),
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(get_current_user)
+) -> BulkJobResponse:
+    """Queue a bulk generation job from an uploaded CSV file."""
+    
+    # Validate file type
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be a CSV"
+        )
+    
+    # Get template
+    template = await rendering_service.get_template(db, template_id)
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template not found"
+        )
+    
+    # Parse output formats (may be empty when only the combined PDF is wanted)
+    formats = [OutputFormat(f.strip()) for f in output_formats.split(',') if f.strip()]
+    if not formats and not combined_pdf:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Select at least one output format or combined_pdf"
+        )
+    
+    job = await bulk_job_service.create_job(
+        db,
+        template,
+        [fmt.value for fmt in formats],
+        current_user,
+        combined_pdf,
+        combined_pdf_nup,
+        input_complete=False,
+        zip_compression_level=zip_compression_level
+    )
+    await db.commit()
+    
+    # Rows go into the job as they are parsed; workers start on the first
+    # chunk while the rest of the file is read
+    total = await _ingest_job_rows(
+        db,
+        job,
+        iter_csv_chunks(file.file, INSERT_CHUNK_SIZE),
+        "CSV file has no rows"
+    )
+    
+    return _job_response(job, total)
+
+
+@router.post(
+    "/jobs/stream",
+    response_model=BulkJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Submit a background bulk job as a stream",
+    description=(
+        "Send certificates as NDJSON (Content-Type: application/x-ndjson, one object per line) "
+        "or as a JSON array (application/json). Elements are validated one by one and queued "
+        "while the body is still uploading."
+    )
+)
+async def submit_bulk_job_stream(
+    request: Request,
+    template_id: str = Query(...),
+    output_formats: str = Query("pdf"),
+    combined_pdf: bool = Query(False),
+    combined_pdf_nup: int = Query(1, ge=1, le=16),
+    zip_compression_level: Optional[int] = Query(None, ge=0, le=9),
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(get_current_user)
+) -> BulkJobResponse:
+    """Queue a bulk generation job from a streamed NDJSON or JSON array body."""
+    
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/json-seq"):
+        parse_rows = iter_ndjson_rows
+    elif content_type == "application/json":
+        parse_rows = iter_json_array_rows
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Content-Type must be application/x-ndjson or application/json"
+        )
+    
+    # Get template
+    template = await rendering_service.get_template(db, template_id)
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template not found"
+        )
+    
+    # Parse output formats (may be empty when only the combined PDF is wanted)
+    formats = [OutputFormat(f.strip()) for f in output_formats.split(',') if f.strip()]
+    if not formats and not combined_pdf:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Select at least one output format or combined_pdf"
+        )
+    
+    job = await bulk_job_service.create_job(
+        db,
+        template,
+        [fmt.value for fmt in formats],
+        current_user,
+        combined_pdf,
+        combined_pdf_nup,
+        input_complete=False,
+        zip_compression_level=zip_compression_level
+    )
+    await db.commit()
+    
+    total = await _ingest_job_rows(
+        db,
+        job,
+        batch_rows(parse_rows(request.stream()), INSERT_CHUNK_SIZE),
+        "No certificates provided"
+    )
+    
+    return _job_response(job, total)
+
+
+async def _ingest_job_rows(
+    db: AsyncSession,
+    job,
+    batches: AsyncIterator[List[JobRow]],
+    empty_detail: str
+) -> int:
+    """
+    Add streamed row batches to a job, committing each one so workers can
+    start, then mark the job's input complete. Invalid rows are stored as
+    failed and show up in the job report at once. If the stream fails or
+    exceeds BULK_JOB_MAX_ROWS the job is cancelled (400 for invalid input).
+    Returns the number of rows added.
+    """
+    total = 0
+    try:
+        async with aclosing(batches) as chunks:
+            async for rows in chunks:
+                if total + len(rows) > settings.BULK_JOB_MAX_ROWS:
+                    raise ValueError(
+                        f"Bulk job limit exceeded. Maximum {settings.BULK_JOB_MAX_ROWS} rows allowed per job."
+                    )
+                await bulk_job_service.add_rows(db, job.id, rows)
+                await db.commit()
+                bulk_job_runner.notify()
+                total += len(rows)
+        if total == 0:
+            raise ValueError(empty_detail)
+    except Exception as e:
+        await db.rollback()
+        await bulk_job_service.cancel_job(db, job.id, str(e) or type(e).__name__)
+        await db.commit()
+        if isinstance(e, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        raise
+    
+    await bulk_job_service.finish_input(db, job.id)
+    await db.commit()
+    bulk_job_runner.notify()
+    return total
+
+
+def _job_response(job, total: int) -> BulkJobResponse:
+    return BulkJobResponse(
+        job_id=str(job.id),
+        status=job.status,
+        total=total,
+        status_url=f"/certificate/jobs/{job.id}"
+    )
+
+
+async def _is_admin(db: AsyncSession, current_user: str) -> bool:
+    from db_models import User
+    import uuid as uuid_module
+    
+    try:
+        condition = User.id == uuid_module.UUID(current_user)
+    except (ValueError, TypeError):
+        condition = User.email == current_user
+    result = await db.execute(select(User.is_admin).where(condition))
+    return bool(result.scalar_one_or_none())
+
+
 @router.get(
-    "/history",
-    summary="Get certificate generation history",
-    description="Returns a list of all certificates generated by the current user."
+    "/jobs/{job_id}",
+    response_model=BulkJobStatusResponse,
+    summary="Get background bulk job progress",
+    description="Returns progress, failed rows and, once completed, the ZIP / combined PDF URLs."
 )
-async def get_certificate_history(
+async def get_bulk_job(
+    job_id: str,
+    include_results: bool = Query(False, description="Include a page of per-row results"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
     db: AsyncSession = Depends(get_db),
     current_user: str = Depends(get_current_user)
-):
-    """Get user's certificate generation history."""
+) -> BulkJobStatusResponse:
+    """Poll a bulk job (owner or admin only)."""
+    
+    job = await bulk_job_service.get_job(db, job_id)
+    if job is None or (str(job.user_id) != current_user and not await _is_admin(db, current_user)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Bulk job not found"
+        )
+    
+    errors = [
+        BulkJobError(
+            row=item.row_index,
+            line_number=item.line_number,
+            certificate_id=item.certificate_id,
+            error=item.error or "Unknown error"
+        )
+        for item in await bulk_job_service.get_failed_items(db, job.id)
+    ]
+    
+    results = None
+    if include_results:
+        results = [
+            BulkCertificateResult(
+                certificate_id=item.certificate_id or 'UNKNOWN',
+                success=item.status == 'done',
+                error=item.error,
+                download_urls=item.download_urls,
+                line_number=item.line_number
+            )
+            for item in await bulk_job_service.get_items(db, job.id, offset, limit)
+        ]
+    
+    return BulkJobStatusResponse(
+        job_id=str(job.id),
+        status=job.status,
+        total=job.total,
+        processed=job.processed,
+        successful=job.successful,
+        failed=job.failed,
+        progress=round(job.processed / job.total, 4) if job.total else 0.0,
+        input_complete=job.input_complete,
+        zip_download_url=job.zip_url,
+        combined_pdf_url=job.combined_pdf_url,
+        error=job.error,
+        errors=errors,
+        results=results,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        completed_at=job.completed_at
+    )
+
+
+async def _find_user(db: AsyncSession, current_user: str):
+    """User row for the token subject (user UUID, or email for older tokens)"""
     from db_models import User
     import uuid as uuid_module
     
@@ -429,42 +805,217 @@ async def get_certificate_history(
         )
         user = result.scalar_one_or_none()
     
+    return user
+
+
+def _history_filters(
+    user_id,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    template_id: Optional[str] = None,
+    course: Optional[str] = None
+) -> list:
+    """WHERE clauses selecting a user's certificates (dates are inclusive, UTC)"""
+    filters = [Certificate.user_id == user_id]
+    if start_date:
+        filters.append(Certificate.created_at >= datetime.combine(start_date, time.min, tzinfo=timezone.utc))
+    if end_date:
+        filters.append(Certificate.created_at < datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=timezone.utc))
+    if template_id:
+        try:
+            filters.append(Certificate.template_id == uuid.UUID(template_id))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid template_id"
+            )
+    if course:
+        course_name = func.coalesce(Certificate.course_name, Certificate.certificate_data['course_name'].as_string())
+        filters.append(course_name.ilike(contains_pattern(course), escape=LIKE_ESCAPE))
+    return filters
+
+
+@router.get(
+    "/history",
+    summary="Get certificate generation history",
+    description="Returns the current user's certificates, newest first, one page at a time."
+)
+async def get_certificate_history(
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    template_id: Optional[str] = None,
+    course: Optional[str] = None
+):
+    """
+    Get user's certificate generation history.
+    Pass next_cursor back as cursor for the next page; total is only counted
+    on the first page.
+    """
+    user = await _find_user(db, current_user)
     if not user:
-        return {"certificates": [], "total": 0}
+        return {"certificates": [], "total": 0, "next_cursor": None}
     
-    # Get certificates for user
-    result = await db.execute(
-        select(Certificate)
-        .where(Certificate.user_id == user.id)
-        .order_by(Certificate.created_at.desc())
-    )
-    certificates = result.scalars().all()
+    filters = _history_filters(user.id, start_date, end_date, template_id, course)
     
-    # Get storage service for generating proper download URLs
+    # Display fields only; the certificate_data blob is only read for rows not backfilled yet
+    data = Certificate.certificate_data
+    query = select(
+        Certificate.id,
+        Certificate.certificate_id,
+        func.coalesce(Certificate.student_name, data['student_name'].as_string()).label('student_name'),
+        func.coalesce(Certificate.course_name, data['course_name'].as_string()).label('course_name'),
+        func.coalesce(Certificate.issue_date, data['issue_date'].as_string()).label('issue_date'),
+        Certificate.status,
+        Certificate.generated_at,
+        Certificate.created_at,
+        Certificate.pdf_path,
+        Certificate.png_path,
+        Certificate.jpg_path
+    ).where(*filters)
+    
+    result = await db.execute(keyset_page(query, Certificate.created_at, Certificate.id, cursor, limit))
+    rows, next_cursor = next_page_cursor(result.all(), limit, lambda row: (row.created_at, row.id))
+    
+    total = None
+    if not cursor:
+        total = await db.scalar(select(func.count(Certificate.id)).where(*filters)) or 0
+    
+    # Download URLs of the whole page in one go
     from services.certificate_service import storage_service
+    urls = await storage_service.get_download_urls(
+        path for row in rows for path in (row.pdf_path, row.png_path, row.jpg_path)
+    )
     
     history = []
-    for cert in certificates:
+    for row in rows:
         download_urls = {}
-        if cert.pdf_path:
-            download_urls["pdf"] = storage_service.get_download_url(cert.pdf_path)
-        if cert.png_path:
-            download_urls["png"] = storage_service.get_download_url(cert.png_path)
-        if cert.jpg_path:
-            download_urls["jpg"] = storage_service.get_download_url(cert.jpg_path)
+        for fmt, path in (("pdf", row.pdf_path), ("png", row.png_path), ("jpg", row.jpg_path)):
+            if path and path in urls:
+                download_urls[fmt] = urls[path]
         
         history.append({
-            "id": str(cert.id),
-            "certificate_id": cert.certificate_id,
-            "student_name": cert.certificate_data.get("student_name", ""),
-            "course_name": cert.certificate_data.get("course_name", ""),
-            "issue_date": cert.certificate_data.get("issue_date", ""),
-            "status": cert.status,
-            "generated_at": cert.generated_at.isoformat() if cert.generated_at else None,
+            "id": str(row.id),
+            "certificate_id": row.certificate_id,
+            "student_name": row.student_name or "",
+            "course_name": row.course_name or "",
+            "issue_date": row.issue_date or "",
+            "status": row.status,
+            "generated_at": row.generated_at.isoformat() if row.generated_at else None,
             "download_urls": download_urls
         })
     
-    return {"certificates": history, "total": len(history)}
+    return {"certificates": history, "total": total, "next_cursor": next_cursor}
+
+
+async def _certificate_zip_response(
+    db: AsyncSession,
+    current_user: str,
+    certificate_ids: Optional[List[str]],
+    start_date: Optional[date],
+    end_date: Optional[date],
+    template_id: Optional[str],
+    course: Optional[str],
+    formats: Optional[List[str]]
+) -> StreamingResponse:
+    """Stream a ZIP of the user's stored certificates matching the IDs and filters"""
+    user = await _find_user(db, current_user)
+    filters = _history_filters(user.id, start_date, end_date, template_id, course) if user else None
+    if filters is not None and certificate_ids is not None:
+        filters.append(Certificate.certificate_id.in_(certificate_ids))
+    
+    rows = []
+    if filters is not None:
+        max_certificates = settings.ZIP_DOWNLOAD_MAX_CERTIFICATES
+        result = await db.execute(
+            select(Certificate.certificate_id, Certificate.pdf_path, Certificate.png_path, Certificate.jpg_path)
+            .where(*filters)
+            .order_by(Certificate.created_at.desc(), Certificate.id.desc())
+            .limit(max_certificates + 1)
+        )
+        rows = result.all()
+        if len(rows) > max_certificates:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"More than {max_certificates} certificates match; narrow the selection or date range"
+            )
+    
+    wanted = {('jpg' if fmt == 'jpeg' else fmt) for fmt in formats} if formats else None
+    entries = []
+    for row in rows:
+        for fmt, path in (("pdf", row.pdf_path), ("png", row.png_path), ("jpg", row.jpg_path)):
+            if path and (wanted is None or fmt in wanted):
+                # Name entries after the stored file, which may end in .jpeg
+                entries.append((f"{row.certificate_id}.{path.rsplit('.', 1)[-1]}", path))
+    if not entries:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No certificate files match the selection"
+        )
+    
+    filename = f"certificates-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.zip"
+    return StreamingResponse(
+        stream_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get(
+    "/download-zip",
+    summary="Download certificates as a ZIP",
+    description=(
+        "Streams a ZIP of the current user's certificates: the given certificate_ids, "
+        "or every certificate matching the history filters."
+    )
+)
+async def download_certificates_zip(
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(get_current_user),
+    certificate_ids: Optional[List[str]] = Query(None, max_length=1000),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    template_id: Optional[str] = None,
+    course: Optional[str] = None,
+    formats: Optional[str] = Query(None, description="Comma-separated, e.g. pdf,png")
+):
+    """Stream a ZIP of stored certificates; nothing is regenerated or staged on disk."""
+    try:
+        output_formats = [OutputFormat(f.strip()).value for f in formats.split(',') if f.strip()] if formats else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="formats must be pdf, png, jpg or jpeg"
+        )
+    return await _certificate_zip_response(
+        db, current_user, certificate_ids, start_date, end_date, template_id, course, output_formats
+    )
+
+
+@router.post(
+    "/download-zip",
+    summary="Download certificates as a ZIP",
+    description="Same as GET /certificate/download-zip, with the selection in the request body."
+)
+async def download_certificates_zip_post(
+    request: CertificateZipRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(get_current_user)
+):
+    """Stream a ZIP of the certificates selected in the body."""
+    return await _certificate_zip_response(
+        db,
+        current_user,
+        request.certificate_ids,
+        request.start_date,
+        request.end_date,
+        request.template_id,
+        request.course,
+        [fmt.value for fmt in request.formats] if request.formats else None
+    )
 
 
 @router.post(
@@ -491,7 +1042,8 @@ async def preview_certificate(
     # Render HTML with current data
     html_content = rendering_service.render_html(
         template.html_content,
-        request.certificate_data
+        request.certificate_data,
+        template_id=str(template.id)
     )
     
     # Inject position and style overrides if provided
@@ -625,7 +1177,7 @@ async def finalize_certificate(
     # Auto-generate certificate ID if not provided
     cert_data = dict(request.certificate_data)
     if not cert_data.get('certificate_id'):
-        cert_data['certificate_id'] = await generate_unique_certificate_id(db)
+        cert_data['certificate_id'] = (await _allocate_certificate_ids(db, 1))[0]
     else:
         # Check uniqueness if provided
         exists = await certificate_service.check_certificate_id_exists(
@@ -651,7 +1203,8 @@ async def finalize_certificate(
         # First render HTML with overrides
         html_content = rendering_service.render_html(
             template.html_content,
-            cert_data
+            cert_data,
+            template_id=str(template.id)
         )
         
         # Apply position and style overrides
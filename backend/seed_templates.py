@@ -112,7 +112,8 @@ TEMPLATES = [
         "name": "Luxury Marble",
         "description": "High-end marble background with elegant gold framing",
         "file": "luxury_marble_template.html",
-        "thumbnail_url": "/downloads/previews/luxury_marble_preview.png"
+        "thumbnail_url": "/downloads/previews/luxury_marble_preview.png",
+        "render_mode": "layered"
     },
     {
         "name": "Midnight Minimal",
@@ -288,6 +289,7 @@ async def seed_templates():
                     description=tmpl_data["description"],
                     html_content=html_content,
                     thumbnail_url=thumbnail_url,
+                    render_mode=tmpl_data.get("render_mode", "standard"),
                     is_active=True
                 )
                 db.add(template)
@@ -9,6 +9,13 @@ from .certificate_service import (
     storage_service,
     certificate_service
 )
+from .storage import (
+    StorageBackend,
+    StorageError,
+    StorageFileNotFound,
+    create_storage_backend,
+    storage_backend
+)
 
 __all__ = [
     'OTPService',
@@ -19,5 +26,10 @@ __all__ = [
     'CertificateService',
     'rendering_service',
     'storage_service',
-    'certificate_service'
+    'certificate_service',
+    'StorageBackend',
+    'StorageError',
+    'StorageFileNotFound',
+    'create_storage_backend',
+    'storage_backend'
 ]
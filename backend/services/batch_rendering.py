@@ -0,0 +1,76 @@
+"""
+Batch Rendering Helpers
+Several certificates of one template rendered as a single multi-page
+WeasyPrint document (one page per certificate) and split afterwards,
+so the per-document setup cost is paid once per batch.
+"""
+
+import re
+from typing import List, Optional
+
+BATCH_SEPARATOR_CLASS = "cg-batch-break"
+
+# Zero-size element forcing each certificate onto its own page
+_SEPARATOR = (
+    f'<div class="{BATCH_SEPARATOR_CLASS}" '
+    'style="break-before: page; height: 0; margin: 0; padding: 0; border: 0"></div>'
+)
+
+# Repeat body margins, padding and borders on every page, like a standalone render
+BATCH_CSS = "body { box-decoration-break: clone; }"
+
+_BODY_RE = re.compile(r'^(.*?<body\b[^>]*>)(.*)(</body>.*)$', re.DOTALL | re.IGNORECASE)
+
+# Boxes whose geometry legitimately differs between batch and standalone renders
+_CONTAINER_TAGS = ('html', 'body')
+
+
+def combine_documents(html_documents: List[str]) -> Optional[str]:
+    """
+    Join rendered certificates into one document with a page break between them.
+    Returns None when the documents differ outside <body> (they cannot share one head).
+    """
+    parts = []
+    for html_content in html_documents:
+        match = _BODY_RE.match(html_content)
+        if match is None:
+            return None
+        parts.append(match.groups())
+
+    head, _, tail = parts[0]
+    if any(part[0] != head or part[2] != tail for part in parts[1:]):
+        return None
+    return head + _SEPARATOR.join(body for _, body, _ in parts) + tail
+
+
+def _is_container(box) -> bool:
+    if getattr(box, 'element_tag', None) in _CONTAINER_TAGS:
+        return True
+    element = getattr(box, 'element', None)
+    if element is None or not hasattr(element, 'get'):
+        return False
+    return BATCH_SEPARATOR_CLASS in (element.get('class') or '').split()
+
+
+def page_signature(page) -> tuple:
+    """
+    Geometry and text of every box on a page, ignoring the html/body
+    containers and batch separators. A certificate rendered inside a batch
+    matches its standalone render when the signatures are equal.
+    """
+    signature = []
+
+    def walk(box):
+        if not _is_container(box):
+            signature.append((type(box).__name__, getattr(box, 'text', None)) + tuple(
+                round(value, 3) if isinstance(value, (int, float)) else value
+                for value in (
+                    getattr(box, attr, None)
+                    for attr in ('position_x', 'position_y', 'width', 'height')
+                )
+            ))
+        for child in getattr(box, 'children', None) or ():
+            walk(child)
+
+    walk(page._page_box)
+    return tuple(signature)
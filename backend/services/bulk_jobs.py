@@ -0,0 +1,670 @@
+"""
+Bulk Job Service
+Background bulk generation backed by the database, with no external broker.
+Submitting stores one bulk_job_items row per input row and returns at once;
+runner tasks in every app process claim queued jobs, render them in
+concurrent RENDER_BATCH_SIZE batches and publish the ZIP (and combined PDF)
+when the last row is done. A job whose worker stops sending heartbeats is
+resumed by another worker from its first pending row; heartbeats are sent
+from a background task, so a slow chunk never looks like a dead worker.
+"""
+
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Optional, List, Dict, NamedTuple, Any
+
+from sqlalchemy import select, update, insert, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from database import async_session
+from db_models import BulkJob, BulkJobItem, Template
+from services.certificate_service import certificate_service, rendering_service
+from services.bulk_outputs import BulkZipWriter, bulk_file_path, publish_bulk_file, create_bulk_zip
+from services.pdf_tools import CombinedPdfWriter
+from services.storage import storage_backend
+
+settings = get_settings()
+
+# Item rows written per INSERT when a job is submitted
+INSERT_CHUNK_SIZE = 1000
+
+# Job states a worker may claim
+_ACTIVE_STATES = ('queued', 'running')
+
+RESUMED_PDF_NOTE = "Combined PDF unavailable: the job was resumed after a worker restart"
+INPUT_ABANDONED_NOTE = "Upload stopped before completion; only the rows received were processed"
+
+
+class JobRow(NamedTuple):
+    """One submitted row; rows with an error are stored as already failed"""
+    row_index: int
+    certificate_data: Dict[str, Any]
+    error: Optional[str] = None
+    line_number: Optional[int] = None
+
+
+class ClaimLost(Exception):
+    """The job was taken over by another worker (stale heartbeat) or cancelled"""
+
+
+class _JobContext(NamedTuple):
+    job_id: uuid.UUID
+    token: str
+    template: Template  # detached, so rollbacks never expire it
+    output_formats: List[str]
+    user_id: Optional[str]
+    pdf_writer: Optional[CombinedPdfWriter]
+    zip_writer: Optional[BulkZipWriter]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _certificate_id(certificate_data: dict) -> Optional[str]:
+    certificate_id = certificate_data.get('certificate_id')
+    return str(certificate_id)[:50] if certificate_id else None
+
+
+class BulkJobService:
+    """Submission and status queries for background bulk jobs"""
+
+    async def create_job(
+        self,
+        db: AsyncSession,
+        template: Template,
+        output_formats: List[str],
+        user_id: Optional[str] = None,
+        combined_pdf: bool = False,
+        combined_pdf_nup: int = 1,
+        input_complete: bool = True,
+        zip_compression_level: Optional[int] = None
+    ) -> BulkJob:
+        """Add a queued job (rows are added with add_rows, in the same or later transactions)"""
+        job = BulkJob(
+            user_id=uuid.UUID(user_id) if user_id else None,
+            template_id=template.id,
+            status='queued',
+            output_formats=list(output_formats),
+            options={
+                'combined_pdf': combined_pdf,
+                'combined_pdf_nup': combined_pdf_nup,
+                'zip_compression_level': zip_compression_level
+            },
+            input_complete=input_complete
+        )
+        db.add(job)
+        await db.flush()
+        return job
+
+    async def add_rows(self, db: AsyncSession, job_id: uuid.UUID, rows: List[JobRow]):
+        """Store submitted rows and update the job totals"""
+        if not rows:
+            return
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            await db.execute(insert(BulkJobItem), [
+                {
+                    'job_id': job_id,
+                    'row_index': row.row_index,
+                    'line_number': row.line_number,
+                    'certificate_id': _certificate_id(row.certificate_data),
+                    'certificate_data': row.certificate_data,
+                    'status': 'failed' if row.error else 'pending',
+                    'error': row.error
+                }
+                for row in rows[start:start + INSERT_CHUNK_SIZE]
+            ])
+
+        invalid = sum(1 for row in rows if row.error)
+        await db.execute(
+            update(BulkJob)
+            .where(BulkJob.id == job_id)
+            .values(
+                total=BulkJob.total + len(rows),
+                processed=BulkJob.processed + invalid,
+                failed=BulkJob.failed + invalid
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def finish_input(self, db: AsyncSession, job_id: uuid.UUID, error: Optional[str] = None):
+        """Mark that every row of a streamed submission has been added"""
+        values = {'input_complete': True}
+        if error:
+            values['error'] = error
+        await db.execute(
+            update(BulkJob)
+            .where(BulkJob.id == job_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def cancel_job(self, db: AsyncSession, job_id: uuid.UUID, error: str):
+        """Fail a job; its worker stops at the next chunk"""
+        await db.execute(
+            update(BulkJob)
+            .where(BulkJob.id == job_id, BulkJob.status.in_(_ACTIVE_STATES))
+            .values(
+                status='failed',
+                error=error,
+                input_complete=True,
+                claimed_by=None,
+                completed_at=_now()
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def get_job(self, db: AsyncSession, job_id: str) -> Optional[BulkJob]:
+        """Job by ID, or None for unknown or malformed IDs"""
+        try:
+            job_uuid = uuid.UUID(job_id)
+        except (ValueError, TypeError):
+            return None
+        result = await db.execute(select(BulkJob).where(BulkJob.id == job_uuid))
+        return result.scalar_one_or_none()
+
+    async def get_failed_items(self, db: AsyncSession, job_id: uuid.UUID, limit: int = 100) -> List[BulkJobItem]:
+        """First failed rows of a job, in input order"""
+        result = await db.execute(
+            select(BulkJobItem)
+            .where(BulkJobItem.job_id == job_id, BulkJobItem.status == 'failed')
+            .order_by(BulkJobItem.row_index)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def get_items(self, db: AsyncSession, job_id: uuid.UUID, offset: int = 0, limit: int = 100) -> List[BulkJobItem]:
+        """A page of a job's rows, in input order"""
+        result = await db.execute(
+            select(BulkJobItem)
+            .where(BulkJobItem.job_id == job_id)
+            .order_by(BulkJobItem.row_index)
+            .offset(offset)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+
+class BulkJobRunner:
+    """
+    Asyncio tasks that process bulk jobs inside the app process.
+
+    - workers: jobs processed concurrently by this process (0 disables the runner)
+    - poll_seconds: how often idle workers look for queued jobs
+    - stale_seconds: heartbeat age after which another worker may resume a job
+    - input_idle_seconds: how long a job waits for more rows from an
+      unfinished upload before finishing with the rows received
+    """
+
+    def __init__(self, workers: int, poll_seconds: float, stale_seconds: float, input_idle_seconds: float):
+        self.workers = max(0, workers)
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self.input_idle_seconds = input_idle_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._tokens: List[str] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+
+    async def start(self):
+        """Start the worker tasks"""
+        if self.workers == 0:
+            print("Bulk job runner disabled (BULK_JOB_WORKERS=0)")
+            return
+        if self._tasks:
+            return
+
+        self._wakeup = asyncio.Event()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"[:80]
+        self._tokens = [f"{prefix}:{uuid.uuid4().hex[:8]}" for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(token)) for token in self._tokens]
+        print(f"Bulk job runner started with {self.workers} workers")
+
+    async def shutdown(self):
+        """Stop the workers and release their jobs so another process resumes them at once"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self._tokens:
+            try:
+                async with async_session() as db:
+                    await db.execute(
+                        update(BulkJob)
+                        .where(BulkJob.claimed_by.in_(self._tokens))
+                        .values(claimed_by=None)
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            except Exception as e:
+                print(f"Warning: Could not release bulk jobs: {e}")
+            self._tokens = []
+
+    def notify(self):
+        """Wake idle workers after a job was submitted"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _wait(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _worker(self, token: str):
+        while True:
+            try:
+                job_id = await self._claim_job(token)
+            except Exception as e:
+                print(f"Bulk job runner: failed to claim a job: {e}")
+                job_id = None
+
+            if job_id is None:
+                await self._wait()
+                continue
+
+            try:
+                await self._run_job(job_id, token)
+                self.jobs_completed += 1
+            except ClaimLost:
+                print(f"Bulk job {job_id}: taken over or cancelled, stopping")
+            except Exception as e:
+                self.jobs_failed += 1
+                print(f"Bulk job {job_id} failed: {e}")
+                await self._fail_job(job_id, token, str(e))
+
+    def _claimable(self, now: datetime):
+        return or_(
+            BulkJob.claimed_by.is_(None),
+            BulkJob.heartbeat_at < now - timedelta(seconds=self.stale_seconds)
+        )
+
+    async def _claim_job(self, token: str) -> Optional[uuid.UUID]:
+        """Claim the oldest unclaimed (or abandoned) job with a conditional UPDATE"""
+        now = _now()
+        async with async_session() as db:
+            result = await db.execute(
+                select(BulkJob.id)
+                .where(BulkJob.status.in_(_ACTIVE_STATES), self._claimable(now))
+                .order_by(BulkJob.created_at)
+                .limit(10)
+            )
+            for job_id in result.scalars().all():
+                claimed = await db.execute(
+                    update(BulkJob)
+                    .where(
+                        BulkJob.id == job_id,
+                        BulkJob.status.in_(_ACTIVE_STATES),
+                        self._claimable(now)
+                    )
+                    .values(
+                        status='running',
+                        claimed_by=token,
+                        heartbeat_at=now,
+                        started_at=func.coalesce(BulkJob.started_at, now)
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                if claimed.rowcount == 1:
+                    await db.commit()
+                    return job_id
+        return None
+
+    async def _heartbeat(self, db: AsyncSession, ctx: _JobContext, **values) -> None:
+        """Refresh the claim (plus any counter updates); raises ClaimLost if the job moved on"""
+        result = await db.execute(
+            update(BulkJob)
+            .where(
+                BulkJob.id == ctx.job_id,
+                BulkJob.claimed_by == ctx.token,
+                BulkJob.status == 'running'
+            )
+            .values(heartbeat_at=_now(), **values)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            await db.rollback()
+            raise ClaimLost(str(ctx.job_id))
+
+    async def _keep_alive(self, ctx: _JobContext):
+        """
+        Refresh the claim every third of stale_seconds from its own session,
+        while the job's session is busy rendering and saving a chunk. Stops
+        when the claim is lost; the job notices at its next _heartbeat.
+        """
+        interval = max(1.0, self.stale_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with async_session() as db:
+                    result = await db.execute(
+                        update(BulkJob)
+                        .where(
+                            BulkJob.id == ctx.job_id,
+                            BulkJob.claimed_by == ctx.token,
+                            BulkJob.status == 'running'
+                        )
+                        .values(heartbeat_at=_now())
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+                if result.rowcount != 1:
+                    return
+            except Exception as e:
+                print(f"Bulk job {ctx.job_id}: heartbeat failed: {e}")
+
+    async def _next_items(self, db: AsyncSession, job_id: uuid.UUID, limit: int) -> list:
+        result = await db.execute(
+            select(BulkJobItem.id, BulkJobItem.certificate_data)
+            .where(BulkJobItem.job_id == job_id, BulkJobItem.status == 'pending')
+            .order_by(BulkJobItem.row_index)
+            .limit(limit)
+        )
+        return list(result.all())
+
+    async def _run_job(self, job_id: uuid.UUID, token: str):
+        async with async_session() as db:
+            job = await db.get(BulkJob, job_id)
+            template = await rendering_service.get_template(db, str(job.template_id))
+            if template is None:
+                raise ValueError("Template not found")
+            db.expunge(template)
+
+            options = job.options or {}
+            output_formats = list(job.output_formats)
+            user_id = str(job.user_id) if job.user_id else None
+            resumed = await db.scalar(
+                select(func.count())
+                .select_from(BulkJobItem)
+                .where(BulkJobItem.job_id == job_id, BulkJobItem.status == 'done')
+            )
+            await db.commit()
+
+        # A combined PDF must hold every certificate in order, so it is only
+        # written by a worker that starts the job from its first row
+        pdf_writer = pdf_file = pdf_path = pdf_filename = None
+        note = None
+        if options.get('combined_pdf'):
+            if resumed:
+                note = RESUMED_PDF_NOTE
+            else:
+                pdf_filename, pdf_path = bulk_file_path("pdf")
+                pdf_file = open(pdf_path, 'wb')
+                pdf_writer = CombinedPdfWriter(pdf_file, options.get('combined_pdf_nup', 1))
+
+        # Likewise the ZIP is written from rendered files only by a worker that
+        # starts from the first row; a resumed job rebuilds it from storage
+        zip_writer = BulkZipWriter(options.get('zip_compression_level')) if output_formats and not resumed else None
+
+        ctx = _JobContext(job_id, token, template, output_formats, user_id, pdf_writer, zip_writer)
+        combined_pdf_url = zip_url = None
+        zip_closed = False
+        keep_alive = asyncio.create_task(self._keep_alive(ctx))
+        try:
+            await self._process_rows(ctx)
+            if zip_writer is not None:
+                zip_closed = True
+                zip_url = await zip_writer.close()
+            if pdf_writer is not None:
+                pdf_writer.close()
+                pdf_file.close()
+                print(f"Combined PDF: {pdf_writer.pages_added} certificates written to {pdf_filename}")
+                if pdf_writer.pages_added:
+                    try:
+                        combined_pdf_url = await publish_bulk_file(
+                            pdf_path, pdf_filename, "application/pdf", "bulk_pdfs"
+                        )
+                    except Exception as e:
+                        print(f"Error uploading combined PDF: {e}")
+            await self._finish_job(ctx, zip_url, combined_pdf_url, note)
+        finally:
+            keep_alive.cancel()
+            await asyncio.gather(keep_alive, return_exceptions=True)
+            if zip_writer is not None and not zip_closed:
+                await zip_writer.abort()
+            if pdf_file is not None:
+                pdf_file.close()
+                if combined_pdf_url is None:
+                    pdf_path.unlink(missing_ok=True)
+
+    async def _process_rows(self, ctx: _JobContext):
+        """Render pending rows chunk by chunk until the input is complete and nothing is pending"""
+        # One chunk fills every concurrent render slot of the job
+        chunk_size = max(1, settings.RENDER_BATCH_SIZE) * max(1, settings.BULK_RENDER_CONCURRENCY)
+        # Upload activity is measured by the job's row total growing
+        last_total, last_input_at = None, _now()
+        async with async_session() as db:
+            while True:
+                items = await self._next_items(db, ctx.job_id, chunk_size)
+                if items:
+                    await self._process_items(db, ctx, items)
+                    continue
+
+                await self._heartbeat(db, ctx)
+                input_complete, total = (await db.execute(
+                    select(BulkJob.input_complete, BulkJob.total).where(BulkJob.id == ctx.job_id)
+                )).one()
+                await db.commit()
+                if total != last_total:
+                    last_total, last_input_at = total, _now()
+                elif not input_complete and _now() - last_input_at > timedelta(seconds=self.input_idle_seconds):
+                    # The upload feeding this job died; finish with the rows received
+                    await self._heartbeat(db, ctx, input_complete=True, error=INPUT_ABANDONED_NOTE)
+                    await db.commit()
+                    input_complete = True
+                if not input_complete:
+                    # Rows are still being submitted
+                    await asyncio.sleep(self.poll_seconds)
+                elif not await self._next_items(db, ctx.job_id, 1):
+                    await db.commit()
+                    return
+
+    async def _process_items(self, db: AsyncSession, ctx: _JobContext, items: list):
+        """
+        Render and commit one chunk. If the chunk cannot be committed, its rows
+        are retried one by one so only the offending row fails.
+        """
+        try:
+            await self._process_chunk(db, ctx, items)
+        except ClaimLost:
+            raise
+        except Exception as e:
+            await db.rollback()
+            if len(items) > 1:
+                print(f"Bulk job {ctx.job_id}: chunk of {len(items)} rows failed, retrying one by one: {e}")
+                for item in items:
+                    await self._process_items(db, ctx, [item])
+                return
+
+            item_id, certificate_data = items[0]
+            await db.execute(update(BulkJobItem), [
+                self._item_update(item_id, certificate_data, error=str(e))
+            ])
+            await self._heartbeat(
+                db, ctx,
+                processed=BulkJob.processed + 1,
+                failed=BulkJob.failed + 1
+            )
+            await db.commit()
+
+    async def _process_chunk(self, db: AsyncSession, ctx: _JobContext, items: list):
+        updates = []
+        pending = []  # (item_id, cert_dict) rows that passed validation
+        seen_ids = set()
+
+        # Rows are only saved after rendering, so IDs are checked here, with one query per chunk
+        taken_ids = await certificate_service.find_existing_certificate_ids(
+            db,
+            [certificate_data.get('certificate_id') for _, certificate_data in items if certificate_data.get('certificate_id')]
+        )
+
+        for item_id, certificate_data in items:
+            cert_dict = dict(certificate_data)
+            try:
+                if cert_dict.get('certificate_id'):
+                    if cert_dict['certificate_id'] in seen_ids or cert_dict['certificate_id'] in taken_ids:
+                        raise ValueError("Certificate ID already exists")
+                    seen_ids.add(cert_dict['certificate_id'])
+                pending.append((item_id, cert_dict))
+            except Exception as e:
+                updates.append(self._item_update(item_id, cert_dict, error=str(e)))
+
+        # Missing IDs come from one allocated block per chunk
+        unnumbered = [cert_dict for _, cert_dict in pending if not cert_dict.get('certificate_id')]
+        if unnumbered:
+            new_ids = await certificate_service.allocate_certificate_ids(db, len(unnumbered), seen_ids)
+            for cert_dict, cert_id in zip(unnumbered, new_ids):
+                cert_dict['certificate_id'] = cert_id
+
+        # Files for the ZIP and combined PDF are held until the chunk is committed,
+        # so a chunk retried row by row is never written twice
+        chunk_pdfs = []
+        chunk_files = []
+        if pending:
+            outcomes = await certificate_service.generate_certificates(
+                db,
+                ctx.template,
+                [cert_dict for _, cert_dict in pending],
+                ctx.output_formats,
+                ctx.user_id,
+                chunk_pdfs.append if ctx.pdf_writer is not None else None,
+                file_sink=(lambda certificate_id, files: chunk_files.append((certificate_id, files))) if ctx.zip_writer is not None else None
+            )
+            for (item_id, cert_dict), outcome in zip(pending, outcomes):
+                if isinstance(outcome, Exception):
+                    updates.append(self._item_update(item_id, cert_dict, error=str(outcome)))
+                else:
+                    updates.append(self._item_update(item_id, cert_dict, download_urls=outcome))
+
+        failed = sum(1 for values in updates if values['status'] == 'failed')
+        try:
+            await db.execute(update(BulkJobItem), updates)
+            await self._heartbeat(
+                db, ctx,
+                processed=BulkJob.processed + len(updates),
+                successful=BulkJob.successful + len(updates) - failed,
+                failed=BulkJob.failed + failed
+            )
+            await db.commit()
+        except Exception:
+            # The certificate rows roll back with the chunk, so the files already
+            # saved for them would be orphaned (a retried row saves its own again)
+            await self._delete_saved_files(updates)
+            raise
+
+        if chunk_files or chunk_pdfs:
+            await asyncio.to_thread(self._write_outputs, ctx, chunk_files, chunk_pdfs)
+
+    @staticmethod
+    async def _delete_saved_files(updates: list):
+        paths = [
+            storage_backend.path_from_url(url)
+            for values in updates
+            for url in (values['download_urls'] or {}).values()
+        ]
+        paths = [path for path in paths if path]
+        if not paths:
+            return
+        try:
+            await storage_backend.delete(paths)
+        except Exception as e:
+            print(f"Could not delete {len(paths)} files of an uncommitted chunk: {e}")
+
+    @staticmethod
+    def _write_outputs(ctx: _JobContext, chunk_files: list, chunk_pdfs: list):
+        """Append a committed chunk to the job's ZIP and combined PDF"""
+        for certificate_id, files in chunk_files:
+            ctx.zip_writer.add(certificate_id, files)
+        for pdf_bytes in chunk_pdfs:
+            ctx.pdf_writer.add_pdf(pdf_bytes)
+
+    @staticmethod
+    def _item_update(
+        item_id: int,
+        cert_dict: dict,
+        download_urls: Optional[Dict[str, str]] = None,
+        error: Optional[str] = None
+    ) -> dict:
+        return {
+            'id': item_id,
+            'certificate_id': _certificate_id(cert_dict),
+            'status': 'failed' if error else 'done',
+            'error': error,
+            'download_urls': download_urls
+        }
+
+    async def _finish_job(
+        self,
+        ctx: _JobContext,
+        zip_url: Optional[str],
+        combined_pdf_url: Optional[str],
+        note: Optional[str]
+    ):
+        """Mark the job completed, first building the ZIP from storage if the job was resumed"""
+        async with async_session() as db:
+            if ctx.output_formats and ctx.zip_writer is None:
+                result = await db.execute(
+                    select(BulkJobItem.certificate_id, BulkJobItem.download_urls)
+                    .where(BulkJobItem.job_id == ctx.job_id, BulkJobItem.status == 'done')
+                    .order_by(BulkJobItem.row_index)
+                )
+                certificates = [(certificate_id, urls) for certificate_id, urls in result.all()]
+                options = await db.scalar(select(BulkJob.options).where(BulkJob.id == ctx.job_id)) or {}
+                await db.commit()
+                if certificates:
+                    zip_url = await create_bulk_zip(certificates, options.get('zip_compression_level'))
+
+            values = {}
+            if note:
+                # Keep notes recorded while the job ran (e.g. an interrupted upload)
+                error = await db.scalar(select(BulkJob.error).where(BulkJob.id == ctx.job_id))
+                values['error'] = f"{error}; {note}" if error else note
+            await self._heartbeat(
+                db, ctx,
+                status='completed',
+                zip_url=zip_url,
+                combined_pdf_url=combined_pdf_url,
+                completed_at=_now(),
+                claimed_by=None,
+                **values
+            )
+            await db.commit()
+        print(f"Bulk job {ctx.job_id} completed")
+
+    async def _fail_job(self, job_id: uuid.UUID, token: str, error: str):
+        try:
+            async with async_session() as db:
+                await db.execute(
+                    update(BulkJob)
+                    .where(BulkJob.id == job_id, BulkJob.claimed_by == token)
+                    .values(status='failed', error=error, completed_at=_now(), claimed_by=None)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"Warning: Could not mark bulk job {job_id} as failed: {e}")
+
+    def stats(self) -> dict:
+        """Runner counters for monitoring"""
+        return {
+            "workers": len(self._tasks),
+            "jobs_completed": self.jobs_completed,
+            "jobs_failed": self.jobs_failed
+        }
+
+
+# Singleton instances
+bulk_job_service = BulkJobService()
+bulk_job_runner = BulkJobRunner(
+    settings.BULK_JOB_WORKERS,
+    settings.BULK_JOB_POLL_SECONDS,
+    settings.BULK_JOB_STALE_SECONDS,
+    settings.BULK_JOB_INPUT_IDLE_SECONDS
+)
@@ -0,0 +1,314 @@
+"""
+Bulk Output Service
+ZIP archives and combined PDFs produced at the end of a bulk generation,
+shared by the synchronous bulk endpoints and the background job workers,
+and ZIPs of stored certificates streamed straight into a download response
+"""
+
+import asyncio
+import io
+import uuid
+import zipfile
+import zlib
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from config import get_settings
+from services.storage import storage_backend
+
+settings = get_settings()
+
+# Formats that are compressed already; their ZIP entries are stored as-is
+# (WeasyPrint deflates PDF content streams and embeds subset, compressed fonts)
+STORED_FORMATS = {'pdf', 'png', 'jpg', 'jpeg'}
+# Other files are deflated only if a quick level-1 compression of three
+# slices (start, middle, end) shrinks them below COMPRESSION_MIN_RATIO
+COMPRESSION_SAMPLE_SIZE = 16 * 1024
+COMPRESSION_MIN_RATIO = 0.9
+
+
+def bulk_filename(extension: str) -> str:
+    """Unique filename for a bulk download (ZIP or combined PDF)"""
+    return f"bulk-certificates-{uuid.uuid4().hex[:8]}.{extension}"
+
+
+def bulk_file_path(extension: str) -> Tuple[str, Path]:
+    """Unique filename and local path for a bulk download written to disk first (combined PDF)"""
+    filename = bulk_filename(extension)
+
+    # We still need a local place to save the file temporarily
+    storage_path = Path(settings.STORAGE_PATH)
+    storage_path.mkdir(parents=True, exist_ok=True)
+    return filename, storage_path / filename
+
+
+async def publish_bulk_file(local_path: Path, filename: str, content_type: str, folder: str) -> str:
+    """
+    Move a finished bulk file into storage under folder/ and return its
+    download URL. Remote backends upload it (in chunks when large) and the
+    local copy is removed.
+    """
+    rel_path = f"{folder}/{filename}"
+    await storage_backend.put_file(rel_path, local_path, content_type)
+    return (await storage_backend.urls([rel_path]))[rel_path]
+
+
+def zip_compression(fmt: str, file_bytes: bytes, compression_level: int) -> int:
+    """ZIP_STORED or ZIP_DEFLATED for one entry"""
+    if compression_level <= 0 or fmt.lower() in STORED_FORMATS:
+        return zipfile.ZIP_STORED
+    if len(file_bytes) <= 3 * COMPRESSION_SAMPLE_SIZE:
+        sample = file_bytes
+    else:
+        middle = (len(file_bytes) - COMPRESSION_SAMPLE_SIZE) // 2
+        sample = b"".join((
+            file_bytes[:COMPRESSION_SAMPLE_SIZE],
+            file_bytes[middle:middle + COMPRESSION_SAMPLE_SIZE],
+            file_bytes[-COMPRESSION_SAMPLE_SIZE:]
+        ))
+    if not sample or len(zlib.compress(sample, 1)) > len(sample) * COMPRESSION_MIN_RATIO:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _write_entry(archive: zipfile.ZipFile, name: str, file_bytes: bytes, compression_level: int) -> bool:
+    """Add one file, stored or deflated; returns whether it was deflated"""
+    compress_type = zip_compression(name.rsplit('.', 1)[-1], file_bytes, compression_level)
+    deflated = compress_type == zipfile.ZIP_DEFLATED
+    archive.writestr(
+        name,
+        file_bytes,
+        compress_type=compress_type,
+        compresslevel=compression_level if deflated else None
+    )
+    return deflated
+
+
+def _compression_level(compression_level: Optional[int]) -> int:
+    if compression_level is None:
+        compression_level = settings.BULK_ZIP_COMPRESSION_LEVEL
+    return max(0, min(9, compression_level))
+
+
+class BulkZipWriter:
+    """
+    Writes certificate files into a ZIP as they are rendered and uploads the
+    archive while it grows: finished parts go to storage_backend.open_upload
+    (an S3 multipart upload, or a spool file for backends that need the
+    whole file). Memory use is bounded by a few parts whatever the batch
+    size, and nothing is read back from storage. Entries are stored or
+    deflated one by one (see zip_compression); ZIP64 records are written
+    once the archive passes 4 GB or 65535 entries.
+
+    Create it on the event loop; add() must then be called from a worker
+    thread, which blocks while a part is handed to the upload. A failed
+    upload does not fail generation: the writer stops and close() returns None.
+    """
+
+    def __init__(self, compression_level: Optional[int] = None):
+        self.filename = bulk_filename("zip")
+        self.storage_path = f"bulk_zips/{self.filename}"
+        self.compression_level = _compression_level(compression_level)
+        self._loop = asyncio.get_running_loop()
+        self._upload = storage_backend.open_upload(self.storage_path, "application/zip")
+        self._output = _ZipStream()
+        self._zip = zipfile.ZipFile(self._output, 'w', zipfile.ZIP_STORED, allowZip64=True)
+        self._error: Optional[Exception] = None
+        self.files_added = 0
+        self.files_deflated = 0
+
+    def add(self, certificate_id: str, files: Dict[str, bytes]):
+        """Add one certificate's files as <certificate_id>.<format>"""
+        if self._error is not None:
+            return
+        for fmt, file_bytes in files.items():
+            if _write_entry(self._zip, f"{certificate_id}.{fmt}", file_bytes, self.compression_level):
+                self.files_deflated += 1
+            self.files_added += 1
+        self._send_parts()
+
+    def _send_parts(self, final: bool = False):
+        """Hand full parts (and with final=True the rest) to the upload"""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            raise RuntimeError("BulkZipWriter.add must run in a worker thread (asyncio.to_thread)")
+        try:
+            while self._output.pending >= self._upload.part_size or (final and self._output.pending):
+                part = self._output.take(self._upload.part_size)
+                asyncio.run_coroutine_threadsafe(self._upload.write_part(part), self._loop).result()
+        except Exception as e:
+            print(f"Error uploading ZIP: {e}")
+            self._error = e
+            self._output.take()
+
+    def _finish(self):
+        self._zip.close()
+        if self._error is None:
+            self._send_parts(final=True)
+
+    async def close(self) -> Optional[str]:
+        """Finish the archive and return its download URL (None when it is empty or could not be published)"""
+        await asyncio.to_thread(self._finish)
+        print(f"ZIP: {self.files_added} files ({self.files_deflated} deflated) written to {self.filename}")
+        if self.files_added == 0 or self._error is not None:
+            await self._upload.abort()
+            return None
+        try:
+            await self._upload.complete()
+            return (await storage_backend.urls([self.storage_path]))[self.storage_path]
+        except Exception as e:
+            print(f"Error uploading ZIP: {e}")
+            await self._upload.abort()
+            return None
+
+    async def abort(self):
+        """Discard the archive"""
+        self._error = self._error or RuntimeError("aborted")
+        await asyncio.to_thread(self._zip.close)
+        await self._upload.abort()
+
+
+class _ZipStream(io.RawIOBase):
+    """
+    Unseekable write target for a ZipFile; the bytes written so far are
+    taken out with take(). ZipFile then writes a data descriptor after each
+    entry instead of seeking back to its header.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def take(self, size: Optional[int] = None) -> bytes:
+        """The first size bytes written so far (all of them by default)"""
+        size = len(self._buffer) if size is None else min(size, len(self._buffer))
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+async def _prefetch_files(
+    entries: Iterable[Tuple[str, str]],
+    prefetch: Optional[int] = None
+) -> AsyncIterator[Tuple[str, str, Optional[bytes]]]:
+    """
+    Yield (name, relative_path, bytes) for (name, relative_path) entries in
+    order, reading up to `prefetch` files (ZIP_DOWNLOAD_PREFETCH) from
+    storage ahead of the consumer. bytes is None when a file cannot be read.
+    """
+    prefetch = max(1, prefetch or settings.ZIP_DOWNLOAD_PREFETCH)
+
+    def fetch(name: str, relative_path: str):
+        return name, relative_path, asyncio.create_task(storage_backend.get(relative_path))
+
+    remaining = iter(entries)
+    window = deque(fetch(name, path) for name, path in islice(remaining, prefetch))
+    try:
+        while window:
+            name, relative_path, task = window.popleft()
+            try:
+                file_bytes = await task
+            except Exception as e:
+                print(f"ZIP: Failed to read {relative_path}: {e}")
+                file_bytes = None
+            # Start the next read only now, so at most `prefetch` are in flight
+            following = next(remaining, None)
+            if following is not None:
+                window.append(fetch(*following))
+            yield name, relative_path, file_bytes
+    finally:
+        # The consumer went away, or every file was read
+        for _, _, task in window:
+            task.cancel()
+
+
+async def stream_zip(
+    entries: List[Tuple[str, str]],
+    compression_level: Optional[int] = None,
+    prefetch: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Yield a ZIP of stored files piece by piece, for a streaming response.
+    entries holds (archive name, storage relative path). Up to `prefetch`
+    files (ZIP_DOWNLOAD_PREFETCH) are fetched concurrently ahead of the one
+    being written, so memory is bounded by the window and nothing is staged
+    on disk. Files that cannot be read are listed in missing-files.txt.
+    """
+    compression_level = _compression_level(compression_level)
+    output = _ZipStream()
+    archive = zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED, allowZip64=True)
+
+    missing = []
+    async for name, relative_path, file_bytes in _prefetch_files(entries, prefetch):
+        if file_bytes is None:
+            missing.append(name)
+            continue
+        await asyncio.to_thread(_write_entry, archive, name, file_bytes, compression_level)
+        yield output.take()
+
+    if missing:
+        archive.writestr("missing-files.txt", "\n".join(missing) + "\n")
+    archive.close()
+    yield output.take()
+
+
+async def create_bulk_zip(
+    certificates: Iterable[Tuple[str, Dict[str, str]]],
+    compression_level: Optional[int] = None
+) -> Optional[str]:
+    """
+    Create a ZIP of generated certificates from storage and return its download URL.
+    certificates holds (certificate_id, download_urls) for each successful row.
+    Only used when the rendered files are no longer at hand (a resumed bulk job);
+    otherwise BulkZipWriter is fed as certificates are generated.
+    """
+    try:
+        writer = BulkZipWriter(compression_level)
+    except Exception as e:
+        print(f"Error creating ZIP: {e}")
+        return None
+
+    def entries():
+        for certificate_id, download_urls in certificates:
+            for fmt, url in (download_urls or {}).items():
+                relative_path = storage_backend.path_from_url(url)
+                if not relative_path:
+                    print(f"ZIP: Could not determine relative path from URL: {url}")
+                    continue
+                yield f"{certificate_id}.{fmt}", relative_path
+
+    try:
+        async for name, relative_path, file_bytes in _prefetch_files(entries()):
+            if file_bytes:
+                certificate_id, fmt = name.rsplit(".", 1)
+                await asyncio.to_thread(writer.add, certificate_id, {fmt: file_bytes})
+            elif file_bytes is not None:
+                print(f"ZIP: File bytes empty for {relative_path}")
+    except Exception as e:
+        print(f"Error creating ZIP: {e}")
+        await writer.abort()
+        return None
+
+    if writer.files_added == 0:
+        print("ZIP: WARNING - No files were added to the ZIP archive.")
+    return await writer.close()
@@ -0,0 +1,170 @@
+"""
+Certificate ID Allocator
+Hands out NH-YYYY-NNNNN certificate IDs from a per-year counter row in the
+database. Reserving a block of IDs is a single upsert round trip, the counter
+is shared by every worker process and node, and numbers that are already
+taken (older random IDs or user-supplied ones) are skipped with one lookup
+per block.
+"""
+
+from datetime import datetime
+from typing import Iterable, List, Set
+
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session, dialect_insert
+from db_models import Certificate, CertificateIdCounter
+
+ID_PREFIX = "NH"
+ID_DIGITS = 5
+ID_SPACE = 10 ** ID_DIGITS  # NH-YYYY-00001 .. NH-YYYY-99999
+
+# Log a warning once a year's counter passes this share of the space
+_WARN_RATIO = 0.9
+
+# Certificate IDs per IN (...) lookup
+_LOOKUP_CHUNK_SIZE = 500
+
+# Certificate rows per multi-row INSERT (stays under SQLite's bound parameter limit)
+_INSERT_CHUNK_SIZE = 500
+
+
+class CertificateIdsExhausted(Exception):
+    """Every NH-YYYY-NNNNN number of the year has been handed out"""
+
+    def __init__(self, year: int):
+        super().__init__(
+            f"Certificate ID space for {year} is exhausted "
+            f"({format_certificate_id(year, 1)} to {format_certificate_id(year, ID_SPACE - 1)} are used). "
+            "Provide certificate_id values explicitly."
+        )
+        self.year = year
+
+
+def format_certificate_id(year: int, number: int) -> str:
+    return f"{ID_PREFIX}-{year}-{number:0{ID_DIGITS}d}"
+
+
+async def existing_certificate_ids(db: AsyncSession, certificate_ids: Iterable[str]) -> Set[str]:
+    """The given certificate IDs that already exist, in one query per 500 IDs"""
+    certificate_ids = list(dict.fromkeys(certificate_ids))
+    existing = set()
+    for start in range(0, len(certificate_ids), _LOOKUP_CHUNK_SIZE):
+        result = await db.execute(
+            select(Certificate.certificate_id)
+            .where(Certificate.certificate_id.in_(certificate_ids[start:start + _LOOKUP_CHUNK_SIZE]))
+        )
+        existing.update(result.scalars().all())
+    return existing
+
+
+async def insert_certificates(db: AsyncSession, rows: List[dict]) -> Set[str]:
+    """
+    Insert Certificate rows with multi-row INSERT ... ON CONFLICT DO NOTHING
+    and return the certificate IDs that were inserted. Rows whose
+    certificate_id was taken in the meantime are skipped instead of failing
+    the whole transaction.
+    """
+    upsert = dialect_insert()
+    inserted = set()
+    if upsert is None:
+        for row in rows:
+            try:
+                async with db.begin_nested():
+                    await db.execute(insert(Certificate).values(**row))
+                inserted.add(row['certificate_id'])
+            except IntegrityError:
+                continue
+        return inserted
+
+    for start in range(0, len(rows), _INSERT_CHUNK_SIZE):
+        result = await db.execute(
+            upsert(Certificate)
+            .values(rows[start:start + _INSERT_CHUNK_SIZE])
+            .on_conflict_do_nothing(index_elements=[Certificate.certificate_id])
+            .returning(Certificate.certificate_id)
+        )
+        inserted.update(result.scalars().all())
+    return inserted
+
+
+class CertificateIdAllocator:
+    """Block allocation of sequential certificate IDs from the certificate_id_counters table"""
+
+    def _upsert(self, year: int, count: int):
+        """INSERT ... ON CONFLICT DO UPDATE ... RETURNING for dialects that support it"""
+        upsert = dialect_insert()
+        if upsert is None:
+            return None
+        return (
+            upsert(CertificateIdCounter)
+            .values(year=year, next_value=1 + count)
+            .on_conflict_do_update(
+                index_elements=[CertificateIdCounter.year],
+                set_={'next_value': CertificateIdCounter.next_value + count}
+            )
+            .returning(CertificateIdCounter.next_value)
+        )
+
+    async def _reserve(self, year: int, count: int) -> range:
+        """
+        Advance the year's counter by count and return the reserved numbers.
+        Runs in its own short transaction so the counter row is never locked
+        for the length of a bulk request; numbers of rolled-back requests are
+        simply skipped.
+        """
+        async with async_session() as session:
+            stmt = self._upsert(year, count)
+            if stmt is not None:
+                end = (await session.execute(stmt)).scalar_one()
+            else:
+                end = await self._reserve_generic(session, year, count)
+            await session.commit()
+        return range(end - count, end)
+
+    async def _reserve_generic(self, session: AsyncSession, year: int, count: int) -> int:
+        """UPDATE ... RETURNING, creating the year's row on first use"""
+        for _ in range(2):
+            end = (await session.execute(
+                update(CertificateIdCounter)
+                .where(CertificateIdCounter.year == year)
+                .values(next_value=CertificateIdCounter.next_value + count)
+                .returning(CertificateIdCounter.next_value)
+                .execution_options(synchronize_session=False)
+            )).scalar_one_or_none()
+            if end is not None:
+                return end
+            try:
+                async with session.begin_nested():
+                    await session.execute(insert(CertificateIdCounter).values(year=year, next_value=1 + count))
+                return 1 + count
+            except IntegrityError:
+                continue  # Another worker created the row first
+        raise RuntimeError(f"Could not reserve certificate IDs for {year}")
+
+    async def allocate(self, db: AsyncSession, count: int, exclude: Iterable[str] = ()) -> List[str]:
+        """
+        Return count new, unused certificate IDs for the current year.
+        exclude holds IDs claimed by the same request but not saved yet.
+        Raises CertificateIdsExhausted when the year's 5-digit space runs out.
+        """
+        year = datetime.now().year
+        exclude = set(exclude)
+        ids = []
+        while len(ids) < count:
+            numbers = await self._reserve(year, count - len(ids))
+            if numbers.stop > ID_SPACE * _WARN_RATIO >= numbers.start:
+                print(f"WARNING: Over {int(_WARN_RATIO * 100)}% of {year} certificate IDs are allocated")
+
+            candidates = [format_certificate_id(year, number) for number in numbers if number < ID_SPACE]
+            taken = await existing_certificate_ids(db, candidates) if candidates else set()
+            ids.extend(cert_id for cert_id in candidates if cert_id not in taken and cert_id not in exclude)
+            if len(candidates) < len(numbers) and len(ids) < count:
+                raise CertificateIdsExhausted(year)
+        return ids
+
+
+# Singleton instance
+certificate_id_allocator = CertificateIdAllocator()
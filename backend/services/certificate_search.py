@@ -0,0 +1,259 @@
+"""
+Certificate Search
+Full-text search over the denormalized student_name / course_name columns of
+certificates. Postgres uses a generated, weighted tsvector column with a GIN
+index plus, when pg_trgm is available, a trigram index for substring matches
+on student names; SQLite uses an FTS5 table kept in sync by triggers. Other
+databases, and Postgres until backfill_search_columns.py has built the index,
+fall back to ILIKE. The backfill copies the fields of older rows out of
+certificate_data.
+"""
+
+import re
+from typing import Optional
+
+from sqlalchemy import bindparam, or_, select, text, update
+
+from database import LIKE_ESCAPE, _create_index, async_session, contains_pattern, engine
+from db_models import Certificate
+
+# Rows updated per backfill transaction
+BACKFILL_BATCH_SIZE = 1000
+
+# Run by backfill_search_columns.py, not at startup: adding a stored generated
+# column rewrites the table under an ACCESS EXCLUSIVE lock.
+# Student name weighs A, course name B, so one vector serves both column filters
+POSTGRES_SEARCH_COLUMN_DDL = (
+    "ALTER TABLE certificates ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(student_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(course_name, '')), 'B')) STORED"
+)
+# (name, definition) for database._create_index, built CONCURRENTLY
+POSTGRES_SEARCH_INDEX = ("idx_certificates_search", "certificates USING GIN (search_vector)")
+POSTGRES_TRIGRAM_INDEX = ("idx_certificates_student_trgm", "certificates USING GIN (student_name gin_trgm_ops)")
+
+# External-content FTS5 table over certificates.rowid. VACUUM can renumber the
+# rowids of a table without an INTEGER PRIMARY KEY; backfill_search_columns.py
+# rebuilds the index afterwards.
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS certificates_fts USING fts5("
+    "student_name, course_name, content='certificates', content_rowid='rowid', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS certificates_fts_insert AFTER INSERT ON certificates BEGIN "
+    "INSERT INTO certificates_fts(rowid, student_name, course_name) "
+    "VALUES (new.rowid, new.student_name, new.course_name); END",
+    "CREATE TRIGGER IF NOT EXISTS certificates_fts_delete AFTER DELETE ON certificates BEGIN "
+    "INSERT INTO certificates_fts(certificates_fts, rowid, student_name, course_name) "
+    "VALUES ('delete', old.rowid, old.student_name, old.course_name); END",
+    "CREATE TRIGGER IF NOT EXISTS certificates_fts_update AFTER UPDATE OF student_name, course_name ON certificates BEGIN "
+    "INSERT INTO certificates_fts(certificates_fts, rowid, student_name, course_name) "
+    "VALUES ('delete', old.rowid, old.student_name, old.course_name); "
+    "INSERT INTO certificates_fts(rowid, student_name, course_name) "
+    "VALUES (new.rowid, new.student_name, new.course_name); END",
+]
+
+
+def _terms(value: Optional[str]) -> list:
+    return re.findall(r'\w+', value or '')
+
+
+class CertificateSearch:
+    """Builds search filters for the configured database and keeps its index set up"""
+
+    def __init__(self):
+        self.fts_available = False
+        # Trigram index for substring matches on student names (Postgres only)
+        self.trigram_available = False
+
+    async def ensure_index(self):
+        """
+        Called at startup. On SQLite creates the FTS5 table and its triggers
+        (idempotent; each statement in its own transaction). On Postgres only
+        checks which search objects setup_index() has already built.
+        """
+        dialect = engine.dialect.name
+        if dialect == "postgresql":
+            await self._detect_postgres_index()
+            if not self.fts_available:
+                print("Certificate search uses ILIKE until backfill_search_columns.py builds the search index")
+        elif dialect == "sqlite":
+            created = True
+            for stmt in SQLITE_SEARCH_DDL:
+                try:
+                    async with engine.begin() as conn:
+                        await conn.execute(text(stmt))
+                except Exception as e:
+                    created = False
+                    print(f"Warning: Could not set up certificate search ({e}); falling back to ILIKE")
+                    break
+            self.fts_available = created
+
+    async def _detect_postgres_index(self):
+        """Look up which valid search indexes exist"""
+        try:
+            async with engine.connect() as conn:
+                valid = set((await conn.execute(
+                    text(
+                        "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                        "WHERE i.indisvalid AND c.relname IN (:search, :trigram)"
+                    ),
+                    {"search": POSTGRES_SEARCH_INDEX[0], "trigram": POSTGRES_TRIGRAM_INDEX[0]}
+                )).scalars())
+        except Exception as e:
+            print(f"Warning: Could not check the certificate search indexes: {e}")
+            valid = set()
+        self.fts_available = POSTGRES_SEARCH_INDEX[0] in valid
+        self.trigram_available = POSTGRES_TRIGRAM_INDEX[0] in valid
+
+    async def setup_index(self):
+        """
+        Build the search objects (maintenance step, see backfill_search_columns.py).
+        On Postgres adds the search_vector column, then builds its GIN index and
+        the trigram index CONCURRENTLY. The trigram index is optional: without
+        pg_trgm, search still uses search_vector.
+        """
+        if engine.dialect.name != "postgresql":
+            await self.ensure_index()
+            return
+
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(POSTGRES_SEARCH_COLUMN_DDL))
+        except Exception as e:
+            print(f"Warning: Could not add the search_vector column: {e}")
+        else:
+            await _create_index(*POSTGRES_SEARCH_INDEX)
+
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        except Exception as e:
+            print(f"Warning: Could not enable pg_trgm, student names are matched by word: {e}")
+        else:
+            await _create_index(*POSTGRES_TRIGRAM_INDEX)
+
+        await self._detect_postgres_index()
+
+    def filters(
+        self,
+        q: Optional[str] = None,
+        student: Optional[str] = None,
+        course: Optional[str] = None
+    ) -> list:
+        """
+        WHERE clauses matching certificates. Every word must match (as a word
+        prefix): q in the student or course name, student in the student name,
+        course in the course name.
+        """
+        q_terms, student_terms, course_terms = _terms(q), _terms(student), _terms(course)
+        if not (q_terms or student_terms or course_terms):
+            return []
+
+        dialect = engine.dialect.name
+        if self.fts_available and dialect == "sqlite":
+            return [self._sqlite_filter(q_terms, student_terms, course_terms)]
+        if self.fts_available and dialect == "postgresql":
+            return self._postgres_filters(q_terms, student, student_terms, course_terms, self.trigram_available)
+        return self._like_filters(q_terms, student_terms, course_terms)
+
+    @staticmethod
+    def _sqlite_filter(q_terms: list, student_terms: list, course_terms: list):
+        expression = " AND ".join(
+            [f'"{term}"*' for term in q_terms]
+            + [f'student_name : "{term}"*' for term in student_terms]
+            + [f'course_name : "{term}"*' for term in course_terms]
+        )
+        return text(
+            "certificates.rowid IN (SELECT rowid FROM certificates_fts WHERE certificates_fts MATCH :expression)"
+        ).bindparams(bindparam("expression", expression))
+
+    @staticmethod
+    def _postgres_filters(
+        q_terms: list,
+        student: Optional[str],
+        student_terms: list,
+        course_terms: list,
+        trigram: bool
+    ) -> list:
+        filters = []
+        query = " & ".join(
+            [f"{term}:*" for term in q_terms]
+            + ([] if trigram else [f"{term}:*A" for term in student_terms])
+            + [f"{term}:*B" for term in course_terms]
+        )
+        if query:
+            filters.append(
+                text("certificates.search_vector @@ to_tsquery('simple', :tsquery)")
+                .bindparams(bindparam("tsquery", query.lower()))
+            )
+        if trigram and student and student.strip():
+            # Substring match on the name, served by the trigram index
+            filters.append(Certificate.student_name.ilike(contains_pattern(student.strip()), escape=LIKE_ESCAPE))
+        return filters
+
+    @staticmethod
+    def _like_filters(q_terms: list, student_terms: list, course_terms: list) -> list:
+        def contains(column, term: str):
+            return column.ilike(contains_pattern(term), escape=LIKE_ESCAPE)
+
+        filters = []
+        for term in q_terms:
+            filters.append(or_(
+                contains(Certificate.student_name, term),
+                contains(Certificate.course_name, term)
+            ))
+        filters.extend(contains(Certificate.student_name, term) for term in student_terms)
+        filters.extend(contains(Certificate.course_name, term) for term in course_terms)
+        return filters
+
+    async def backfill(self, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+        """
+        Copy student_name, course_name and issue_date out of certificate_data
+        for rows created before the columns existed. Works in batches of
+        batch_size rows, each in its own transaction; returns the rows updated.
+        """
+        data = Certificate.certificate_data
+        updated = 0
+        last_id = None
+        while True:
+            async with async_session() as db:
+                query = (
+                    select(
+                        Certificate.id,
+                        data['student_name'].as_string(),
+                        data['course_name'].as_string(),
+                        data['issue_date'].as_string()
+                    )
+                    .where(Certificate.student_name.is_(None))
+                    .order_by(Certificate.id)
+                    .limit(batch_size)
+                )
+                if last_id is not None:
+                    query = query.where(Certificate.id > last_id)
+                rows = (await db.execute(query)).all()
+                if not rows:
+                    break
+
+                await db.execute(update(Certificate), [
+                    {
+                        'id': row_id,
+                        # '' marks rows without a name so they are not picked up again
+                        'student_name': (student_name or '')[:255],
+                        'course_name': (course_name or '')[:255] or None,
+                        'issue_date': (issue_date or '')[:20] or None
+                    }
+                    for row_id, student_name, course_name, issue_date in rows
+                ])
+                await db.commit()
+                updated += len(rows)
+                last_id = rows[-1][0]
+                print(f"Search backfill: {updated} certificates updated")
+
+        if engine.dialect.name == "sqlite" and self.fts_available:
+            async with engine.begin() as conn:
+                await conn.execute(text("INSERT INTO certificates_fts(certificates_fts) VALUES ('rebuild')"))
+        return updated
+
+
+# Singleton instance
+certificate_search = CertificateSearch()
@@ -3,24 +3,206 @@ Certificate Rendering Service
 Handles template loading, rendering, and format conversion
 """
 
+import asyncio
 import os
 import io
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+from contextlib import closing
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, List, Dict
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from typing import Optional, List, Dict, NamedTuple, Callable, Any, Union, Iterable
+from jinja2 import Environment, FileSystemLoader, select_autoescape, Template as JinjaTemplate
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
-from urllib.parse import unquote
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 from db_models import Template, Certificate
 from config import get_settings
+from services.render_pool import render_pool
+from services.rasterizers import Rasterizer, get_rasterizer
+from services.render_metrics import render_metrics
+from services.stats import stats_service
+from services.storage import StorageBackend, StorageError, storage_backend
+from services.certificate_ids import certificate_id_allocator, existing_certificate_ids, insert_certificates
+from services.layered_rendering import (
+    STATIC_LAYER_CSS,
+    mark_variables,
+    strip_variable_markers,
+    static_layer_key,
+    iter_variables,
+    static_content_hash
+)
+from services.pdf_tools import overlay_on_form, split_pdf_pages
+from services.variable_layer import (
+    VariableLayout,
+    VariableLayoutUnsupported,
+    build_variable_layout,
+    fits_layout,
+    variable_html
+)
+from services.batch_rendering import BATCH_CSS, combine_documents, page_signature
+from services.raster_fast_path import (
+    RasterTemplate,
+    RasterFastPathUnsupported,
+    build_raster_template,
+    composite
+)
 
 settings = get_settings()
 
 
+class CompiledTemplateCache:
+    """
+    LRU cache of compiled Jinja2 templates (and other per-template artifacts
+    such as parsed stylesheets).
+    Entries are keyed by template ID plus a hash of the HTML source, so an
+    edited template can never be served from a stale compilation, in any
+    process, without explicit invalidation; old versions simply age out.
+    """
+    
+    def __init__(self, max_size: int = 64):
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[tuple, JinjaTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def content_hash(html_content: str) -> str:
+        """Stable hash of template source used as the version part of the key"""
+        return hashlib.sha1(html_content.encode('utf-8')).hexdigest()
+    
+    def get_or_create(self, key: tuple, factory: Callable[[], Any]) -> Any:
+        """Return the cached value for key, building it with factory() on a miss"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        
+        # Build outside the lock; a concurrent duplicate build is harmless
+        value = factory()
+        
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+    
+    def get(self, key: tuple) -> Any:
+        """Return the cached value for key, or None (without counting a miss)"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return value
+    
+    def get_or_compile(
+        self,
+        env: Environment,
+        html_content: str,
+        template_id: Optional[str] = None
+    ) -> JinjaTemplate:
+        """Return a compiled template, compiling and caching it on a miss"""
+        key = (template_id or "", self.content_hash(html_content))
+        return self.get_or_create(key, lambda: env.from_string(html_content))
+    
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+# Shared by every RenderingService instance in the process
+template_cache = CompiledTemplateCache(settings.TEMPLATE_CACHE_SIZE)
+
+# Parsed WeasyPrint stylesheets; lives in whichever process renders PDFs
+stylesheet_cache = CompiledTemplateCache(settings.TEMPLATE_CACHE_SIZE)
+
+# Static layers and value blocks of "layered" templates; also per rendering process
+static_layer_cache = CompiledTemplateCache(settings.TEMPLATE_CACHE_SIZE)
+
+# Rasterized static layers and text slots for the raster fast path (large; keep few)
+raster_template_cache = CompiledTemplateCache(settings.RASTER_CACHE_SIZE)
+
+# Whether a template version lays out the same inside a batch document (True / False),
+# keyed by RenderedDocument.layout_key
+batch_layout_cache = CompiledTemplateCache(settings.TEMPLATE_CACHE_SIZE)
+
+# Plain <style> blocks (no media/other attributes) that can move out of the document
+_STYLE_BLOCK_RE = re.compile(
+    r'<style(?:\s+type=["\']text/css["\'])?\s*>(.*?)</style\s*>',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Markup WeasyPrint turns into presentational hints (author origin, specificity 0)
+_PRESENTATIONAL_HINT_RE = re.compile(
+    r'<(?:center|font)\b'
+    r'|<(?:ol|ul|li)\b[^>]*\stype\s*='
+    r'|<[a-z][^>]*\s(?:align|valign|background|bgcolor|border|bordercolor|cellpadding|cellspacing'
+    r'|color|face|size|text|width|height|hspace|vspace|clear|frame|frameborder|noshade|nowrap'
+    r'|rules|wrap|marginwidth|marginheight|leftmargin|rightmargin|topmargin|bottommargin)\s*=',
+    re.IGNORECASE
+)
+
+
+def extract_inline_styles(html_content: str, css_content: Optional[str] = None) -> tuple:
+    """
+    Split template HTML into (html_without_styles, css_text).
+    The extracted CSS is applied as a user stylesheet (write_pdf(stylesheets=...)),
+    while a <style> block is author CSS. That only renders the same when nothing
+    else competes with it at author or user origin, so returns (html_content, None)
+    when the template also has css_content (user CSS that the <style> rules
+    outrank), !important rules (which would now outrank style attributes),
+    presentational hints (which would now outrank the <style> rules), Jinja
+    inside a style block, a style block with attributes, or linked stylesheets.
+    """
+    blocks = _STYLE_BLOCK_RE.findall(html_content)
+    if not blocks or css_content:
+        return html_content, None
+    
+    if html_content.lower().count('<style') != len(blocks) or '<link' in html_content.lower():
+        return html_content, None
+    
+    if any('{{' in block or '{%' in block or '!important' in block.lower() for block in blocks):
+        return html_content, None
+    
+    body_html = _STYLE_BLOCK_RE.sub('', html_content)
+    if _PRESENTATIONAL_HINT_RE.search(body_html):
+        return html_content, None
+    
+    return body_html, "\n".join(blocks)
+
+
+class RenderedDocument(NamedTuple):
+    """HTML ready for WeasyPrint plus the stylesheet to apply to it"""
+    html: str
+    css: Optional[str]
+    stylesheet_key: Optional[tuple]
+    layer_key: Optional[tuple] = None  # Set when variables are marked for layered rendering
+    layout_key: Optional[tuple] = None  # Template version plus stylesheet, with or without CSS
+
+
 class RenderingService:
     """Service for certificate rendering operations"""
     
@@ -33,6 +215,8 @@ class RenderingService:
             loader=FileSystemLoader(str(template_path)),
             autoescape=select_autoescape(['html', 'xml'])
         )
+        self._rasterizer: Optional[Rasterizer] = None
+        self._font_config = None
     
     async def get_template(self, db: AsyncSession, template_id: str) -> Optional[Template]:
         """Get template by ID from database"""
@@ -51,40 +235,124 @@ class RenderingService:
         result = await db.execute(stmt)
         return list(result.scalars().all())
     
-    def render_html(self, html_content: str, data: dict) -> str:
+    def render_html(self, html_content: str, data: dict, template_id: Optional[str] = None) -> str:
         """
         Render template HTML with provided data.
-        Uses Jinja2 template syntax.
+        Uses Jinja2 template syntax. Compiled templates are cached per
+        template ID and content hash.
         """
-        # Create template from string
-        template = self.jinja_env.from_string(html_content)
+        template = template_cache.get_or_compile(self.jinja_env, html_content, template_id)
         
-        # Prepare data with image handling
+        with render_metrics.timer("html_render"):
+            return template.render(**self._prepare_render_data(data))
+    
+    def _prepare_render_data(self, data: dict) -> dict:
+        """Prepare data with image handling"""
         # Pass both logo_url and logo_image for template compatibility
         logo_value = data.get('logo_url') or None
         signature_value = data.get('signature_image_url') or None
         
-        render_data = {
+        return {
             **data,
             'logo_url': logo_value,
             'logo_image': logo_value,
             'signature_image': signature_value,
             'signature_image_url': signature_value
         }
+    
+    def render_document(
+        self,
+        html_content: str,
+        data: dict,
+        template_id: Optional[str] = None,
+        css_content: Optional[str] = None,
+        layered: bool = False
+    ) -> RenderedDocument:
+        """
+        Render template HTML for PDF output.
+        Inline <style> blocks are extracted once when the template is compiled,
+        so each render only produces the variable body and the stylesheet can
+        be parsed once per template version (see render_pdf).
+        With layered=True variable values are marked for render_layered_pdf.
+        """
+        version = template_cache.content_hash(html_content)
+        key = (template_id or "", version, "body", bool(css_content))
+        
+        def compile_body():
+            body_html, inline_css = extract_inline_styles(html_content, css_content)
+            return self.jinja_env.from_string(body_html), inline_css
+        
+        body_template, inline_css = template_cache.get_or_create(key, compile_body)
+        
+        render_data = self._prepare_render_data(data)
+        with render_metrics.timer("html_render"):
+            html = body_template.render(**(mark_variables(render_data) if layered else render_data))
+        
+        # At most one of them is set: <style> blocks only move out without css_content
+        css = inline_css or css_content or None
+        stylesheet_key = None
+        if css:
+            stylesheet_key = (template_id or "", version, CompiledTemplateCache.content_hash(css))
         
-        return template.render(**render_data)
+        layer_key = None
+        if layered:
+            layer_key = static_layer_key(template_id, version, stylesheet_key, render_data)
+        layout_key = stylesheet_key or (template_id or "", version, None)
+        return RenderedDocument(html, css, stylesheet_key, layer_key, layout_key)
 
-    def render_pdf(self, html_content: str, css_content: str = None) -> bytes:
+    def get_template_cache_stats(self) -> dict:
+        """Get compiled template cache counters"""
+        return template_cache.stats()
+
+    @property
+    def font_config(self):
+        """Shared WeasyPrint FontConfiguration so fonts are not reloaded per render"""
+        if self._font_config is None:
+            from weasyprint.text.fonts import FontConfiguration
+            self._font_config = FontConfiguration()
+        return self._font_config
+    
+    def _get_stylesheet(self, css_content: str, stylesheet_key: Optional[tuple]):
+        """Parse CSS once per template version; unkeyed CSS is parsed every time"""
+        from weasyprint import CSS
+        
+        parsed = []
+        
+        def parse():
+            parsed.append(True)
+            with render_metrics.timer("stylesheet_parse"):
+                return CSS(string=css_content, font_config=self.font_config)
+        
+        if stylesheet_key is None:
+            return parse()
+        
+        stylesheet = stylesheet_cache.get_or_create(stylesheet_key, parse)
+        if not parsed:
+            render_metrics.record("stylesheet_cache_hit")
+        return stylesheet
+    
+    def render_pdf(
+        self,
+        html_content: str,
+        css_content: str = None,
+        stylesheet_key: Optional[tuple] = None
+    ) -> bytes:
         """
         Render HTML content to PDF using WeasyPrint.
+        Pass stylesheet_key (from render_document) to reuse the parsed CSS.
         """
         try:
-            from weasyprint import HTML, CSS
+            from weasyprint import HTML
             html = HTML(string=html_content)
             stylesheets = []
             if css_content:
-                stylesheets.append(CSS(string=css_content))
-            return html.write_pdf(stylesheets=stylesheets, presentational_hints=True)
+                stylesheets.append(self._get_stylesheet(css_content, stylesheet_key))
+            with render_metrics.timer("pdf_render"):
+                return html.write_pdf(
+                    stylesheets=stylesheets,
+                    presentational_hints=True,
+                    font_config=self.font_config
+                )
         except Exception as e:
             error_str = str(e)
             print(f"CRITICAL ERROR: PDF generation failed: {error_str}")
@@ -93,98 +361,390 @@ class RenderingService:
                 detail=f"PDF generation failed: {error_str}. Ensure system dependencies (libpango, libcairo, etc.) are installed."
             )
     
+    def _layer_stylesheet(self, css_content: str, name: str):
+        """Parsed layer stylesheet (constant per process)"""
+        return self._get_stylesheet(css_content, ("__layer__", name))
+    
+    def _build_variable_layout(
+        self,
+        html_content: str,
+        stylesheets: list,
+        template_id: str
+    ) -> VariableLayout:
+        """Lay out the static layer once, keep its page and measure the value blocks"""
+        from weasyprint import HTML
+        
+        def render_static(html: str):
+            return HTML(string=html).render(
+                stylesheets=stylesheets + [self._layer_stylesheet(STATIC_LAYER_CSS, "static")],
+                presentational_hints=True,
+                font_config=self.font_config
+            )
+        
+        def render_variables(css: str, html: str):
+            return HTML(string=html).render(stylesheets=[self._get_stylesheet(css, None)], font_config=self.font_config)
+        
+        try:
+            with render_metrics.timer("static_layer_render"):
+                return build_variable_layout(html_content, render_static, render_variables)
+        except VariableLayoutUnsupported as e:
+            print(f"Layered rendering disabled for template {template_id}: {e}")
+            return VariableLayout(None, "", {}, str(e))
+        except Exception as e:
+            # Anything else (e.g. changed WeasyPrint internals) would fail again for
+            # every certificate, so the template is cached as disabled too
+            reason = f"{type(e).__name__}: {e}"
+            print(f"Layered rendering disabled for template {template_id} after an unexpected error: {reason}")
+            return VariableLayout(None, "", {}, reason)
+    
+    def render_layered_pdf(
+        self,
+        html_content: str,
+        css_content: Optional[str],
+        stylesheet_key: Optional[tuple],
+        layer_key: tuple
+    ) -> bytes:
+        """
+        Render a certificate of a "layered" template (HTML from render_document
+        with layered=True). The static layer is laid out once per layer_key and
+        static content, and its page is cached as a form XObject. Each
+        certificate only lays out its values at the measured positions (see
+        services/variable_layer.py), drawn over the cached page. Templates and
+        certificates the variable layer cannot reproduce get a standard render.
+        """
+        try:
+            from weasyprint import HTML
+            stylesheets = []
+            if css_content:
+                stylesheets.append(self._get_stylesheet(css_content, stylesheet_key))
+            
+            key = layer_key + (static_content_hash(html_content),)
+            layout = static_layer_cache.get_or_create(
+                key,
+                lambda: self._build_variable_layout(html_content, stylesheets, layer_key[0])
+            )
+            if layout.form is None:
+                render_metrics.record("layered_unsupported")
+                return self.render_pdf(strip_variable_markers(html_content), css_content, stylesheet_key)
+            
+            html = variable_html(layout, iter_variables(html_content))
+            document = None
+            if html is not None:
+                with render_metrics.timer("variable_layout"):
+                    document = HTML(string=html).render(
+                        stylesheets=[self._get_stylesheet(layout.css, ("__variables__",) + key)],
+                        font_config=self.font_config
+                    )
+            if document is None or not fits_layout(layout, document):
+                render_metrics.record("layered_fallback")
+                return self.render_pdf(strip_variable_markers(html_content), css_content, stylesheet_key)
+            
+            render_metrics.record("layered_hit")
+            with render_metrics.timer("pdf_render"):
+                variable_pdf = document.write_pdf()
+            with render_metrics.timer("layer_merge"):
+                return overlay_on_form(variable_pdf, layout.form)
+        except HTTPException:
+            raise
+        except Exception as e:
+            error_str = str(e)
+            print(f"CRITICAL ERROR: Layered PDF generation failed: {error_str}")
+            raise HTTPException(
+                status_code=500, 
+                detail=f"PDF generation failed: {error_str}. Ensure system dependencies (libpango, libcairo, etc.) are installed."
+            )
+    
+    @property
+    def rasterizer(self) -> Rasterizer:
+        """Configured PDF rasterizer backend (created on first use)"""
+        if self._rasterizer is None:
+            self._rasterizer = get_rasterizer(settings.RASTERIZER_BACKEND)
+        return self._rasterizer
+    
+    def rasterize(self, pdf_bytes: bytes, dpi: int = 300):
+        """
+        Rasterize the first page of a PDF into a PIL image.
+        """
+        with render_metrics.timer("rasterize"):
+            return self.rasterizer.rasterize(pdf_bytes, dpi)
+    
+    def encode_image(self, image, format: str) -> bytes:
+        """
+        Encode a rasterized page into PNG or JPEG bytes.
+        """
+        with render_metrics.timer(f"encode_{format.lower()}"):
+            return self._encode_image(image, format)
+    
+    def _encode_image(self, image, format: str) -> bytes:
+        output = io.BytesIO()
+        if format.lower() in ['jpg', 'jpeg']:
+            if image.mode == 'RGBA':
+                image = image.convert('RGB')
+            image.save(output, format='JPEG', quality=95)
+        else:
+            image.save(output, format='PNG')
+        return output.getvalue()
+    
+    def encode_images(self, image, formats: List[str]) -> Dict[str, bytes]:
+        """
+        Encode one image into several formats.
+        Formats are encoded in parallel threads (Pillow releases the GIL while encoding).
+        """
+        # jpg and jpeg share one encode
+        encodings = {'jpeg' if fmt.lower() == 'jpg' else fmt.lower() for fmt in formats}
+        if len(encodings) == 1:
+            encoded = {enc: self.encode_image(image, enc) for enc in encodings}
+        else:
+            with ThreadPoolExecutor(max_workers=len(encodings)) as executor:
+                futures = {enc: executor.submit(self.encode_image, image, enc) for enc in encodings}
+                encoded = {enc: future.result() for enc, future in futures.items()}
+        
+        return {
+            fmt: encoded['jpeg' if fmt.lower() == 'jpg' else fmt.lower()]
+            for fmt in formats
+        }
+    
+    def convert_to_images(self, pdf_bytes: bytes, formats: List[str], dpi: int = 300) -> Dict[str, bytes]:
+        """
+        Convert PDF to several image formats from a single rasterization.
+        """
+        try:
+            return self.encode_images(self.rasterize(pdf_bytes, dpi), formats)
+        except Exception as e:
+            error_str = str(e)
+            print(f"CRITICAL ERROR: Image conversion failed: {error_str}")
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Image conversion failed: {error_str}. Ensure the '{settings.RASTERIZER_BACKEND}' rasterizer (pypdfium2 or poppler-utils) is installed."
+            )
+    
     def convert_to_image(self, pdf_bytes: bytes, format: str, dpi: int = 300) -> bytes:
         """
         Convert PDF to image format.
         """
+        return self.convert_to_images(pdf_bytes, [format], dpi)[format]
+    
+    def _build_raster_template(
+        self,
+        html_content: str,
+        css_content: Optional[str],
+        stylesheet_key: Optional[tuple],
+        dpi: int,
+        template_id: str
+    ) -> RasterTemplate:
+        """Lay out the static layer once, rasterize it and measure the text slots"""
+        try:
+            from weasyprint import HTML
+            stylesheets = [self._layer_stylesheet(STATIC_LAYER_CSS, "static")]
+            if css_content:
+                stylesheets.insert(0, self._get_stylesheet(css_content, stylesheet_key))
+            with render_metrics.timer("raster_template_build"):
+                document = HTML(string=html_content).render(
+                    stylesheets=stylesheets,
+                    presentational_hints=True,
+                    font_config=self.font_config
+                )
+                background = self.rasterize(document.write_pdf(), dpi)
+                return build_raster_template(document, background, dpi, iter_variables(html_content))
+        except (RasterFastPathUnsupported, ImportError) as e:
+            print(f"Raster fast path disabled for template {template_id}: {e}")
+            return RasterTemplate(None, {}, {}, dpi / 96, str(e))
+        except Exception as e:
+            # Anything else (e.g. changed WeasyPrint internals) would fail again for
+            # every certificate, so the template is cached as disabled too
+            reason = f"{type(e).__name__}: {e}"
+            print(f"Raster fast path disabled for template {template_id} after an unexpected error: {reason}")
+            return RasterTemplate(None, {}, {}, dpi / 96, reason)
+    
+    def render_images(
+        self,
+        html_content: str,
+        css_content: Optional[str],
+        stylesheet_key: Optional[tuple],
+        layer_key: tuple,
+        formats: List[str],
+        dpi: int = 300
+    ) -> Dict[str, bytes]:
+        """
+        Image-only output for a layered template (HTML from render_document
+        with layered=True). Uses the raster fast path when the template and
+        this certificate's values allow it, otherwise renders the PDF and
+        rasterizes it as usual.
+        """
+        if settings.RASTER_FAST_PATH:
+            key = layer_key + (static_content_hash(html_content), dpi)
+            try:
+                raster_template = raster_template_cache.get_or_create(
+                    key,
+                    lambda: self._build_raster_template(
+                        html_content, css_content, stylesheet_key, dpi, layer_key[0]
+                    )
+                )
+                image = None
+                if raster_template.background is not None:
+                    with render_metrics.timer("raster_composite"):
+                        image = composite(raster_template, iter_variables(html_content))
+                if image is not None:
+                    render_metrics.record("raster_fast_path")
+                    return self.encode_images(image, formats)
+            except Exception as e:
+                print(f"Warning: Raster fast path failed, using PDF path: {e}")
+            render_metrics.record("raster_fallback")
+        
+        pdf_bytes = self.render_layered_pdf(html_content, css_content, stylesheet_key, layer_key)
+        return self.convert_to_images(pdf_bytes, formats, dpi)
+    
+    def _render_files(
+        self,
+        html_content: str,
+        css_content: Optional[str],
+        stylesheet_key: Optional[tuple],
+        formats: List[str],
+        dpi: int
+    ) -> Dict[str, bytes]:
+        """Render one certificate into every requested format"""
+        pdf_bytes = self.render_pdf(html_content, css_content, stylesheet_key)
+        image_formats = [fmt for fmt in formats if fmt.lower() != 'pdf']
+        files = self.convert_to_images(pdf_bytes, image_formats, dpi) if image_formats else {}
+        files.update({fmt: pdf_bytes for fmt in formats if fmt.lower() == 'pdf'})
+        return files
+    
+    def _matches_standalone(
+        self,
+        document,
+        html_documents: List[str],
+        stylesheets: list,
+        template_id: str
+    ) -> bool:
+        """
+        Compare every page of a batch with a standalone render of its row.
+        Run on the first batch of a template version; the verdict is cached.
+        """
+        from weasyprint import HTML
+        with render_metrics.timer("batch_layout_check"):
+            for page, html_content in zip(document.pages, html_documents):
+                standalone = HTML(string=html_content).render(
+                    stylesheets=stylesheets,
+                    presentational_hints=True,
+                    font_config=self.font_config
+                )
+                if len(standalone.pages) != 1 or page_signature(standalone.pages[0]) != page_signature(page):
+                    print(f"Batch rendering disabled for template {template_id}: "
+                          "layout differs from a standalone render")
+                    return False
+        return True
+    
+    def render_batch(
+        self,
+        html_documents: List[str],
+        css_content: Optional[str],
+        stylesheet_key: Optional[tuple],
+        formats: List[str],
+        dpi: int = 300,
+        layout_key: Optional[tuple] = None
+    ) -> List[Dict[str, bytes]]:
+        """
+        Render several certificates of one template (HTML from render_document)
+        as a single multi-page document, then split it into per-certificate
+        files. Falls back to one render per certificate when the rows cannot
+        share a document or the template lays out differently inside a batch.
+        Pass layout_key (from render_document) so templates without CSS are
+        batched too; the layout verdict is cached under it.
+        """
+        combined = None
+        layout_key = layout_key or stylesheet_key
+        # None until the first batch of this template version has been checked.
+        # Without a key the verdict could not be cached, so every batch would pay
+        # for the standalone comparison; those documents are rendered one by one.
+        verdict = batch_layout_cache.get(layout_key) if layout_key is not None else False
+        if len(html_documents) > 1 and verdict is not False:
+            combined = combine_documents(html_documents)
+        if combined is None:
+            return [
+                self._render_files(html_content, css_content, stylesheet_key, formats, dpi)
+                for html_content in html_documents
+            ]
+        
         try:
-            from pdf2image import convert_from_bytes
-            images = convert_from_bytes(pdf_bytes, dpi=dpi)
-            if not images:
-                raise ValueError("Failed to convert PDF to image: No images returned from converter")
+            from weasyprint import HTML
+            stylesheets = [self._get_stylesheet(css_content, stylesheet_key)] if css_content else []
             
-            image = images[0]
-            output = io.BytesIO()
-            if format.lower() in ['jpg', 'jpeg']:
-                if image.mode == 'RGBA':
-                    image = image.convert('RGB')
-                image.save(output, format='JPEG', quality=95)
-            else:
-                image.save(output, format='PNG')
-            return output.getvalue()
+            with render_metrics.timer("batch_layout"):
+                document = HTML(string=combined).render(
+                    stylesheets=stylesheets + [self._layer_stylesheet(BATCH_CSS, "batch")],
+                    presentational_hints=True,
+                    font_config=self.font_config
+                )
+            # Checked on every batch, since whether a row fits depends on its data:
+            # a row that runs onto a second page only sends this batch to the fallback
+            compatible = len(document.pages) == len(html_documents)
+            if compatible and verdict is None:
+                verdict = self._matches_standalone(document, html_documents, stylesheets, layout_key[0])
+                batch_layout_cache.get_or_create(layout_key, lambda: verdict)
+                compatible = verdict
+            if not compatible:
+                render_metrics.record("batch_fallback", count=len(html_documents))
+                return [
+                    self._render_files(html_content, css_content, stylesheet_key, formats, dpi)
+                    for html_content in html_documents
+                ]
+            render_metrics.record("batch_certificate", count=len(html_documents))
+            
+            with render_metrics.timer("pdf_render"):
+                pdf_bytes = document.write_pdf()
+            
+            files = [{} for _ in html_documents]
+            if any(fmt.lower() == 'pdf' for fmt in formats):
+                with render_metrics.timer("pdf_split"):
+                    pages = split_pdf_pages(pdf_bytes)
+                for page_files, page_pdf in zip(files, pages):
+                    page_files.update({fmt: page_pdf for fmt in formats if fmt.lower() == 'pdf'})
+            
+            image_formats = [fmt for fmt in formats if fmt.lower() != 'pdf']
+            if image_formats:
+                with closing(self.rasterizer.rasterize_pages(pdf_bytes, dpi)) as pages:
+                    for page_files in files:
+                        with render_metrics.timer("rasterize"):
+                            image = next(pages)
+                        page_files.update(self.encode_images(image, image_formats))
+            return files
+        except HTTPException:
+            raise
         except Exception as e:
             error_str = str(e)
-            print(f"CRITICAL ERROR: Image conversion failed: {error_str}")
+            print(f"CRITICAL ERROR: Batch PDF generation failed: {error_str}")
             raise HTTPException(
                 status_code=500, 
-                detail=f"Image conversion failed: {error_str}. Ensure poppler-utils is installed."
+                detail=f"PDF generation failed: {error_str}. Ensure system dependencies (libpango, libcairo, etc.) are installed."
             )
 
 
 class StorageService:
-    """Service for file storage operations"""
+    """Certificate files in the configured storage backend (services/storage.py)"""
     
-    def __init__(self):
-        """Initialize storage directory or Supabase client"""
-        self.storage_type = settings.STORAGE_TYPE
-        
-        if self.storage_type == "supabase":
-            # Initialize Supabase Storage client
-            try:
-                from supabase import create_client, Client
-                if not settings.SUPABASE_URL or not settings.SUPABASE_SERVICE_ROLE_KEY:
-                    raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set for Supabase storage")
-                self.supabase: Client = create_client(
-                    settings.SUPABASE_URL,
-                    settings.SUPABASE_SERVICE_ROLE_KEY
-                )
-                self.bucket_name = settings.SUPABASE_STORAGE_BUCKET or "certificates"
-            except ImportError:
-                raise ImportError("supabase package not installed. Run: pip install supabase")
-        else:
-            # Local storage
-            self.storage_path = Path(settings.STORAGE_PATH)
-            self.storage_path.mkdir(parents=True, exist_ok=True)
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend = backend or storage_backend
+        self.storage_type = self.backend.name
     
     def _get_file_path(self, certificate_id: str, format: str) -> str:
         """Generate file path for certificate (relative path)"""
         date_prefix = datetime.now().strftime('%Y/%m/%d')
         return f"{date_prefix}/{certificate_id}.{format}"
     
-    def save_file(
+    async def save_file(
         self,
         file_bytes: bytes,
         certificate_id: str,
-        format: str
+        format: str,
+        relative_path: Optional[str] = None
     ) -> str:
         """
-        Save file to storage (local or Supabase).
-        Returns relative path to file.
+        Save file to storage.
+        Returns relative path to file (relative_path, when already computed).
         """
-        relative_path = self._get_file_path(certificate_id, format)
-        
-        if self.storage_type == "supabase":
-            # Upload to Supabase Storage
-            try:
-                # Upload file to Supabase Storage bucket
-                response = self.supabase.storage.from_(self.bucket_name).upload(
-                    path=relative_path,
-                    file=file_bytes,
-                    file_options={"content-type": self._get_content_type(format)}
-                )
-                # Supabase returns the path
-                return relative_path
-            except Exception as e:
-                raise Exception(f"Failed to upload to Supabase Storage: {str(e)}")
-        else:
-            # Local storage
-            file_path = self.storage_path / relative_path
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(file_path, 'wb') as f:
-                f.write(file_bytes)
-            
-            return relative_path
+        relative_path = relative_path or self._get_file_path(certificate_id, format)
+        await self.backend.put(relative_path, file_bytes, self._get_content_type(format))
+        return relative_path
     
     def _get_content_type(self, format: str) -> str:
         """Get content type for file format"""
@@ -196,92 +756,48 @@ class StorageService:
         }
         return content_types.get(format.lower(), 'application/octet-stream')
     
-    def get_download_url(self, relative_path: str, base_url: str = "http://localhost:8000") -> str:
+    async def get_download_url(self, relative_path: str, base_url: str = "http://localhost:8000") -> str:
         """Generate download URL for file"""
-        if self.storage_type == "supabase":
-            # Get public URL from Supabase Storage
-            try:
-                # In most supabase-py versions, get_public_url returns a string
-                # but in some it returns an object with a .url attribute
-                url = self.supabase.storage.from_(self.bucket_name).get_public_url(relative_path)
-                if hasattr(url, 'public_url'):
-                    return url.public_url
-                if isinstance(url, dict) and 'publicURL' in url:
-                    return url['publicURL']
-                return str(url)
-            except Exception as e:
-                print(f"Failed to get public URL: {e}")
-                # Fallback: try to create signed URL for private buckets
-                try:
-                    # Create signed URL (valid for 1 hour)
-                    signed_response = self.supabase.storage.from_(self.bucket_name).create_signed_url(
-                        path=relative_path,
-                        expires_in=3600
-                    )
-                    if isinstance(signed_response, dict):
-                        return signed_response.get('signedURL', '')
-                    if hasattr(signed_response, 'signed_url'):
-                        return signed_response.signed_url
-                    return str(signed_response)
-                except:
-                    raise Exception(f"Failed to get download URL from Supabase")
-        else:
-            # Local storage - return relative URL
-            return f"{base_url}/downloads/{relative_path}"
+        urls = await self.get_download_urls([relative_path], base_url)
+        if relative_path not in urls:
+            raise StorageError(f"Failed to get download URL for {relative_path}")
+        return urls[relative_path]
+    
+    async def get_download_urls(
+        self,
+        relative_paths: Iterable[str],
+        base_url: str = "http://localhost:8000"
+    ) -> Dict[str, str]:
+        """
+        Download URLs for many files, keyed by relative path.
+        Private buckets are signed with one request for all files.
+        """
+        relative_paths = list(dict.fromkeys(path for path in relative_paths if path))
+        if not relative_paths:
+            return {}
+        urls = await self.backend.urls(relative_paths)
+        # Local files are served by this app
+        return {path: f"{base_url}{url}" if url.startswith('/') else url for path, url in urls.items()}
     
-    def file_exists(self, relative_path: str) -> bool:
+    async def file_exists(self, relative_path: str) -> bool:
         """Check if file exists"""
-        if self.storage_type == "supabase":
-            try:
-                # List files in the path to check existence
-                path_parts = relative_path.split('/')
-                folder_path = '/'.join(path_parts[:-1]) if len(path_parts) > 1 else ''
-                file_name = path_parts[-1]
-                
-                files = self.supabase.storage.from_(self.bucket_name).list(folder_path)
-                return any(f['name'] == file_name for f in files)
-            except:
-                return False
-        else:
-            return (self.storage_path / relative_path).exists()
-
-    def get_file(self, relative_path: str) -> bytes:
+        try:
+            return await self.backend.exists(relative_path)
+        except StorageError:
+            return False
+    
+    async def get_file(self, relative_path: str) -> bytes:
         """Get file bytes from storage"""
-        if self.storage_type == "supabase":
-            try:
-                response = self.supabase.storage.from_(self.bucket_name).download(relative_path)
-                return response
-            except Exception as e:
-                raise Exception(f"Failed to download from Supabase: {str(e)}")
-        else:
-            file_path = self.storage_path / relative_path
-            if not file_path.exists():
-                raise FileNotFoundError(f"File not found: {file_path}")
-            with open(file_path, 'rb') as f:
-                return f.read()
-
+        return await self.backend.get(relative_path)
+    
+    async def delete_files(self, relative_paths: Iterable[str]):
+        await self.backend.delete(relative_paths)
+    
     def _get_relative_path_from_url(self, url: str) -> Optional[str]:
         """Extract relative path from a download URL"""
         if not url:
             return None
-            
-        if self.storage_type == "supabase":
-            if '/public/' in url:
-                # https://.../public/certificates/2026/01/27/cert.pdf
-                path = unquote(url.split('/public/')[-1])
-                if path.startswith(self.bucket_name + "/"):
-                    return path[len(self.bucket_name)+1:]
-                return path
-            elif '/sign/' in url:
-                # Handle signed URLs if needed
-                path = unquote(url.split('?')[0].split('/')[-1])
-                return path
-            return None
-        else:
-            # Local: http://localhost:8000/downloads/2026/01/27/cert.pdf
-            if '/downloads/' in url:
-                return unquote(url.split('/downloads/')[-1])
-            return None
+        return self.backend.path_from_url(url)
 
 
 class CertificateService:
@@ -290,6 +806,13 @@ class CertificateService:
     def __init__(self):
         self.rendering = RenderingService()
         self.storage = StorageService()
+        self._render_slots: Optional[asyncio.Semaphore] = None
+    
+    def _get_render_slots(self) -> asyncio.Semaphore:
+        """Render slots shared by every bulk request in this process"""
+        if self._render_slots is None:
+            self._render_slots = asyncio.Semaphore(max(1, settings.BULK_RENDER_GLOBAL_CONCURRENCY))
+        return self._render_slots
     
     async def check_certificate_id_exists(
         self,
@@ -301,59 +824,449 @@ class CertificateService:
         result = await db.execute(stmt)
         return result.scalar_one_or_none() is not None
     
-    async def generate_certificate(
+    async def find_existing_certificate_ids(
+        self,
+        db: AsyncSession,
+        certificate_ids: Iterable[str]
+    ) -> set:
+        """Which of the given certificate IDs already exist (one query per 500 IDs)"""
+        return await existing_certificate_ids(db, certificate_ids)
+    
+    async def generate_unique_certificate_id(self, db: AsyncSession) -> str:
+        """Generate a unique certificate ID in format NH-YYYY-XXXXX."""
+        return (await self.allocate_certificate_ids(db, 1))[0]
+    
+    async def allocate_certificate_ids(
+        self,
+        db: AsyncSession,
+        count: int,
+        exclude: Iterable[str] = ()
+    ) -> List[str]:
+        """
+        Allocate count unique NH-YYYY-XXXXX IDs in one block.
+        exclude holds IDs the caller has claimed but not saved yet.
+        """
+        return await certificate_id_allocator.allocate(db, count, exclude)
+    
+    @staticmethod
+    def _render_formats(output_formats: List[str], pdf_sink: Optional[Callable]) -> List[str]:
+        """Formats to render: the outputs, plus a PDF when a sink needs one"""
+        if pdf_sink is not None and all(fmt.lower() != 'pdf' for fmt in output_formats):
+            return list(output_formats) + ['pdf']
+        return list(output_formats)
+    
+    @staticmethod
+    def _pdf_file(files: Dict[str, bytes]) -> bytes:
+        return next(data for fmt, data in files.items() if fmt.lower() == 'pdf')
+    
+    async def _convert_formats(self, pdf_bytes: bytes, output_formats: List[str]) -> Dict[str, bytes]:
+        """
+        Produce file bytes for every requested format.
+        All image formats share a single rasterization of the PDF.
+        """
+        image_formats = [fmt for fmt in output_formats if fmt.lower() != 'pdf']
+        files = {}
+        if image_formats:
+            files.update(await render_pool.convert_to_images(pdf_bytes, image_formats))
+        for fmt in output_formats:
+            if fmt.lower() == 'pdf':
+                files[fmt] = pdf_bytes
+        return files
+    
+    @staticmethod
+    def _certificate_row(
+        template: Template,
+        certificate_data: dict,
+        paths: Dict[str, str],
+        user_id: Optional[str] = None
+    ) -> dict:
+        """Column values of a generated certificate's record"""
+        return {
+            'id': uuid.uuid4(),
+            'certificate_id': certificate_data['certificate_id'],
+            'user_id': uuid.UUID(user_id) if user_id else None,
+            'template_id': template.id,
+            'certificate_data': certificate_data,
+            'student_name': certificate_data.get('student_name'),
+            'course_name': certificate_data.get('course_name'),
+            'issue_date': certificate_data.get('issue_date'),
+            'pdf_path': paths.get('pdf'),
+            'png_path': paths.get('png'),
+            'jpg_path': paths.get('jpg') or paths.get('jpeg'),
+            'status': 'generated',
+            'is_revoked': False,
+            'generated_at': datetime.now(timezone.utc),
+            'created_at': datetime.now(timezone.utc)
+        }
+    
+    async def _store_certificate(
         self,
         db: AsyncSession,
         template: Template,
         certificate_data: dict,
+        files: Dict[str, bytes],
         output_formats: List[str],
         user_id: Optional[str] = None
     ) -> Dict[str, str]:
+        """Save rendered files, add the Certificate row and return download URLs"""
+        cert_id = certificate_data['certificate_id']
+        
+        # Save every format concurrently
+        saved = await asyncio.gather(*[
+            self.storage.save_file(files[fmt], cert_id, fmt) for fmt in output_formats
+        ])
+        paths = dict(zip(output_formats, saved))
+        urls = await self.storage.get_download_urls(saved)
+        download_urls = {fmt: urls[path] for fmt, path in paths.items()}
+        
+        # Save certificate record
+        db.add(Certificate(**self._certificate_row(template, certificate_data, paths, user_id)))
+        stats_service.certificates_created(db, template.id, user_id)
+        
+        return download_urls
+    
+    async def _persist_certificates(
+        self,
+        db: AsyncSession,
+        template: Template,
+        certificates: List[dict],
+        rendered: List[Union[Dict[str, bytes], Exception]],
+        output_formats: List[str],
+        user_id: Optional[str] = None
+    ) -> List[Union[Dict[str, str], Exception]]:
         """
-        Generate certificate and return download URLs.
+        Record a rendered batch with one multi-row INSERT ... ON CONFLICT DO NOTHING,
+        then save the files of the rows that were inserted. A certificate ID taken
+        by a concurrent request fails only its own row, and its files are never
+        written over the other certificate's.
         """
-        # Render HTML
-        html_content = self.rendering.render_html(
-            template.html_content,
-            certificate_data
-        )
+        outcomes: List[Union[Dict[str, str], Exception]] = list(rendered)
+        rows = {}  # index -> (row, paths)
+        for index, (certificate_data, files) in enumerate(zip(certificates, rendered)):
+            if isinstance(files, Exception):
+                continue
+            paths = {
+                fmt: self.storage._get_file_path(certificate_data['certificate_id'], fmt)
+                for fmt in output_formats
+            }
+            rows[index] = (self._certificate_row(template, certificate_data, paths, user_id), paths)
+        if not rows:
+            return outcomes
         
-        # Generate PDF
-        pdf_bytes = self.rendering.render_pdf(html_content, template.css_content)
+        inserted = await insert_certificates(db, [row for row, _ in rows.values()])
         
-        download_urls = {}
-        paths = {}
+        # Upload the files of every inserted row concurrently (bounded by STORAGE_CONCURRENCY)
+        uploads = []  # (index, fmt)
+        for index, (row, paths) in rows.items():
+            if row['certificate_id'] not in inserted:
+                outcomes[index] = ValueError("Certificate ID already exists")
+                continue
+            uploads.extend((index, fmt) for fmt in output_formats)
+        results = await asyncio.gather(*[
+            self.storage.save_file(rendered[index][fmt], rows[index][0]['certificate_id'], fmt, rows[index][1][fmt])
+            for index, fmt in uploads
+        ], return_exceptions=True)
         
-        cert_id = certificate_data['certificate_id']
+        errors = {}
+        for (index, fmt), result in zip(uploads, results):
+            if isinstance(result, Exception):
+                errors.setdefault(index, result)
+        saved = [index for index in dict.fromkeys(index for index, _ in uploads) if index not in errors]
+        try:
+            urls = await self.storage.get_download_urls(
+                rows[index][1][fmt] for index in saved for fmt in output_formats
+            )
+        except Exception as e:
+            errors.update((index, e) for index in saved)
+            saved, urls = [], {}
+        for index in saved:
+            outcomes[index] = {fmt: urls[rows[index][1][fmt]] for fmt in output_formats}
         
-        for fmt in output_formats:
-            if fmt.lower() == 'pdf':
-                file_bytes = pdf_bytes
-            else:
-                file_bytes = self.rendering.convert_to_image(pdf_bytes, fmt)
-            
-            # Save file
-            relative_path = self.storage.save_file(file_bytes, cert_id, fmt)
-            paths[fmt] = relative_path
-            download_urls[fmt] = self.storage.get_download_url(relative_path)
+        if errors:
+            for index, error in errors.items():
+                outcomes[index] = error
+            await db.execute(
+                delete(Certificate)
+                .where(Certificate.id.in_([rows[index][0]['id'] for index in errors]))
+                .execution_options(synchronize_session=False)
+            )
+            # Files that did upload for a failed row would otherwise be orphaned
+            try:
+                await self.storage.delete_files(
+                    rows[index][1][fmt] for (index, fmt), result in zip(uploads, results)
+                    if index in errors and not isinstance(result, Exception)
+                )
+            except Exception as e:
+                print(f"Warning: Could not remove files of failed certificates: {e}")
+        stats_service.certificates_created(db, template.id, user_id, len(saved))
+        return outcomes
+    
+    async def _render_certificate(
+        self,
+        template: Template,
+        certificate_data: dict,
+        output_formats: List[str],
+        render_formats: List[str]
+    ) -> Dict[str, bytes]:
+        """Render one certificate's files in render_formats (output formats plus any sink PDF)"""
+        # Render HTML (template styles are parsed once per template version)
+        layered = template.render_mode == "layered"
+        document = self.rendering.render_document(
+            template.html_content,
+            certificate_data,
+            template_id=str(template.id),
+            css_content=template.css_content,
+            layered=layered
+        )
         
-        # Save certificate record
-        user_uuid = uuid.UUID(user_id) if user_id else None
-        
-        certificate = Certificate(
-            certificate_id=cert_id,
-            user_id=user_uuid,
-            template_id=template.id,
-            certificate_data=certificate_data,
-            pdf_path=paths.get('pdf'),
-            png_path=paths.get('png'),
-            jpg_path=paths.get('jpg') or paths.get('jpeg'),
-            status='generated',
-            generated_at=datetime.now(timezone.utc)
+        # Generate files in the render pool so the event loop stays free
+        if layered and all(fmt.lower() != 'pdf' for fmt in render_formats):
+            # Image-only output skips the per-certificate PDF where possible
+            files = await render_pool.render_images(
+                document.html,
+                document.css,
+                document.stylesheet_key,
+                document.layer_key,
+                output_formats
+            )
+        elif layered:
+            pdf_bytes = await render_pool.render_layered_pdf(
+                document.html,
+                document.css,
+                document.stylesheet_key,
+                document.layer_key
+            )
+            files = await self._convert_formats(pdf_bytes, render_formats)
+        else:
+            pdf_bytes = await render_pool.render_pdf(
+                document.html,
+                document.css,
+                document.stylesheet_key
+            )
+            files = await self._convert_formats(pdf_bytes, render_formats)
+        return files
+    
+    async def generate_certificate(
+        self,
+        db: AsyncSession,
+        template: Template,
+        certificate_data: dict,
+        output_formats: List[str],
+        user_id: Optional[str] = None,
+        pdf_sink: Optional[Callable[[bytes], None]] = None
+    ) -> Dict[str, str]:
+        """
+        Generate certificate and return download URLs.
+        pdf_sink, if given, receives the certificate PDF even when 'pdf' is not an output format.
+        """
+        files = await self._render_certificate(
+            template,
+            certificate_data,
+            output_formats,
+            self._render_formats(output_formats, pdf_sink)
         )
-        db.add(certificate)
         
+        download_urls = await self._store_certificate(db, template, certificate_data, files, output_formats, user_id)
+        if pdf_sink is not None:
+            await asyncio.to_thread(pdf_sink, self._pdf_file(files))
         return download_urls
+    
+    async def _render_batch(
+        self,
+        template: Template,
+        certificates: List[dict],
+        output_formats: List[str],
+        render_formats: List[str]
+    ) -> List[Union[Dict[str, bytes], Exception]]:
+        """
+        Render several certificates of one template with a single batched
+        render, returning each certificate's files or error in input order.
+        If the batch render fails, certificates are rendered one by one so
+        errors are attributed to the right row.
+        """
+        if template.render_mode == "layered" or len(certificates) < 2:
+            # Layered templates already reuse their static layer per certificate
+            return await self._render_each(template, certificates, output_formats, render_formats)
+        
+        try:
+            documents = [
+                self.rendering.render_document(
+                    template.html_content,
+                    certificate_data,
+                    template_id=str(template.id),
+                    css_content=template.css_content
+                )
+                for certificate_data in certificates
+            ]
+            return await render_pool.render_batch(
+                [document.html for document in documents],
+                documents[0].css,
+                documents[0].stylesheet_key,
+                render_formats,
+                layout_key=documents[0].layout_key
+            )
+        except Exception as e:
+            print(f"Warning: Batch render of {len(certificates)} certificates failed, rendering individually: {e}")
+            return await self._render_each(template, certificates, output_formats, render_formats)
+    
+    async def _render_each(
+        self,
+        template: Template,
+        certificates: List[dict],
+        output_formats: List[str],
+        render_formats: List[str]
+    ) -> List[Union[Dict[str, bytes], Exception]]:
+        """Render certificates one at a time, collecting errors per certificate"""
+        rendered = []
+        for certificate_data in certificates:
+            try:
+                rendered.append(await self._render_certificate(
+                    template, certificate_data, output_formats, render_formats
+                ))
+            except Exception as e:
+                rendered.append(e)
+        return rendered
+    
+    def _sink_pdfs(
+        self,
+        rendered: List[Union[Dict[str, bytes], Exception]],
+        outcomes: List[Union[Dict[str, str], Exception]],
+        pdf_sink: Callable[[bytes], None]
+    ):
+        """Pass the PDFs of the certificates that were saved to pdf_sink, in order"""
+        for files, outcome in zip(rendered, outcomes):
+            if not isinstance(outcome, Exception):
+                pdf_sink(self._pdf_file(files))
+    
+    @staticmethod
+    def _sink_files(
+        certificates: List[dict],
+        rendered: List[Union[Dict[str, bytes], Exception]],
+        outcomes: List[Union[Dict[str, str], Exception]],
+        output_formats: List[str],
+        file_sink: Callable[[str, Dict[str, bytes]], None]
+    ):
+        """Pass the rendered output files of the certificates that were saved to file_sink"""
+        for certificate_data, files, outcome in zip(certificates, rendered, outcomes):
+            if not isinstance(outcome, Exception):
+                file_sink(certificate_data['certificate_id'], {fmt: files[fmt] for fmt in output_formats})
+    
+    @staticmethod
+    async def _run_sink(func: Callable, *args):
+        """
+        Call a sink in a worker thread. If the caller is cancelled, wait for the
+        thread to return first, so the sink is idle once cancellation completes.
+        """
+        thread_call = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        try:
+            return await asyncio.shield(thread_call)
+        except asyncio.CancelledError:
+            await asyncio.wait([thread_call])
+            raise
+    
+    async def generate_certificate_batch(
+        self,
+        db: AsyncSession,
+        template: Template,
+        certificates: List[dict],
+        output_formats: List[str],
+        user_id: Optional[str] = None,
+        pdf_sink: Optional[Callable[[bytes], None]] = None,
+        file_sink: Optional[Callable[[str, Dict[str, bytes]], None]] = None
+    ) -> List[Union[Dict[str, str], Exception]]:
+        """
+        Generate several certificates of one template with a single batched
+        render and a single multi-row insert. Returns download URLs or the
+        error for each certificate, in input order.
+        pdf_sink receives each successful certificate's PDF, in input order;
+        file_sink receives (certificate_id, files) of each successful certificate.
+        """
+        rendered = await self._render_batch(
+            template, certificates, output_formats, self._render_formats(output_formats, pdf_sink)
+        )
+        outcomes = await self._persist_certificates(db, template, certificates, rendered, output_formats, user_id)
+        # Sinks write to disk (ZIP entries, PDF pages), so they run off the event loop
+        if pdf_sink is not None:
+            await self._run_sink(self._sink_pdfs, rendered, outcomes, pdf_sink)
+        if file_sink is not None:
+            await self._run_sink(self._sink_files, certificates, rendered, outcomes, output_formats, file_sink)
+        return outcomes
+    
+    async def generate_certificates(
+        self,
+        db: AsyncSession,
+        template: Template,
+        certificates: List[dict],
+        output_formats: List[str],
+        user_id: Optional[str] = None,
+        pdf_sink: Optional[Callable[[bytes], None]] = None,
+        concurrency: Optional[int] = None,
+        file_sink: Optional[Callable[[str, Dict[str, bytes]], None]] = None
+    ) -> List[Union[Dict[str, str], Exception]]:
+        """
+        Generate many certificates of one template, spreading batched renders
+        over up to `concurrency` render slots (BULK_RENDER_CONCURRENCY by
+        default, and BULK_RENDER_GLOBAL_CONCURRENCY across all requests).
+        Outcomes come back in input order and pdf_sink still receives PDFs in
+        input order. Each render batch is recorded with one multi-row insert;
+        inserts take turns on the shared session. file_sink receives each
+        saved certificate's files as soon as its batch is recorded, so a
+        caller can stream them out (e.g. into a ZIP) without holding them.
+        Sinks are called from a worker thread, one chunk at a time.
+        """
+        if not certificates:
+            return []
+        
+        concurrency = max(1, concurrency or settings.BULK_RENDER_CONCURRENCY)
+        # Smaller batches for small requests so every slot gets work
+        batch_size = max(1, min(settings.RENDER_BATCH_SIZE, math.ceil(len(certificates) / concurrency)))
+        chunks = [certificates[start:start + batch_size] for start in range(0, len(certificates), batch_size)]
+        render_formats = self._render_formats(output_formats, pdf_sink)
+        
+        request_slots = asyncio.Semaphore(concurrency)
+        db_lock = asyncio.Lock()  # an AsyncSession runs one statement at a time
+        sink_lock = asyncio.Lock()  # sinks (ZIP / PDF writers) take one chunk at a time, in a thread
+        outcomes: List[Optional[list]] = [None] * len(chunks)
+        finished_pdfs: Dict[int, List[bytes]] = {}
+        next_pdf_chunk = 0
+        
+        async def generate_chunk(index: int, chunk: List[dict]):
+            nonlocal next_pdf_chunk
+            async with request_slots, self._get_render_slots():
+                rendered = await self._render_batch(template, chunk, output_formats, render_formats)
+            async with db_lock:
+                outcomes[index] = await self._persist_certificates(
+                    db, template, chunk, rendered, output_formats, user_id
+                )
+            if file_sink is None and pdf_sink is None:
+                return
+            async with sink_lock:
+                if file_sink is not None:
+                    await self._run_sink(
+                        self._sink_files, chunk, rendered, outcomes[index], output_formats, file_sink
+                    )
+                if pdf_sink is not None:
+                    # Hold PDFs of chunks that finish early until earlier chunks are written
+                    finished_pdfs[index] = []
+                    self._sink_pdfs(rendered, outcomes[index], finished_pdfs[index].append)
+                    ready = []
+                    while next_pdf_chunk in finished_pdfs:
+                        ready.extend(finished_pdfs.pop(next_pdf_chunk))
+                        next_pdf_chunk += 1
+                    if ready:
+                        await self._run_sink(lambda: [pdf_sink(pdf_bytes) for pdf_bytes in ready])
+        
+        tasks = [asyncio.create_task(generate_chunk(index, chunk)) for index, chunk in enumerate(chunks)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the other chunks before the caller rolls back the session or
+            # aborts the sinks, so none of them inserts rows or writes files after
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return [outcome for chunk_outcomes in outcomes for outcome in chunk_outcomes]
 
     async def generate_certificate_from_html(
         self,
@@ -369,41 +1282,11 @@ class CertificateService:
         Used for finalized previews with position/style overrides already applied.
         """
         # Generate PDF from provided HTML
-        pdf_bytes = self.rendering.render_pdf(html_content, template.css_content)
+        pdf_bytes = await render_pool.render_pdf(html_content, template.css_content)
         
-        download_urls = {}
-        paths = {}
+        files = await self._convert_formats(pdf_bytes, output_formats)
         
-        cert_id = certificate_data['certificate_id']
-        
-        for fmt in output_formats:
-            if fmt.lower() == 'pdf':
-                file_bytes = pdf_bytes
-            else:
-                file_bytes = self.rendering.convert_to_image(pdf_bytes, fmt)
-            
-            # Save file
-            relative_path = self.storage.save_file(file_bytes, cert_id, fmt)
-            paths[fmt] = relative_path
-            download_urls[fmt] = self.storage.get_download_url(relative_path)
-        
-        # Save certificate record
-        user_uuid = uuid.UUID(user_id) if user_id else None
-        
-        certificate = Certificate(
-            certificate_id=cert_id,
-            user_id=user_uuid,
-            template_id=template.id,
-            certificate_data=certificate_data,
-            pdf_path=paths.get('pdf'),
-            png_path=paths.get('png'),
-            jpg_path=paths.get('jpg') or paths.get('jpeg'),
-            status='generated',
-            generated_at=datetime.now(timezone.utc)
-        )
-        db.add(certificate)
-        
-        return download_urls
+        return await self._store_certificate(db, template, certificate_data, files, output_formats, user_id)
 
 
 # Singleton instances
@@ -0,0 +1,88 @@
+"""
+Streaming CSV Ingestion
+Parses uploaded CSV files row by row straight from the upload spool, so a
+large file is never decoded or held in memory as a whole. Rows are
+validated against CertificateInput as they are read; invalid rows carry
+their error and CSV line number instead of stopping the upload.
+"""
+
+import asyncio
+import csv
+import io
+import itertools
+from typing import AsyncIterator, BinaryIO, Iterator, List
+
+from models import CertificateInput
+from services.bulk_jobs import JobRow
+
+# Required CSV columns
+CSV_REQUIRED_COLUMNS = ['student_name', 'course_name', 'issue_date', 'certificate_id', 'issuing_authority']
+
+
+class CsvFormatError(ValueError):
+    """The upload is not readable CSV (bad encoding or malformed quoting)"""
+
+    def __init__(self, detail: str, line_number: int):
+        super().__init__(f"Invalid CSV near line {line_number}: {detail}")
+        self.line_number = line_number
+
+
+def csv_row_to_certificate(row: dict) -> CertificateInput:
+    """Validate a CSV row and build its certificate data (raises ValueError)"""
+    for col in CSV_REQUIRED_COLUMNS:
+        if col not in row or not row[col]:
+            raise ValueError(f"Missing required column: {col}")
+
+    return CertificateInput(
+        student_name=row['student_name'],
+        course_name=row['course_name'],
+        issue_date=row['issue_date'],
+        certificate_id=row['certificate_id'],
+        issuing_authority=row['issuing_authority'],
+        signature_name=row.get('signature_name'),
+        signature_image_url=row.get('signature_image_url') or None,
+        logo_url=row.get('logo_url') or None
+    )
+
+
+def read_csv_rows(fileobj: BinaryIO) -> Iterator[JobRow]:
+    """
+    Yield one JobRow per CSV record (blocking; see iter_csv_chunks).
+    line_number is the CSV line the record ends on (the header is line 1).
+    """
+    # utf-8-sig also accepts the byte order mark spreadsheet exports add
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    try:
+        for index in itertools.count():
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except (UnicodeDecodeError, csv.Error) as e:
+                raise CsvFormatError(str(e), reader.line_num + 1)
+
+            try:
+                certificate_data = csv_row_to_certificate(row).model_dump()
+            except ValueError as e:
+                # Keep the raw row for the error report (extra cells have no column name)
+                raw = {key: value for key, value in row.items() if key is not None}
+                yield JobRow(index, raw, error=str(e), line_number=reader.line_num)
+                continue
+            yield JobRow(index, certificate_data, line_number=reader.line_num)
+    finally:
+        # Leave the upload file open for its owner
+        text.detach()
+
+
+async def iter_csv_chunks(fileobj: BinaryIO, chunk_size: int) -> AsyncIterator[List[JobRow]]:
+    """Parse the upload in a thread, chunk_size rows at a time, without blocking the event loop"""
+    rows = read_csv_rows(fileobj)
+    try:
+        while True:
+            chunk = await asyncio.to_thread(lambda: list(itertools.islice(rows, chunk_size)))
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        rows.close()
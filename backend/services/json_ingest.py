@@ -0,0 +1,147 @@
+"""
+Streaming JSON Ingestion
+Incremental parsing of bulk certificate input sent as NDJSON (one object per
+line) or as a JSON array, straight from the request body stream. Each
+element is validated against CertificateInput on its own, so invalid rows
+become failed rows instead of rejecting the whole upload, and rows can be
+queued for rendering while the rest of the body is still uploading.
+"""
+
+import codecs
+import json
+import time
+from typing import AsyncIterator, List, Optional
+
+from models import CertificateInput
+from services.bulk_jobs import JobRow
+
+# Largest single element (or NDJSON line) kept in memory while waiting for its end
+MAX_ELEMENT_BYTES = 1024 * 1024
+
+_WHITESPACE = ' \t\r\n'
+
+
+class JsonFormatError(ValueError):
+    """The body is not valid NDJSON / JSON array input"""
+
+
+def _row(index: int, value, line_number: Optional[int] = None) -> JobRow:
+    """Validate one element; invalid elements become failed rows"""
+    if not isinstance(value, dict):
+        return JobRow(index, {}, error="Expected a JSON object", line_number=line_number)
+    try:
+        certificate_data = CertificateInput.model_validate(value).model_dump()
+    except ValueError as e:
+        return JobRow(index, value, error=str(e), line_number=line_number)
+    return JobRow(index, certificate_data, line_number=line_number)
+
+
+async def _text_chunks(body: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode UTF-8 incrementally; yields a final empty string at the end of the body"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    try:
+        async for chunk in body:
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        yield decoder.decode(b'', final=True)
+    except UnicodeDecodeError as e:
+        raise JsonFormatError(f"Body is not valid UTF-8: {e}")
+
+
+async def iter_ndjson_rows(body: AsyncIterator[bytes]) -> AsyncIterator[JobRow]:
+    """One row per non-empty line; lines that are not valid JSON become failed rows"""
+    buffer = ''
+    line_number = 0
+    index = 0
+    async for text in _text_chunks(body):
+        final = text == ''
+        buffer += text
+        lines = buffer.split('\n')
+        buffer = '' if final else lines.pop()
+        if len(buffer) > MAX_ELEMENT_BYTES:
+            raise JsonFormatError(f"Line {line_number + 1} is longer than {MAX_ELEMENT_BYTES} bytes")
+
+        for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield JobRow(index, {}, error=f"Invalid JSON: {e}", line_number=line_number)
+            else:
+                yield _row(index, value, line_number)
+            index += 1
+
+
+async def iter_json_array_rows(body: AsyncIterator[bytes]) -> AsyncIterator[JobRow]:
+    """One row per element of a top-level JSON array, parsed as soon as each element is complete"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    state = 'start'  # start -> first -> (value -> next)* -> end
+    index = 0
+    async for text in _text_chunks(body):
+        final = text == ''
+        buffer += text
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+
+            if state == 'start':
+                if char != '[':
+                    raise JsonFormatError("Expected a JSON array")
+                pos += 1
+                state = 'first'
+            elif state in ('first', 'next') and char == ']':
+                pos += 1
+                state = 'end'
+            elif state == 'next':
+                if char != ',':
+                    raise JsonFormatError(f"Expected ',' or ']' after element {index}")
+                pos += 1
+                state = 'value'
+            elif state in ('first', 'value'):
+                try:
+                    value, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    if final:
+                        raise JsonFormatError(f"Invalid JSON in element {index}: {e}")
+                    if len(buffer) - pos > MAX_ELEMENT_BYTES:
+                        raise JsonFormatError(f"Element {index} is larger than {MAX_ELEMENT_BYTES} bytes")
+                    break  # wait for the rest of the element
+                yield _row(index, value)
+                index += 1
+                state = 'next'
+            else:
+                raise JsonFormatError("Unexpected data after the JSON array")
+        buffer = buffer[pos:]
+
+    if state != 'end':
+        raise JsonFormatError("JSON array is incomplete")
+
+
+async def batch_rows(
+    rows: AsyncIterator[JobRow],
+    max_rows: int,
+    max_delay: float = 1.0
+) -> AsyncIterator[List[JobRow]]:
+    """
+    Group streamed rows into batches of up to max_rows. A batch is also
+    released once max_delay seconds have passed since the previous one, so
+    a slow upload still reaches the workers quickly.
+    """
+    batch = []
+    released_at = time.monotonic()
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= max_rows or time.monotonic() - released_at >= max_delay:
+            yield batch
+            batch = []
+            released_at = time.monotonic()
+    if batch:
+        yield batch
@@ -0,0 +1,126 @@
+"""
+Layered Rendering Helpers
+Support for templates with render_mode "layered": the static layer
+(borders, gradients, seals, textures, fixed labels) is rendered once per
+template version and every certificate only lays out and draws its
+variable text on top (see services/variable_layer.py).
+
+Contract for opting a template in:
+- decorations must not be painted over variable text (variable text is
+  always composited above the static layer)
+- static content should not move with variable text; templates where it
+  does, and certificates whose values would move it, are detected and
+  rendered normally instead
+"""
+
+import hashlib
+import re
+from collections import Counter
+from html import unescape
+from typing import Any, Dict, List, Tuple
+from markupsafe import Markup, escape
+
+LAYER_VAR_CLASS = "cg-layer-var"
+
+# Image fields end up in attributes and are part of the static layer key instead
+IMAGE_FIELDS = ('logo_url', 'logo_image', 'signature_image', 'signature_image_url')
+
+# Static layer: everything except the marked variable text
+STATIC_LAYER_CSS = f"""
+.{LAYER_VAR_CLASS}, .{LAYER_VAR_CLASS} * {{
+    visibility: hidden !important;
+}}
+"""
+
+_MARKER_RE = re.compile(
+    rf'<span class="{LAYER_VAR_CLASS}" data-field="([^"]*)">(.*?)</span>', re.DOTALL
+)
+
+# Inline-level containers move with their text; their text children are compared instead
+_UNSTABLE_BOXES = ('LineBox', 'InlineBox')
+
+
+def mark_variables(render_data: dict) -> dict:
+    """Wrap every non-empty text value in a marker span (values stay HTML-escaped)"""
+    marked = {}
+    for key, value in render_data.items():
+        if isinstance(value, str) and value and key not in IMAGE_FIELDS:
+            marked[key] = Markup(
+                f'<span class="{LAYER_VAR_CLASS}" data-field="{escape(key)}">{escape(value)}</span>'
+            )
+        else:
+            marked[key] = value
+    return marked
+
+
+def strip_variable_markers(html_content: str) -> str:
+    """Remove marker spans, giving the HTML a standard render would use"""
+    return _MARKER_RE.sub(r'\2', html_content)
+
+
+def iter_variables(html_content: str) -> List[Tuple[str, str]]:
+    """(field, text) for every marked value, in document order"""
+    return [(field, unescape(text)) for field, text in _MARKER_RE.findall(html_content)]
+
+
+def replace_variables(html_content: str, values: Dict[Tuple[str, int], str]) -> str:
+    """Swap the text of marked values, keyed by (field, occurrence); other values are kept"""
+    occurrences = Counter()
+
+    def replace(match):
+        field = match.group(1)
+        key = (field, occurrences[field])
+        occurrences[field] += 1
+        if key not in values:
+            return match.group(0)
+        return f'<span class="{LAYER_VAR_CLASS}" data-field="{field}">{escape(values[key])}</span>'
+
+    return _MARKER_RE.sub(replace, html_content)
+
+
+def static_content_hash(html_content: str) -> str:
+    """Hash of the HTML with every marked value blanked out"""
+    static_html = _MARKER_RE.sub(r'\1', html_content)
+    return hashlib.sha1(static_html.encode('utf-8')).hexdigest()
+
+
+def static_layer_key(template_id: str, version: str, css_key: Any, render_data: dict) -> tuple:
+    """Key for the cached static layer: template version, stylesheet and images used"""
+    images = tuple(render_data.get(field) or "" for field in IMAGE_FIELDS)
+    return (template_id or "", version, css_key, images)
+
+
+def _is_marked(box) -> bool:
+    element = getattr(box, 'element', None)
+    if element is None or not hasattr(element, 'get'):
+        return False
+    return LAYER_VAR_CLASS in (element.get('class') or '').split()
+
+
+def _geometry(value):
+    if isinstance(value, (int, float)):
+        return round(float(value), 3)
+    return value
+
+
+def paint_signature(document) -> tuple:
+    """
+    Geometry of every static box on the first page of a laid-out WeasyPrint
+    document. Two renders with equal signatures paint their static content
+    identically, whatever the variable text.
+    """
+    signature = []
+
+    def walk(box, in_variable: bool):
+        in_variable = in_variable or _is_marked(box)
+        name = type(box).__name__
+        if not in_variable and name not in _UNSTABLE_BOXES:
+            signature.append((name, getattr(box, 'text', None)) + tuple(
+                _geometry(getattr(box, attr, None))
+                for attr in ('position_x', 'position_y', 'width', 'height')
+            ))
+        for child in getattr(box, 'children', None) or ():
+            walk(child, in_variable)
+
+    walk(document.pages[0]._page_box, False)
+    return (len(document.pages),) + tuple(signature)
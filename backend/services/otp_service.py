@@ -14,6 +14,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from db_models import User, OTPSession, RateLimit
 from config import get_settings
+from services.stats import stats_service
 
 settings = get_settings()
 
@@ -90,6 +91,7 @@ class OTPService:
         if not user:
             user = User(email=email, phone=phone)
             db.add(user)
+            stats_service.user_created(db)
             await db.flush()
         
         return user
@@ -0,0 +1,60 @@
+"""
+Keyset Pagination
+Opaque cursors for listings ordered newest first by (created_at, id). A page
+continues strictly after the last row of the previous page, so deep pages
+cost the same as the first one, unlike OFFSET.
+"""
+
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, literal, tuple_
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    """Cursor pointing just after the row with this (created_at, id)"""
+    payload = json.dumps([created_at.isoformat(), str(row_id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """(created_at, id) of a cursor; invalid cursors are a 400"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(payload)
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_page(query: Select, created_column, id_column, cursor: Optional[str], limit: int) -> Select:
+    """
+    Order query newest first and continue after cursor.
+    Fetches limit + 1 rows so next_page_cursor can tell whether another page exists.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # Row-value comparison lets both SQLite and Postgres walk the (created_at, id) index
+        query = query.where(
+            tuple_(created_column, id_column)
+            < tuple_(literal(created_at, created_column.type), literal(row_id, id_column.type))
+        )
+    return query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def next_page_cursor(rows: List, limit: int, key: Callable) -> Tuple[List, Optional[str]]:
+    """
+    Trim the extra row fetched by keyset_page and return (rows, next_cursor).
+    key returns the (created_at, id) of a row.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
@@ -0,0 +1,355 @@
+"""
+PDF Post-processing Helpers
+Page-level PDF manipulation with pypdf (pydyf, used by WeasyPrint, can only write PDFs)
+and a streaming writer for combined multi-certificate PDFs
+"""
+
+import io
+import math
+import zlib
+from typing import List, NamedTuple, Optional, Tuple, BinaryIO
+
+# Resource name of the cached page drawn under overlay_on_form's top page
+_FORM_NAME = '/CgStaticLayer'
+
+
+class PageForm(NamedTuple):
+    """
+    A PDF page converted once into a form XObject. objects holds the
+    serialized objects numbered from 1 (the form itself first), so they can
+    be written unchanged at the start of any number of new files.
+    """
+    objects: Tuple[bytes, ...]
+    box: Tuple[float, float, float, float]
+    annotations: Tuple[int, ...]  # Object numbers of the page's external links
+
+
+def _stream_body(dictionary: bytes, data: bytes) -> bytes:
+    compressed = zlib.compress(data)
+    return (
+        b"<< " + dictionary + f" /Filter /FlateDecode /Length {len(compressed)} >>\nstream\n".encode()
+        + compressed + b"\nendstream"
+    )
+
+
+def _serialize(obj) -> bytes:
+    output = io.BytesIO()
+    obj.write_to_stream(output)
+    return output.getvalue()
+
+
+def _copy_object(obj, id_map: dict, queue: list, reserve):
+    """Copy a pypdf object, renumbering indirect references with numbers from reserve()"""
+    from pypdf.generic import (
+        IndirectObject, StreamObject, DictionaryObject, ArrayObject, NameObject
+    )
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key not in id_map:
+            id_map[key] = reserve()
+            queue.append((obj.get_object(), id_map[key]))
+        return IndirectObject(id_map[key], 0, None)
+    if isinstance(obj, StreamObject):
+        copy = StreamObject()
+        for name, value in obj.items():
+            copy[NameObject(name)] = _copy_object(value, id_map, queue, reserve)
+        copy._data = obj._data
+        return copy
+    if isinstance(obj, DictionaryObject):
+        copy = DictionaryObject()
+        for name, value in obj.items():
+            copy[NameObject(name)] = _copy_object(value, id_map, queue, reserve)
+        return copy
+    if isinstance(obj, ArrayObject):
+        return ArrayObject(_copy_object(value, id_map, queue, reserve) for value in obj)
+    return obj
+
+
+def _form_stream(page, copy) -> Tuple[bytes, bytes, Tuple[float, float, float, float]]:
+    """Form XObject dictionary, content and box of a page; copy renumbers what it references"""
+    box = tuple(float(value) for value in page.mediabox)
+    resources = page.get('/Resources')
+    resources = _serialize(copy(resources)) if resources is not None else b"<< >>"
+    contents = page.get_contents()
+    content_data = contents.get_data() if contents is not None else b""
+    dictionary = (
+        b"/Type /XObject /Subtype /Form /BBox [" + " ".join(_number(v) for v in box).encode()
+        + b"] /Resources " + resources
+    )
+    group = page.get('/Group')
+    if group is not None:
+        dictionary += b" /Group " + _serialize(copy(group))
+    return dictionary, content_data, box
+
+
+def _external_links(page) -> list:
+    """The page's URI link annotations (other annotations point back into their own file)"""
+    annotations = page.get('/Annots')
+    if annotations is None:
+        return []
+    links = []
+    for annotation in annotations.get_object():
+        annotation = annotation.get_object()
+        action = annotation.get('/A')
+        action = action.get_object() if action is not None else None
+        if annotation.get('/Subtype') == '/Link' and action is not None and action.get('/S') == '/URI':
+            links.append(annotation)
+    return links
+
+
+def page_form(pdf_bytes: bytes) -> PageForm:
+    """
+    Convert the first page of a PDF into a form XObject, serialized once so
+    that overlay_on_form can write it into any number of PDFs as it is.
+    External links on the page are kept as annotations.
+    """
+    from pypdf import PdfReader
+    from pypdf.generic import DictionaryObject, NameObject
+
+    page = PdfReader(io.BytesIO(pdf_bytes)).pages[0]
+    bodies: List[Optional[bytes]] = [None]
+
+    def reserve() -> int:
+        bodies.append(None)
+        return len(bodies)
+
+    id_map, queue = {}, []
+
+    def copy(obj):
+        return _copy_object(obj, id_map, queue, reserve)
+
+    dictionary, content_data, box = _form_stream(page, copy)
+    bodies[0] = _stream_body(dictionary, content_data)
+
+    annotations = []
+    for link in _external_links(page):
+        annotation = DictionaryObject()
+        for name, value in link.items():
+            if name != '/P':
+                annotation[NameObject(name)] = copy(value)
+        annotation_id = reserve()
+        bodies[annotation_id - 1] = _serialize(annotation)
+        annotations.append(annotation_id)
+
+    while queue:
+        obj, object_id = queue.pop()
+        bodies[object_id - 1] = _serialize(copy(obj))
+    return PageForm(tuple(bodies), box, tuple(annotations))
+
+
+def overlay_on_form(top_pdf: bytes, form: PageForm) -> bytes:
+    """
+    Draw the first page of top_pdf over a cached page form and return a
+    single-page PDF. The form's objects are written as they are; only the
+    top page's own content and resources are copied.
+    """
+    from pypdf import PdfReader
+    from pypdf.generic import DictionaryObject, IndirectObject, NameObject
+
+    page = PdfReader(io.BytesIO(top_pdf)).pages[0]
+    output = io.BytesIO()
+    writer = _PdfObjectWriter(output)
+    for body in form.objects:
+        writer._write_object(writer._reserve(), body)
+    id_map, queue = {}, []
+
+    page_resources = page['/Resources'] if '/Resources' in page else DictionaryObject()
+    resources = DictionaryObject()
+    for name, value in page_resources.items():
+        if name != '/XObject':
+            resources[NameObject(name)] = writer._copy(value, id_map, queue)
+    xobjects = DictionaryObject()
+    if '/XObject' in page_resources:
+        for name, value in page_resources['/XObject'].items():
+            xobjects[NameObject(name)] = writer._copy(value, id_map, queue)
+    xobjects[NameObject(_FORM_NAME)] = IndirectObject(1, 0, None)
+    resources[NameObject('/XObject')] = xobjects
+
+    contents = page.get_contents()
+    content_data = contents.get_data() if contents is not None else b""
+    content_id = writer._reserve()
+    writer._write_stream(content_id, b"", f"q {_FORM_NAME} Do Q\n".encode() + content_data)
+
+    box = " ".join(_number(float(value)) for value in page.mediabox)
+    page_dictionary = f"/Type /Page /MediaBox [{box}] /Contents {content_id} 0 R /Resources ".encode()
+    page_dictionary += _serialize(resources)
+    group = page.get('/Group')
+    if group is not None:
+        page_dictionary += b" /Group " + _serialize(writer._copy(group, id_map, queue))
+    if form.annotations:
+        page_dictionary += f" /Annots [{' '.join(f'{number} 0 R' for number in form.annotations)}]".encode()
+    writer._copy_queued(id_map, queue)
+
+    pages_id = writer._reserve()
+    page_id = writer._reserve()
+    writer._write_object(page_id, b"<< " + page_dictionary + f" /Parent {pages_id} 0 R >>".encode())
+    writer._write_trailer(pages_id, [page_id])
+    return output.getvalue()
+
+
+def split_pdf_pages(pdf_bytes: bytes) -> List[bytes]:
+    """Split a PDF into one single-page PDF per page"""
+    from pypdf import PdfReader, PdfWriter
+
+    pages = []
+    for page in PdfReader(io.BytesIO(pdf_bytes)).pages:
+        writer = PdfWriter()
+        writer.add_page(page)
+        output = io.BytesIO()
+        writer.write(output)
+        pages.append(output.getvalue())
+    return pages
+
+
+def _nup_grid(nup: int, page_width: float, page_height: float) -> Tuple[int, int]:
+    """Columns and rows for nup pages per sheet, keeping the sheet closest to ISO proportions"""
+    if nup < 1:
+        raise ValueError(f"Pages per sheet must be at least 1, got {nup}")
+    best = None
+    for columns in range(1, nup + 1):
+        if nup % columns:
+            continue
+        rows = nup // columns
+        width, height = columns * page_width, rows * page_height
+        ratio = max(width, height) / min(width, height)
+        score = abs(ratio - math.sqrt(2))
+        if best is None or score < best[0]:
+            best = (score, columns, rows)
+    return best[1], best[2]
+
+
+def _number(value: float) -> str:
+    return f"{value:.4f}".rstrip('0').rstrip('.') or '0'
+
+
+class _PdfObjectWriter:
+    """Writes numbered PDF objects to a file, keeping only their offsets for the cross-reference table"""
+
+    def __init__(self, fileobj: BinaryIO):
+        self._file = fileobj
+        self._position = 0
+        self._offsets: List[Optional[int]] = []
+        self._write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._position += len(data)
+
+    def _reserve(self) -> int:
+        self._offsets.append(None)
+        return len(self._offsets)
+
+    def _write_object(self, object_id: int, body: bytes):
+        self._offsets[object_id - 1] = self._position
+        self._write(f"{object_id} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def _write_stream(self, object_id: int, dictionary: bytes, data: bytes):
+        self._write_object(object_id, _stream_body(dictionary, data))
+
+    def _copy(self, obj, id_map: dict, queue: list):
+        """Copy a pypdf object, renumbering indirect references into this file"""
+        return _copy_object(obj, id_map, queue, self._reserve)
+
+    def _copy_queued(self, id_map: dict, queue: list):
+        """Write the objects _copy queued, and the ones they reference in turn"""
+        while queue:
+            obj, object_id = queue.pop()
+            self._write_object(object_id, _serialize(self._copy(obj, id_map, queue)))
+
+    def _write_trailer(self, pages_id: int, page_ids: List[int]):
+        """Write the page tree, catalog, cross-reference table and trailer"""
+        kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+        self._write_object(
+            pages_id,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+        )
+        catalog_id = self._reserve()
+        self._write_object(catalog_id, f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode())
+
+        xref_position = self._position
+        lines = [f"xref\n0 {len(self._offsets) + 1}\n", "0000000000 65535 f \n"]
+        # Objects reserved by a certificate that failed mid-copy are left free
+        lines.extend(
+            f"{offset:010d} 00000 n \n" if offset is not None else "0000000000 00000 f \n"
+            for offset in self._offsets
+        )
+        self._write("".join(lines).encode())
+        self._write((
+            f"trailer\n<< /Size {len(self._offsets) + 1} /Root {catalog_id} 0 R >>\n"
+            f"startxref\n{xref_position}\n%%EOF\n"
+        ).encode())
+
+
+class CombinedPdfWriter(_PdfObjectWriter):
+    """
+    Streams single-page PDFs into one multi-page PDF file, optionally N-up
+    (several certificates per larger sheet). Each certificate is written
+    to the file as soon as it is added; only object offsets stay in memory.
+    """
+
+    def __init__(self, fileobj: BinaryIO, nup: int = 1):
+        super().__init__(fileobj)
+        self.nup = max(1, nup)
+        self._sheet_ids: List[int] = []
+        self._pending: List[Tuple[int, Tuple[float, float, float, float]]] = []
+        self._cell: Optional[Tuple[float, float]] = None
+        self._grid: Tuple[int, int] = (1, 1)
+        self.pages_added = 0
+        self._pages_id = self._reserve()
+
+    def add_pdf(self, pdf_bytes: bytes):
+        """Append the first page of a PDF (as a form XObject placed on the current sheet)"""
+        from pypdf import PdfReader
+
+        page = PdfReader(io.BytesIO(pdf_bytes)).pages[0]
+        id_map, queue = {}, []
+        dictionary, content_data, box = _form_stream(page, lambda obj: self._copy(obj, id_map, queue))
+
+        form_id = self._reserve()
+        self._write_stream(form_id, dictionary, content_data)
+        self._copy_queued(id_map, queue)
+
+        if self._cell is None:
+            self._cell = (box[2] - box[0], box[3] - box[1])
+            self._grid = _nup_grid(self.nup, *self._cell)
+        self._pending.append((form_id, box))
+        self.pages_added += 1
+        if len(self._pending) == self.nup:
+            self._flush_sheet()
+
+    def _flush_sheet(self):
+        """Write a sheet page placing every pending certificate in its grid cell"""
+        columns, rows = self._grid
+        cell_width, cell_height = self._cell
+        sheet_height = rows * cell_height
+
+        content = []
+        xobjects = []
+        for slot, (form_id, box) in enumerate(self._pending):
+            width, height = box[2] - box[0], box[3] - box[1]
+            scale = min(cell_width / width, cell_height / height)
+            cell_x = (slot % columns) * cell_width
+            cell_y = sheet_height - (slot // columns + 1) * cell_height
+            offset_x = cell_x + (cell_width - width * scale) / 2 - box[0] * scale
+            offset_y = cell_y + (cell_height - height * scale) / 2 - box[1] * scale
+            content.append(
+                f"q {_number(scale)} 0 0 {_number(scale)} {_number(offset_x)} {_number(offset_y)} cm /C{slot} Do Q"
+            )
+            xobjects.append(f"/C{slot} {form_id} 0 R")
+        self._pending = []
+
+        content_id = self._reserve()
+        self._write_stream(content_id, b"", "\n".join(content).encode())
+        sheet_id = self._reserve()
+        self._write_object(sheet_id, (
+            f"<< /Type /Page /Parent {self._pages_id} 0 R "
+            f"/MediaBox [0 0 {_number(columns * cell_width)} {_number(sheet_height)}] "
+            f"/Resources << /XObject << {' '.join(xobjects)} >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+        self._sheet_ids.append(sheet_id)
+
+    def close(self):
+        """Write the last (partial) sheet, page tree, cross-reference table and trailer"""
+        if self._pending:
+            self._flush_sheet()
+        self._write_trailer(self._pages_id, self._sheet_ids)
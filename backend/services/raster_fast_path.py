@@ -0,0 +1,367 @@
+"""
+Raster Fast Path
+PNG/JPG output for layered templates without a per-certificate PDF:
+the static layer is rasterized once into a NumPy background and each
+certificate only draws its variable text, at positions measured once from
+the WeasyPrint layout, blended onto a copy of that background.
+
+Anything the fast path cannot reproduce exactly (wrapping, letter spacing,
+transforms, opacity, synthetic bold/italic, glyphs missing from the font...)
+makes the template or the single certificate fall back to the PDF path.
+"""
+
+import io
+import math
+from collections import Counter
+from typing import NamedTuple, Optional, Dict, List, Tuple, Any
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from services.layered_rendering import LAYER_VAR_CLASS
+
+# Text properties that must keep their initial value (PIL cannot reproduce them)
+_PLAIN_TEXT_PROPERTIES = (
+    'letter_spacing',
+    'word_spacing',
+    'font_variant_caps',
+    'font_variant_ligatures',
+    'font_variant_numeric',
+    'font_variant_east_asian',
+    'font_feature_settings',
+    'font_variation_settings',
+    'font_stretch',
+    'text_decoration_line',
+)
+
+_TEXT_TRANSFORMS = {
+    'none': lambda text: text,
+    'uppercase': str.upper,
+    'lowercase': str.lower,
+}
+
+# Allowed difference between PIL and WeasyPrint text widths (CSS px)
+_WIDTH_TOLERANCE = 0.5
+
+# Measuring fonts relies on private WeasyPrint internals, checked up to this
+# major version; newer versions fall back to the PDF path until re-checked
+WEASYPRINT_MAX_CHECKED_VERSION = 70
+_WEASYPRINT_INTERNALS = (
+    ('weasyprint.text.fonts', 'get_pango_font_hb_face'),
+    ('weasyprint.text.fonts', 'get_hb_object_data'),
+    ('weasyprint.text.ffi', 'harfbuzz'),
+    ('weasyprint.css.properties', 'INITIAL_VALUES'),
+)
+
+
+class RasterFastPathUnsupported(Exception):
+    """The template uses a feature the fast path cannot reproduce"""
+
+
+class TextSlot(NamedTuple):
+    """Where and how one marked value is drawn (geometry in CSS px)"""
+    x: float
+    baseline: float
+    text_width: float
+    line_width: float
+    available_width: float
+    align: str  # start, center or end
+    transform: str
+    font_data: bytes
+    font_index: int
+    font_size: float
+    coverage: frozenset
+    color: Tuple[int, int, int, int]
+
+
+class RasterTemplate(NamedTuple):
+    """Cached background, text slots and loaded fonts; background is None when unsupported"""
+    background: Any
+    slots: Dict[Tuple[str, int], TextSlot]
+    fonts: Dict[Tuple[str, int], Any]
+    scale: float
+    reason: Optional[str] = None
+
+
+def check_weasyprint_internals():
+    """Raise RasterFastPathUnsupported unless this WeasyPrint has the internals the fast path uses"""
+    import importlib
+    import weasyprint
+
+    version = weasyprint.__version__
+    try:
+        major = int(version.split('.')[0])
+    except ValueError:
+        major = None
+    if major is None or major > WEASYPRINT_MAX_CHECKED_VERSION:
+        raise RasterFastPathUnsupported(
+            f"WeasyPrint {version} is not a version the fast path was checked against "
+            f"(up to {WEASYPRINT_MAX_CHECKED_VERSION})"
+        )
+    for module_name, name in _WEASYPRINT_INTERNALS:
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            module = None
+        if not hasattr(module, name):
+            raise RasterFastPathUnsupported(f"WeasyPrint {version} has no {module_name}.{name}")
+
+
+def _children(box) -> list:
+    return list(getattr(box, 'children', None) or ())
+
+
+def _is_whitespace(box) -> bool:
+    return type(box).__name__ == 'TextBox' and not box.text.strip()
+
+
+def _field(box) -> Optional[str]:
+    element = getattr(box, 'element', None)
+    if element is None or not hasattr(element, 'get'):
+        return None
+    if LAYER_VAR_CLASS not in (element.get('class') or '').split():
+        return None
+    return element.get('data-field')
+
+
+def _collect_marked(box, ancestors: list, found: list):
+    field = _field(box)
+    if field is not None:
+        found.append((field, box, ancestors))
+        return
+    for child in _children(box):
+        _collect_marked(child, ancestors + [box], found)
+
+
+def _check_style(style, where: str):
+    from weasyprint.css.properties import INITIAL_VALUES
+    for name in _PLAIN_TEXT_PROPERTIES:
+        if name in INITIAL_VALUES and style[name] != INITIAL_VALUES[name]:
+            raise RasterFastPathUnsupported(f"{name} on {where}")
+    if style['direction'] != 'ltr':
+        raise RasterFastPathUnsupported(f"right-to-left text on {where}")
+    if style['text_transform'] not in _TEXT_TRANSFORMS:
+        raise RasterFastPathUnsupported(f"text-transform: {style['text_transform']} on {where}")
+
+
+def _line_alignment(line) -> str:
+    align = line.style['text_align_all']
+    if line.style['text_align_last'] != 'auto':
+        align = line.style['text_align_last']
+    align = {'left': 'start', 'right': 'end'}.get(align, align)
+    if align not in ('start', 'center', 'end'):
+        raise RasterFastPathUnsupported(f"text-align: {align}")
+    return align
+
+
+def _load_font(textbox, field: str):
+    """Font file of a single-font, single-line text box plus its glyph coverage"""
+    from fontTools.ttLib import TTFont
+    from weasyprint.text.ffi import ffi, harfbuzz
+    from weasyprint.text.fonts import get_pango_font_hb_face, get_hb_object_data
+
+    pango_layout = getattr(textbox, 'pango_layout', None)
+    if pango_layout is None:
+        raise RasterFastPathUnsupported(f"'{field}' has no Pango layout in this WeasyPrint version")
+    first_line, next_index = pango_layout.get_first_line()
+    if next_index is not None:
+        raise RasterFastPathUnsupported(f"'{field}' wraps onto several lines")
+
+    pango_font = None
+    run = first_line.runs[0]
+    while run != ffi.NULL:
+        font = run.data.item.analysis.font
+        if pango_font is not None and font != pango_font:
+            raise RasterFastPathUnsupported(f"'{field}' is drawn with fallback fonts")
+        pango_font = font
+        run = run.next
+    if pango_font is None:
+        raise RasterFastPathUnsupported(f"'{field}' has no glyphs")
+
+    hb_face = get_pango_font_hb_face(pango_font)
+    font_data = get_hb_object_data(hb_face)
+    font_index = harfbuzz.hb_face_get_index(hb_face)
+
+    tt_font = TTFont(io.BytesIO(font_data), fontNumber=font_index, lazy=True)
+    if 'fvar' in tt_font:
+        raise RasterFastPathUnsupported(f"'{field}' uses a variable font")
+    style = textbox.style
+    os2 = tt_font['OS/2'] if 'OS/2' in tt_font else None
+    if style['font_weight'] >= 600 and (os2 is None or os2.usWeightClass < 600):
+        raise RasterFastPathUnsupported(f"'{field}' needs synthetic bold")
+    if style['font_style'] != 'normal' and not (os2 is not None and os2.fsSelection & 1):
+        raise RasterFastPathUnsupported(f"'{field}' needs synthetic italics")
+    coverage = frozenset(tt_font.getBestCmap() or ())
+    return font_data, font_index, coverage
+
+
+def _color(style) -> Tuple[int, int, int, int]:
+    color = style['color']
+    red, green, blue = color.to('srgb').coordinates
+    return tuple(
+        max(0, min(255, round(channel * 255)))
+        for channel in (red, green, blue, color.alpha)
+    )
+
+
+def measure_slots(document) -> Dict[Tuple[str, int], TextSlot]:
+    """
+    Text slots of every marked value in a laid-out WeasyPrint document.
+    Raises RasterFastPathUnsupported when any value cannot be redrawn exactly.
+    """
+    if len(document.pages) != 1:
+        raise RasterFastPathUnsupported("document has more than one page")
+
+    found = []
+    _collect_marked(document.pages[0]._page_box, [], found)
+
+    slots = {}
+    occurrences = Counter()
+    for field, span, ancestors in found:
+        for ancestor in ancestors + [span]:
+            if ancestor.style['opacity'] != 1:
+                raise RasterFastPathUnsupported(f"opacity around '{field}'")
+            if ancestor.style['transform']:
+                raise RasterFastPathUnsupported(f"transform around '{field}'")
+
+        line_index = next(
+            (i for i in range(len(ancestors) - 1, -1, -1)
+             if type(ancestors[i]).__name__ == 'LineBox'),
+            None
+        )
+        if line_index is None or line_index == 0:
+            raise RasterFastPathUnsupported(f"'{field}' is not inline text")
+        block, line = ancestors[line_index - 1], ancestors[line_index]
+
+        # The value must be the only content of its line so it can move freely
+        chain = ancestors[line_index:] + [span]
+        for parent, child in zip(chain, chain[1:]):
+            content = [box for box in _children(parent) if not _is_whitespace(box)]
+            if len(content) != 1 or content[0] is not child:
+                raise RasterFastPathUnsupported(f"'{field}' shares its line with other content")
+        texts = _children(span)
+        if len(texts) != 1 or type(texts[0]).__name__ != 'TextBox':
+            raise RasterFastPathUnsupported(f"'{field}' is split or contains markup")
+        textbox = texts[0]
+        _check_style(textbox.style, f"'{field}'")
+
+        font_data, font_index, coverage = _load_font(textbox, field)
+        key = (field, occurrences[field])
+        occurrences[field] += 1
+        slots[key] = TextSlot(
+            x=textbox.position_x,
+            baseline=textbox.position_y + textbox.baseline,
+            text_width=textbox.width,
+            line_width=line.width,
+            available_width=block.width - line.text_indent,
+            align=_line_alignment(line),
+            transform=textbox.style['text_transform'],
+            font_data=font_data,
+            font_index=font_index,
+            font_size=textbox.style['font_size'],
+            coverage=coverage,
+            color=_color(textbox.style)
+        )
+    return slots
+
+
+def _pil_font(slot: TextSlot, scale: float):
+    from PIL import ImageFont
+    return ImageFont.truetype(
+        io.BytesIO(slot.font_data),
+        size=slot.font_size * scale,
+        index=slot.font_index
+    )
+
+
+def build_raster_template(document, background_image, dpi: int, variables: List[Tuple[str, str]]) -> RasterTemplate:
+    """
+    Measure text slots from the static layer document and keep its raster.
+    variables are the values the document was laid out with; PIL must
+    measure them like WeasyPrint did or the template is unsupported.
+    """
+    if np is None:
+        raise ImportError("numpy package not installed. Run: pip install numpy")
+
+    check_weasyprint_internals()
+
+    # WeasyPrint lays out in CSS px (96 per inch)
+    scale = dpi / 96
+    slots = measure_slots(document)
+    if sorted(slots) != sorted(_slot_keys(variables)):
+        raise RasterFastPathUnsupported("marked values and laid-out text do not match")
+
+    fonts = {key: _pil_font(slot, scale) for key, slot in slots.items()}
+    for key, (_, text) in zip(_slot_keys(variables), variables):
+        slot = slots[key]
+        text = _TEXT_TRANSFORMS[slot.transform](text)
+        width = fonts[key].getlength(text) / scale
+        if abs(width - slot.text_width) > _WIDTH_TOLERANCE:
+            raise RasterFastPathUnsupported(f"font metrics for '{key[0]}' differ from WeasyPrint")
+
+    background = np.asarray(background_image.convert('RGB'), dtype=np.uint8)
+    return RasterTemplate(background, slots, fonts, scale)
+
+
+def _slot_keys(variables: List[Tuple[str, str]]) -> List[Tuple[str, int]]:
+    occurrences = Counter()
+    keys = []
+    for field, _ in variables:
+        keys.append((field, occurrences[field]))
+        occurrences[field] += 1
+    return keys
+
+
+def _blend(canvas, mask, left: int, top: int, color: Tuple[int, int, int, int]):
+    """Alpha-blend a solid color through an 8-bit coverage mask"""
+    height, width = canvas.shape[:2]
+    x0, y0 = max(left, 0), max(top, 0)
+    x1, y1 = min(left + mask.shape[1], width), min(top + mask.shape[0], height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    coverage = mask[y0 - top:y1 - top, x0 - left:x1 - left].astype(np.float32)
+    alpha = (coverage * (color[3] / (255.0 * 255.0)))[..., None]
+    region = canvas[y0:y1, x0:x1].astype(np.float32)
+    region += (np.array(color[:3], dtype=np.float32) - region) * alpha
+    canvas[y0:y1, x0:x1] = (region + 0.5).astype(np.uint8)
+
+
+def composite(template: RasterTemplate, variables: List[Tuple[str, str]]):
+    """
+    Draw one certificate's values onto a copy of the background.
+    Returns a PIL image, or None when this certificate needs the PDF path.
+    """
+    from PIL import Image, ImageDraw
+
+    keys = _slot_keys(variables)
+    if sorted(keys) != sorted(template.slots):
+        return None
+
+    scale = template.scale
+    canvas = template.background.copy()
+    for key, (_, text) in zip(keys, variables):
+        slot = template.slots[key]
+        text = _TEXT_TRANSFORMS[slot.transform](text)
+        if any(ord(char) not in slot.coverage for char in text if not char.isspace()):
+            return None
+
+        font = template.fonts[key]
+        delta = font.getlength(text) / scale - slot.text_width
+        if slot.line_width + delta > slot.available_width:
+            return None  # WeasyPrint would wrap this value
+        shift = {'start': 0.0, 'center': -delta / 2, 'end': -delta}[slot.align]
+
+        x = (slot.x + shift) * scale
+        baseline = slot.baseline * scale
+        left, top, right, bottom = font.getbbox(text, anchor='ls')
+        origin_x = math.floor(x) + left
+        origin_y = round(baseline) + top
+        mask = Image.new('L', (right - left + 2, bottom - top + 1))
+        ImageDraw.Draw(mask).text(
+            (x - math.floor(x) - left, -top), text, font=font, fill=255, anchor='ls'
+        )
+        _blend(canvas, np.asarray(mask), origin_x, origin_y, slot.color)
+
+    return Image.fromarray(canvas, 'RGB')
@@ -0,0 +1,136 @@
+"""
+PDF Rasterizer Backends
+Pluggable PDF-to-image converters selected via RASTERIZER_BACKEND
+"""
+
+import abc
+import threading
+from typing import Dict, Type, Iterator
+
+
+class Rasterizer(abc.ABC):
+    """Base class for PDF rasterizer backends"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def rasterize(self, pdf_bytes: bytes, dpi: int = 300, page_index: int = 0):
+        """Render one page of a PDF into an RGB PIL image"""
+
+    @abc.abstractmethod
+    def rasterize_pages(self, pdf_bytes: bytes, dpi: int = 300) -> Iterator:
+        """Render every page of a PDF, in order, into RGB PIL images"""
+
+
+class Pdf2ImageRasterizer(Rasterizer):
+    """
+    Poppler via pdf2image.
+    Writes the PDF to a temp file and spawns pdftoppm for every call.
+    """
+
+    name = "pdf2image"
+
+    def __init__(self):
+        try:
+            from pdf2image import convert_from_bytes
+        except ImportError:
+            raise ImportError("pdf2image package not installed. Run: pip install pdf2image")
+        self._convert_from_bytes = convert_from_bytes
+
+    def rasterize(self, pdf_bytes: bytes, dpi: int = 300, page_index: int = 0):
+        page_number = page_index + 1
+        images = self._convert_from_bytes(
+            pdf_bytes,
+            dpi=dpi,
+            first_page=page_number,
+            last_page=page_number
+        )
+        if not images:
+            raise ValueError("Failed to convert PDF to image: No images returned from converter")
+        return images[0]
+
+    def rasterize_pages(self, pdf_bytes: bytes, dpi: int = 300) -> Iterator:
+        # One pdftoppm run for the whole document
+        for image in self._convert_from_bytes(pdf_bytes, dpi=dpi):
+            yield image.convert('RGB')
+
+
+class PdfiumRasterizer(Rasterizer):
+    """
+    In-process PDFium via pypdfium2.
+    No subprocess or temp file; the PDF is parsed straight from memory.
+    """
+
+    name = "pdfium"
+
+    # PDFium is not thread-safe; serialize calls within a process. Reentrant, so a
+    # rasterize_pages generator finalized mid-call on the same thread cannot deadlock.
+    _lock = threading.RLock()
+
+    def __init__(self):
+        try:
+            import pypdfium2
+        except ImportError:
+            raise ImportError("pypdfium2 package not installed. Run: pip install pypdfium2")
+        self._pdfium = pypdfium2
+
+    def rasterize(self, pdf_bytes: bytes, dpi: int = 300, page_index: int = 0):
+        with self._lock:
+            document = self._pdfium.PdfDocument(pdf_bytes)
+            try:
+                if page_index >= len(document):
+                    raise ValueError("Failed to convert PDF to image: Page out of range")
+                page = document[page_index]
+                try:
+                    # PDF user space is 72 units per inch
+                    bitmap = page.render(scale=dpi / 72)
+                    return bitmap.to_pil().convert('RGB')
+                finally:
+                    page.close()
+            finally:
+                document.close()
+
+    def rasterize_pages(self, pdf_bytes: bytes, dpi: int = 300) -> Iterator:
+        # Parse once, but take the lock per page: it is never held while the
+        # caller has a page, so an abandoned generator cannot block other renders
+        with self._lock:
+            document = self._pdfium.PdfDocument(pdf_bytes)
+            page_count = len(document)
+        try:
+            for page_index in range(page_count):
+                with self._lock:
+                    page = document[page_index]
+                    try:
+                        image = page.render(scale=dpi / 72).to_pil().convert('RGB')
+                    finally:
+                        page.close()
+                yield image
+        finally:
+            with self._lock:
+                document.close()
+
+
+RASTERIZERS: Dict[str, Type[Rasterizer]] = {
+    Pdf2ImageRasterizer.name: Pdf2ImageRasterizer,
+    PdfiumRasterizer.name: PdfiumRasterizer,
+}
+
+
+def get_rasterizer(name: str) -> Rasterizer:
+    """
+    Instantiate the configured rasterizer.
+    Falls back to pdf2image when the requested backend is unknown or its
+    package is not installed.
+    """
+    backend = RASTERIZERS.get((name or "").lower())
+    if backend is None:
+        print(f"Warning: Unknown RASTERIZER_BACKEND '{name}', using pdf2image")
+        return Pdf2ImageRasterizer()
+
+    try:
+        return backend()
+    except ImportError as e:
+        if backend is Pdf2ImageRasterizer:
+            raise
+        print(f"Warning: {e}. Falling back to pdf2image rasterizer")
+        return Pdf2ImageRasterizer()
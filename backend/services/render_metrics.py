@@ -0,0 +1,74 @@
+"""
+Render Timing Metrics
+Per-stage counters and cumulative timings for the rendering pipeline
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class RenderMetrics:
+    """
+    Thread-safe stage timings.
+    Render workers record into their own process-local instance and the
+    pool merges the drained deltas into the parent's instance.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, list] = {}  # stage -> [count, total_seconds]
+
+    def record(self, stage: str, seconds: float = 0.0, count: int = 1):
+        """Add one (or count) observations of a stage"""
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Time a block and record it under stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def drain(self) -> Dict[str, tuple]:
+        """Return and reset all recorded stages (used to ship worker metrics)"""
+        with self._lock:
+            drained = {stage: tuple(entry) for stage, entry in self._stages.items()}
+            self._stages.clear()
+            return drained
+
+    def merge(self, drained: Dict[str, tuple]):
+        """Add stages drained from another instance"""
+        for stage, (count, seconds) in drained.items():
+            self.record(stage, seconds, count)
+
+    def stats(self) -> dict:
+        """Per-stage count, total and average in milliseconds"""
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": count,
+                    "total_ms": round(seconds * 1000, 2),
+                    "avg_ms": round(seconds * 1000 / count, 3) if count else 0.0
+                }
+                for stage, (count, seconds) in self._stages.items()
+            }
+
+        # Each stylesheet cache hit skips one parse of the template CSS
+        parse = stages.get("stylesheet_parse")
+        hits = stages.get("stylesheet_cache_hit")
+        if parse and hits:
+            stages["stylesheet_cache_hit"]["estimated_saved_ms"] = round(
+                hits["count"] * parse["avg_ms"], 2
+            )
+        return stages
+
+
+# Singleton instance (one per process)
+render_metrics = RenderMetrics()
@@ -0,0 +1,303 @@
+"""
+Render Worker Pool
+Runs WeasyPrint rendering and rasterization in a pre-warmed process pool
+so a render never blocks the event loop
+"""
+
+import asyncio
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, List, Dict
+from fastapi import HTTPException
+
+from config import get_settings
+from services.render_metrics import render_metrics
+
+settings = get_settings()
+
+
+class RenderTaskError(Exception):
+    """Picklable error raised inside a render worker (HTTPException is not picklable)"""
+
+    def __init__(self, detail: str, status_code: int = 500):
+        super().__init__(detail, status_code)
+        self.detail = detail
+        self.status_code = status_code
+
+
+# ============================================
+# WORKER-SIDE FUNCTIONS (run inside pool processes)
+# ============================================
+
+def _warm_worker():
+    """Process initializer: import WeasyPrint and load fonts once per worker"""
+    try:
+        from weasyprint import HTML
+        from services.certificate_service import rendering_service
+        # Warm the FontConfiguration real renders share, not a throwaway one
+        HTML(string="<p>warm-up</p>").write_pdf(font_config=rendering_service.font_config)
+    except Exception as e:
+        # Keep the worker alive; the real render will surface the error
+        print(f"Render worker {os.getpid()} warm-up failed: {e}")
+
+
+def _ping() -> int:
+    """No-op task used to force worker processes to spawn"""
+    return os.getpid()
+
+
+def _call_rendering(method_name: str, *args):
+    """
+    Invoke a RenderingService method, translating errors into picklable ones.
+    Returns (result, drained stage timings) so the parent can merge metrics.
+    """
+    from services.certificate_service import rendering_service
+    try:
+        return getattr(rendering_service, method_name)(*args), render_metrics.drain()
+    except HTTPException as e:
+        raise RenderTaskError(str(e.detail), e.status_code)
+    except Exception as e:
+        raise RenderTaskError(str(e))
+
+
+# ============================================
+# POOL
+# ============================================
+
+class RenderPool:
+    """
+    Bounded, awaitable pool for CPU-bound rendering.
+
+    - size: number of worker processes (0 runs tasks in threads instead)
+    - queue_depth: tasks allowed to wait for a free worker; further
+      callers wait on the event loop, applying backpressure to bulk jobs
+    - task_timeout: seconds before a caller gets a 504; the task itself runs
+      on and holds its slot until it finishes. Once every worker of the pool
+      is busy with a timed-out task, the pool is recycled: its processes are
+      killed (failing those tasks and freeing their slots) and a fresh pool
+      takes new work. In thread mode hung tasks cannot be stopped.
+    """
+
+    def __init__(self, size: int, queue_depth: int, task_timeout: float):
+        self.size = max(0, size)
+        self.queue_depth = max(0, queue_depth)
+        self.task_timeout = task_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        # Timed-out tasks still running, per executor
+        self._hung: Counter = Counter()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.recycled = 0
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn avoids forking a process that already runs an event loop and threads
+        return ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker
+        )
+
+    async def start(self):
+        """Create the pool and pre-warm every worker process"""
+        if self.size == 0:
+            print("Render pool disabled (RENDER_POOL_SIZE=0), rendering in threads")
+            return
+        if self._executor is not None:
+            return
+
+        self._executor = self._create_executor()
+        loop = asyncio.get_running_loop()
+        try:
+            pids = await asyncio.gather(*[
+                loop.run_in_executor(self._executor, _ping) for _ in range(self.size)
+            ])
+            print(f"Render pool started with {len(set(pids))} pre-warmed workers")
+        except Exception as e:
+            print(f"Warning: Render pool warm-up failed: {e}")
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        """
+        Stop an executor, killing its workers (a hung task ignores cancellation).
+        The current pool is replaced on the next run(); a newer pool started by
+        another caller is left alone.
+        """
+        if self._executor is executor:
+            self._executor = None
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _task_timed_out(self, executor: ProcessPoolExecutor, task: asyncio.Future):
+        """Count a hung task against its executor; recycle it when all its workers hang"""
+        self._hung[executor] += 1
+        task.add_done_callback(lambda finished: self._hung_task_finished(executor))
+        if self._hung[executor] >= self.size and self._executor is executor:
+            self.recycled += 1
+            print(f"CRITICAL ERROR: All {self.size} render workers are stuck on timed-out tasks, restarting render pool")
+            self._discard(executor)
+
+    def _hung_task_finished(self, executor: ProcessPoolExecutor):
+        self._hung[executor] -= 1
+        if self._hung[executor] <= 0:
+            del self._hung[executor]
+
+    async def shutdown(self):
+        """Stop worker processes"""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, True, cancel_futures=True)
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(max(1, self.size) + self.queue_depth)
+        return self._slots
+
+    async def run(self, func, *args):
+        """
+        Run func(*args) off the event loop with queue and timeout limits.
+        A task that times out keeps running in its worker, so it keeps its
+        slot until it actually finishes and the pool is never oversubscribed.
+        """
+        slots = self._get_slots()
+        await slots.acquire()
+        self.in_flight += 1
+        task = None
+        executor = None
+        try:
+            if self.size == 0:
+                task = asyncio.ensure_future(asyncio.to_thread(func, *args))
+            else:
+                if self._executor is None:
+                    # Scripts and tests that never went through app startup,
+                    # or a pool discarded after a crash or hung workers
+                    await self.start()
+                executor = self._executor
+                task = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+            # shield: a timeout or a cancelled caller must not cancel the task,
+            # or the slot would be freed while the worker is still busy
+            result = await asyncio.wait_for(asyncio.shield(task), timeout=self.task_timeout)
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if executor is not None and not task.done():
+                self._task_timed_out(executor, task)
+            raise HTTPException(
+                status_code=504,
+                detail=f"Rendering timed out after {self.task_timeout} seconds"
+            )
+        except BrokenProcessPool:
+            self.failed += 1
+            if executor is not None and self._executor is executor:
+                print("CRITICAL ERROR: Render worker died, restarting render pool")
+                self._discard(executor)
+            raise HTTPException(
+                status_code=500,
+                detail="Render worker crashed. Please retry."
+            )
+        except RenderTaskError as e:
+            self.failed += 1
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        finally:
+            if task is None or task.done():
+                self._release(slots)
+            else:
+                task.add_done_callback(lambda finished: self._release(slots, finished))
+
+    def _release(self, slots: asyncio.Semaphore, abandoned: Optional[asyncio.Future] = None):
+        """Free a slot; an abandoned task's result or error is discarded"""
+        if abandoned is not None and not abandoned.cancelled():
+            abandoned.exception()
+        self.in_flight -= 1
+        slots.release()
+
+    async def _run_rendering(self, method_name: str, *args):
+        """Run a RenderingService method in a worker and merge its timings"""
+        result, timings = await self.run(_call_rendering, method_name, *args)
+        render_metrics.merge(timings)
+        return result
+
+    async def render_pdf(
+        self,
+        html_content: str,
+        css_content: str = None,
+        stylesheet_key: Optional[tuple] = None
+    ) -> bytes:
+        """Render HTML to PDF in a worker (stylesheet_key enables the parsed CSS cache)"""
+        return await self._run_rendering("render_pdf", html_content, css_content, stylesheet_key)
+
+    async def render_layered_pdf(
+        self,
+        html_content: str,
+        css_content: Optional[str],
+        stylesheet_key: Optional[tuple],
+        layer_key: tuple
+    ) -> bytes:
+        """Render a layered-template certificate against the worker's cached static layer"""
+        return await self._run_rendering(
+            "render_layered_pdf", html_content, css_content, stylesheet_key, layer_key
+        )
+
+    async def render_images(
+        self,
+        html_content: str,
+        css_content: Optional[str],
+        stylesheet_key: Optional[tuple],
+        layer_key: tuple,
+        formats: List[str],
+        dpi: int = 300
+    ) -> Dict[str, bytes]:
+        """Image-only output for a layered template (raster fast path with PDF fallback)"""
+        return await self._run_rendering(
+            "render_images", html_content, css_content, stylesheet_key, layer_key, list(formats), dpi
+        )
+
+    async def render_batch(
+        self,
+        html_documents: List[str],
+        css_content: Optional[str],
+        stylesheet_key: Optional[tuple],
+        formats: List[str],
+        dpi: int = 300,
+        layout_key: Optional[tuple] = None
+    ) -> List[Dict[str, bytes]]:
+        """Render several certificates of one template as one document in a worker"""
+        return await self._run_rendering(
+            "render_batch", list(html_documents), css_content, stylesheet_key, list(formats), dpi, layout_key
+        )
+
+    async def convert_to_image(self, pdf_bytes: bytes, format: str, dpi: int = 300) -> bytes:
+        """Rasterize PDF to an image format in a worker"""
+        return await self._run_rendering("convert_to_image", pdf_bytes, format, dpi)
+
+    async def convert_to_images(self, pdf_bytes: bytes, formats: List[str], dpi: int = 300) -> Dict[str, bytes]:
+        """Rasterize PDF once and encode it into every requested format in a worker"""
+        return await self._run_rendering("convert_to_images", pdf_bytes, list(formats), dpi)
+
+    def stats(self) -> dict:
+        """Pool counters for monitoring"""
+        return {
+            "size": self.size,
+            "queue_depth": self.queue_depth,
+            "task_timeout": self.task_timeout,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "recycled": self.recycled
+        }
+
+
+# Singleton instance
+render_pool = RenderPool(
+    settings.RENDER_POOL_SIZE,
+    settings.RENDER_QUEUE_DEPTH,
+    settings.RENDER_TASK_TIMEOUT
+)
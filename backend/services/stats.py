@@ -0,0 +1,284 @@
+"""
+Statistics Service
+Counters behind the admin dashboard and daily generation analytics. Changes
+are recorded on the session as they happen and written with one upsert per
+table just before the session commits, so the statistics commit (or roll
+back) together with the certificates and users they count, and the hot
+counter rows are only locked for the duration of the commit. A periodic
+reconciliation recounts the totals and rebuilds recent daily rows to repair
+any drift; it locks the counter rows first, so writers committing meanwhile
+wait for it instead of being overwritten, and it runs at most once per
+interval across all app processes.
+"""
+
+import asyncio
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import async_session, dialect_insert, engine
+from db_models import Certificate, DailyCertificateStat, StatCounter, User
+
+settings = get_settings()
+
+CERTIFICATES_TOTAL = "certificates_total"
+CERTIFICATES_REVOKED = "certificates_revoked"
+USERS_TOTAL = "users_total"
+COUNTERS = (CERTIFICATES_TOTAL, CERTIFICATES_REVOKED, USERS_TOTAL)
+# Unix time of the last periodic reconciliation, shared by all app processes
+RECONCILED_AT = "stats_reconciled_at"
+
+# Session.info key holding the changes not yet written
+_PENDING = "pending_stats"
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _pending(db: AsyncSession) -> dict:
+    return db.info.setdefault(_PENDING, {'counters': Counter(), 'daily': Counter()})
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending_stats(session: Session):
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        stats_service.write(session, pending)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_stats(session: Session, transaction):
+    # Changes recorded in a transaction that rolled back must not leak into the next one
+    if transaction.parent is None:
+        session.info.pop(_PENDING, None)
+
+
+class StatsService:
+    """Maintained counters and daily rollups, read in constant time"""
+
+    def certificates_created(
+        self,
+        db: AsyncSession,
+        template_id=None,
+        user_id=None,
+        count: int = 1
+    ):
+        """Record generated certificates (written when db commits)"""
+        if count <= 0:
+            return
+        pending = _pending(db)
+        pending['counters'][CERTIFICATES_TOTAL] += count
+        day = _today()
+        if template_id:
+            pending['daily'][(day, 'template', str(template_id))] += count
+        if user_id:
+            pending['daily'][(day, 'user', str(user_id))] += count
+
+    def certificates_revoked(self, db: AsyncSession, count: int = 1):
+        """Record revocations; restores are recorded with a negative count"""
+        _pending(db)['counters'][CERTIFICATES_REVOKED] += count
+
+    def user_created(self, db: AsyncSession):
+        _pending(db)['counters'][USERS_TOTAL] += 1
+
+    def _upsert(self, session: Session, model, rows: List[dict], keys: List[str], column: str, add: bool):
+        """
+        Write each row's column value onto the row with the same keys, creating
+        it if missing. With add=True the value is added to the existing one.
+        """
+        upsert = dialect_insert()
+        if upsert is not None:
+            stmt = upsert(model).values(rows)
+            value = getattr(stmt.excluded, column)
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=[getattr(model, key) for key in keys],
+                set_={column: getattr(model, column) + value if add else value}
+            ))
+            return
+
+        for row in rows:
+            result = session.execute(
+                update(model)
+                .where(*[getattr(model, key) == row[key] for key in keys])
+                .values({column: getattr(model, column) + row[column] if add else row[column]})
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                session.execute(insert(model).values(**row))
+
+    def write(self, session: Session, pending: dict):
+        """Apply recorded changes (runs inside the committing transaction)"""
+        # Sorted, so counter rows are locked in the same order as by _lock_counters
+        counters = [
+            {'name': name, 'value': value}
+            for name, value in sorted(pending['counters'].items()) if value
+        ]
+        daily = [
+            {'day': day, 'dimension': dimension, 'subject_id': subject_id, 'count': count}
+            for (day, dimension, subject_id), count in pending['daily'].items() if count
+        ]
+        if counters:
+            self._upsert(session, StatCounter, counters, ['name'], 'value', add=True)
+        if daily:
+            self._upsert(session, DailyCertificateStat, daily, ['day', 'dimension', 'subject_id'], 'count', add=True)
+
+    async def get_counters(self, db: AsyncSession) -> Dict[str, int]:
+        """All counters in one primary key lookup; counted once if they were never initialised"""
+        result = await db.execute(select(StatCounter.name, StatCounter.value).where(StatCounter.name.in_(COUNTERS)))
+        counters = dict(result.all())
+        if len(counters) < len(COUNTERS):
+            counters = await self.reconcile_counters(db)
+            await db.commit()
+        return counters
+
+    async def get_daily(
+        self,
+        db: AsyncSession,
+        dimension: str,
+        start: date,
+        end: date,
+        subject_id: Optional[str] = None
+    ) -> List[DailyCertificateStat]:
+        """Daily counts for one dimension between start and end (inclusive), oldest first"""
+        query = (
+            select(DailyCertificateStat)
+            .where(
+                DailyCertificateStat.dimension == dimension,
+                DailyCertificateStat.day >= start,
+                DailyCertificateStat.day <= end
+            )
+            .order_by(DailyCertificateStat.day, DailyCertificateStat.count.desc())
+        )
+        if subject_id:
+            query = query.where(DailyCertificateStat.subject_id == subject_id)
+        result = await db.execute(query)
+        return list(result.scalars().all())
+
+    async def _lock_counters(self, db: AsyncSession) -> Dict[str, int]:
+        """
+        Lock the counter rows (creating missing ones) until db commits, and
+        return their values. Every writer updates a counter row before its
+        daily rows, so this also holds off daily updates.
+        """
+        names = sorted(COUNTERS + (RECONCILED_AT,))
+        await db.run_sync(
+            self._upsert, StatCounter, [{'name': name, 'value': 0} for name in names], ['name'], 'value', True
+        )
+        result = await db.execute(select(StatCounter.name, StatCounter.value).where(StatCounter.name.in_(names)))
+        return dict(result.all())
+
+    async def reconcile_counters(self, db: AsyncSession) -> Dict[str, int]:
+        """
+        Recount every counter from the source tables (full scans; not for request paths).
+        The counter rows are locked before counting: changes committed by other
+        sessions meanwhile wait for this transaction and are then added on top.
+        """
+        await self._lock_counters(db)
+        counters = {
+            CERTIFICATES_TOTAL: await db.scalar(select(func.count(Certificate.id))) or 0,
+            CERTIFICATES_REVOKED: await db.scalar(
+                select(func.count(Certificate.id)).where(Certificate.is_revoked == True)
+            ) or 0,
+            USERS_TOTAL: await db.scalar(select(func.count(User.id))) or 0,
+        }
+        await db.run_sync(
+            self._upsert, StatCounter,
+            [{'name': name, 'value': value} for name, value in counters.items()],
+            ['name'], 'value', False
+        )
+        return counters
+
+    async def reconcile_daily(self, db: AsyncSession, days: int) -> int:
+        """Rebuild the daily rows of the last `days` UTC days; returns the rows written"""
+        first_day = _today() - timedelta(days=max(1, days) - 1)
+        since = datetime.combine(first_day, time.min, tzinfo=timezone.utc)
+
+        if engine.dialect.name == "postgresql":
+            day_column = func.date(func.timezone('UTC', Certificate.created_at))
+        else:
+            day_column = func.date(Certificate.created_at)
+
+        rows = []
+        for dimension, column in (("template", Certificate.template_id), ("user", Certificate.user_id)):
+            result = await db.execute(
+                select(day_column.label('day'), column, func.count(Certificate.id))
+                .where(Certificate.created_at >= since, column.is_not(None))
+                .group_by(day_column, column)
+            )
+            for day, subject_id, count in result.all():
+                if isinstance(day, str):
+                    day = date.fromisoformat(day)
+                rows.append({'day': day, 'dimension': dimension, 'subject_id': str(subject_id), 'count': count})
+
+        await db.execute(delete(DailyCertificateStat).where(DailyCertificateStat.day >= first_day))
+        if rows:
+            await db.run_sync(self._upsert, DailyCertificateStat, rows, ['day', 'dimension', 'subject_id'], 'count', False)
+        return len(rows)
+
+    async def reconcile(self, days: int, min_interval_seconds: int = 0) -> Optional[Dict[str, int]]:
+        """
+        Recount totals and rebuild recent daily rows in one transaction.
+        Returns None without recounting if any process reconciled less than
+        min_interval_seconds ago.
+        """
+        async with async_session() as db:
+            last_run = (await self._lock_counters(db)).get(RECONCILED_AT, 0)
+            now = int(datetime.now(timezone.utc).timestamp())
+            if now - last_run < min_interval_seconds:
+                await db.rollback()
+                return None
+            counters = await self.reconcile_counters(db)
+            daily_rows = await self.reconcile_daily(db, days)
+            await db.run_sync(
+                self._upsert, StatCounter, [{'name': RECONCILED_AT, 'value': now}], ['name'], 'value', False
+            )
+            await db.commit()
+        return {**counters, 'daily_rows': daily_rows}
+
+
+class StatsReconciler:
+    """
+    Background task repairing counter drift every STATS_RECONCILE_SECONDS.
+    Every app process runs one; a pass is skipped when another process has
+    reconciled within the interval.
+    """
+
+    def __init__(self, interval_seconds: int, days: int):
+        self.interval_seconds = interval_seconds
+        self.days = days
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[datetime] = None
+
+    async def start(self):
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                # A little slack, so the process that ran last time isn't skipped by timer jitter
+                result = await stats_service.reconcile(self.days, int(self.interval_seconds * 0.9))
+                if result is not None:
+                    self.last_run = datetime.now(timezone.utc)
+                    print(f"Stats reconciled: {result}")
+            except Exception as e:
+                print(f"Stats reconciliation failed: {e}")
+
+
+# Singleton instances
+stats_service = StatsService()
+stats_reconciler = StatsReconciler(settings.STATS_RECONCILE_SECONDS, settings.STATS_RECONCILE_DAYS)
@@ -0,0 +1,817 @@
+"""
+Storage Backends
+One async interface to wherever certificate files live: the local
+filesystem, Supabase Storage, an S3-compatible bucket, or an in-process
+fake for offline tests (STORAGE_TYPE=memory). Files are addressed by their
+relative path, e.g. "2026/01/27/NH-2026-00001.pdf". Remote requests share
+one pooled HTTP client, run at most STORAGE_CONCURRENCY at a time per
+process and are retried with exponential backoff on connection errors,
+429 and 5xx responses.
+"""
+
+import abc
+import asyncio
+import base64
+import random
+import tempfile
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from urllib.parse import quote, unquote, urlparse
+
+from config import get_settings
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+# Supabase resumable (TUS) uploads take the file in parts of exactly this size
+UPLOAD_CHUNK_SIZE = 6 * 1024 * 1024
+
+# Seconds a signed download URL stays valid
+SIGNED_URL_EXPIRES = 3600
+
+# Paths per delete request (the Supabase and S3 limit)
+DELETE_BATCH_SIZE = 1000
+
+# S3 multipart uploads: smallest part S3 accepts, most parts per upload,
+# and parts of one upload sent at a time (each held in memory while sent)
+MULTIPART_MIN_PART_SIZE = 5 * 1024 * 1024
+MULTIPART_MAX_PARTS = 10000
+MULTIPART_CONCURRENCY = 4
+# Streamed uploads don't know their size up front: the part size grows by the
+# configured size every this many parts, so 10000 parts of 8 MB hold ~440 GB
+MULTIPART_GROWTH_PARTS = 1000
+
+
+class StorageError(Exception):
+    """A storage request failed"""
+
+
+class StorageFileNotFound(StorageError, FileNotFoundError):
+    """The file does not exist in storage"""
+
+
+class StorageTransientError(StorageError):
+    """A failure worth retrying: connection error, 429 or 5xx"""
+
+
+_http_client = None
+_http_client_loop = None
+
+
+def get_http_client():
+    """The process-wide pooled httpx.AsyncClient (recreated if the event loop changes)"""
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client_loop is not loop:
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("httpx package not installed. Run: pip install httpx")
+        connections = max(1, settings.STORAGE_CONCURRENCY)
+        _http_client = httpx.AsyncClient(
+            timeout=settings.STORAGE_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        )
+        _http_client_loop = loop
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client, _http_client_loop
+    client, _http_client, _http_client_loop = _http_client, None, None
+    if client is not None:
+        await client.aclose()
+
+
+def _b64(value: str) -> str:
+    return base64.b64encode(value.encode()).decode()
+
+
+class StreamingUpload(abc.ABC):
+    """
+    A file uploaded while it is still being produced. The producer passes
+    write_part() consecutive chunks of part_size bytes (only the last may be
+    shorter; part_size is read again before each part), then calls
+    complete(), or abort() to discard everything written so far.
+    """
+
+    part_size = 1024 * 1024
+
+    @abc.abstractmethod
+    async def write_part(self, data: bytes):
+        ...
+
+    @abc.abstractmethod
+    async def complete(self):
+        ...
+
+    @abc.abstractmethod
+    async def abort(self):
+        ...
+
+
+class SpooledUpload(StreamingUpload):
+    """Writes the parts to a local file under STORAGE_PATH and stores it with put_file on completion"""
+
+    def __init__(self, backend: "StorageBackend", path: str, content_type: str):
+        self.backend = backend
+        self.path = path
+        self.content_type = content_type
+        spool_dir = Path(settings.STORAGE_PATH)
+        spool_dir.mkdir(parents=True, exist_ok=True)
+        # Same filesystem as local storage, so completing there is a rename
+        self._file = tempfile.NamedTemporaryFile(dir=spool_dir, prefix=".upload-", delete=False)
+        self.local_path = Path(self._file.name)
+
+    async def write_part(self, data: bytes):
+        await asyncio.to_thread(self._file.write, data)
+
+    async def complete(self):
+        await asyncio.to_thread(self._file.close)
+        try:
+            await self.backend.put_file(self.path, self.local_path, self.content_type)
+        finally:
+            self.local_path.unlink(missing_ok=True)
+
+    async def abort(self):
+        self._file.close()
+        self.local_path.unlink(missing_ok=True)
+
+
+class StorageBackend(abc.ABC):
+    """Async file storage; subclasses implement the requests"""
+
+    name = "base"
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        retries: Optional[int] = None,
+        backoff_seconds: Optional[float] = None
+    ):
+        self.concurrency = max(1, concurrency or settings.STORAGE_CONCURRENCY)
+        self.retries = max(0, settings.STORAGE_RETRIES if retries is None else retries)
+        self.backoff_seconds = settings.STORAGE_RETRY_BACKOFF_SECONDS if backoff_seconds is None else backoff_seconds
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        """Request slots shared by every caller in this process"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        return self._slots
+
+    async def _call(self, description: str, request: Callable[[], Awaitable[T]]) -> T:
+        """Run one request in a slot, retrying transient failures with jittered exponential backoff"""
+        attempt = 0
+        while True:
+            try:
+                async with self._get_slots():
+                    return await request()
+            except StorageTransientError as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt) * random.uniform(0.5, 1.0)
+                attempt += 1
+                print(f"Storage: {description} failed ({e}); retry {attempt}/{self.retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    @abc.abstractmethod
+    async def put(self, path: str, data: bytes, content_type: str = "application/octet-stream", upsert: bool = False):
+        """Store data at path"""
+
+    async def put_file(self, path: str, local_path: Path, content_type: str = "application/octet-stream"):
+        """Store a local file at path; the local file is consumed (moved or removed)"""
+        data = await asyncio.to_thread(local_path.read_bytes)
+        await self.put(path, data, content_type, upsert=True)
+        local_path.unlink(missing_ok=True)
+
+    def open_upload(self, path: str, content_type: str = "application/octet-stream") -> StreamingUpload:
+        """
+        Start storing a file of unknown size at path, written part by part.
+        By default the parts are spooled to local disk and stored on completion.
+        """
+        return SpooledUpload(self, path, content_type)
+
+    @abc.abstractmethod
+    async def get(self, path: str) -> bytes:
+        """File contents; raises StorageFileNotFound"""
+
+    @abc.abstractmethod
+    async def exists(self, path: str) -> bool:
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, paths: Iterable[str]):
+        """Remove files; missing files are ignored"""
+
+    @abc.abstractmethod
+    async def urls(self, paths: List[str]) -> Dict[str, str]:
+        """Download URL of each path. Relative URLs ("/downloads/...") are served by this app."""
+
+    @abc.abstractmethod
+    def path_from_url(self, url: str) -> Optional[str]:
+        """Relative path of a download URL made by urls(), or None"""
+
+    @abc.abstractmethod
+    async def check(self) -> dict:
+        """Connection details for the storage health check; raises if storage is unreachable"""
+
+    async def close(self):
+        await close_http_client()
+
+
+class LocalStorageBackend(StorageBackend):
+    """Files under STORAGE_PATH, served by the app at /downloads"""
+
+    name = "local"
+
+    def __init__(self, root: str, **kwargs):
+        super().__init__(**kwargs)
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _file(self, path: str) -> Path:
+        file_path = (self.root / path).resolve()
+        if not file_path.is_relative_to(self.root.resolve()):
+            raise StorageError(f"Path outside storage: {path}")
+        return file_path
+
+    async def put(self, path: str, data: bytes, content_type: str = "application/octet-stream", upsert: bool = False):
+        def write():
+            file_path = self._file(path)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_bytes(data)
+        await self._call(f"write {path}", lambda: asyncio.to_thread(write))
+
+    async def put_file(self, path: str, local_path: Path, content_type: str = "application/octet-stream"):
+        def move():
+            file_path = self._file(path)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            local_path.replace(file_path)
+        await self._call(f"move {path}", lambda: asyncio.to_thread(move))
+
+    async def get(self, path: str) -> bytes:
+        def read():
+            try:
+                return self._file(path).read_bytes()
+            except FileNotFoundError:
+                raise StorageFileNotFound(f"File not found: {path}")
+        return await self._call(f"read {path}", lambda: asyncio.to_thread(read))
+
+    async def exists(self, path: str) -> bool:
+        return await asyncio.to_thread(lambda: self._file(path).exists())
+
+    async def delete(self, paths: Iterable[str]):
+        def remove():
+            for path in paths:
+                self._file(path).unlink(missing_ok=True)
+        await self._call("delete", lambda: asyncio.to_thread(remove))
+
+    async def urls(self, paths: List[str]) -> Dict[str, str]:
+        return {path: f"/downloads/{path}" for path in paths}
+
+    def path_from_url(self, url: str) -> Optional[str]:
+        # http://localhost:8000/downloads/2026/01/27/cert.pdf
+        if '/downloads/' in url:
+            return unquote(url.split('/downloads/', 1)[-1])
+        return None
+
+    async def check(self) -> dict:
+        return {"path": str(self.root), "exists": self.root.exists()}
+
+    async def close(self):
+        pass
+
+
+class MemoryStorageBackend(StorageBackend):
+    """In-process fake for offline tests; files are lost when the process exits"""
+
+    name = "memory"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.files: Dict[str, Tuple[bytes, str]] = {}
+
+    async def put(self, path: str, data: bytes, content_type: str = "application/octet-stream", upsert: bool = False):
+        self.files[path] = (bytes(data), content_type)
+
+    async def get(self, path: str) -> bytes:
+        if path not in self.files:
+            raise StorageFileNotFound(f"File not found: {path}")
+        return self.files[path][0]
+
+    async def exists(self, path: str) -> bool:
+        return path in self.files
+
+    async def delete(self, paths: Iterable[str]):
+        for path in paths:
+            self.files.pop(path, None)
+
+    async def urls(self, paths: List[str]) -> Dict[str, str]:
+        return {path: f"memory://{path}" for path in paths}
+
+    def path_from_url(self, url: str) -> Optional[str]:
+        return url[len("memory://"):] if url.startswith("memory://") else None
+
+    async def check(self) -> dict:
+        return {"files": len(self.files)}
+
+    async def close(self):
+        pass
+
+
+class SupabaseStorageBackend(StorageBackend):
+    """Supabase Storage through its REST API on the shared HTTP client"""
+
+    name = "supabase"
+
+    def __init__(self, url: Optional[str], key: Optional[str], bucket: str, public: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        if not url or not key:
+            raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set for Supabase storage")
+        self.base_url = f"{url.rstrip('/')}/storage/v1"
+        self.bucket = bucket
+        self.public = public
+        self._headers = {"Authorization": f"Bearer {key}", "apikey": key}
+
+    def _object_url(self, path: str) -> str:
+        return f"{self.base_url}/object/{self.bucket}/{quote(path)}"
+
+    async def _send(self, method: str, url: str, headers: dict, **kwargs):
+        """One request attempt; connection errors, 429 and 5xx raise StorageTransientError"""
+        import httpx
+
+        try:
+            response = await get_http_client().request(method, url, headers=headers, **kwargs)
+        except httpx.TransportError as e:
+            raise StorageTransientError(f"{type(e).__name__}: {e}")
+        if response.status_code == 429 or response.status_code >= 500:
+            raise StorageTransientError(f"HTTP {response.status_code}: {response.text[:200]}")
+        return response
+
+    async def _request(self, description: str, method: str, url: str, headers: Optional[dict] = None, **kwargs):
+        headers = {**self._headers, **(headers or {})}
+        return await self._call(description, lambda: self._send(method, url, headers, **kwargs))
+
+    @staticmethod
+    def _is_duplicate(response) -> bool:
+        # Existing objects come back as 409, or as 400 with a 409 / Duplicate body
+        return response.status_code == 409 or (
+            response.status_code == 400 and ('"409"' in response.text or "Duplicate" in response.text)
+        )
+
+    @staticmethod
+    def _is_missing(response) -> bool:
+        # Missing objects come back as 404, or as 400 with a not_found body
+        return response.status_code == 404 or (
+            response.status_code == 400 and ("not_found" in response.text or "not found" in response.text.lower())
+        )
+
+    def _check(self, response, path: str = ""):
+        if self._is_missing(response):
+            raise StorageFileNotFound(f"File not found: {path}")
+        if response.is_error:
+            raise StorageError(f"Supabase Storage returned {response.status_code}: {response.text[:200]}")
+
+    async def put(self, path: str, data: bytes, content_type: str = "application/octet-stream", upsert: bool = False):
+        headers = {
+            **self._headers,
+            "Content-Type": content_type,
+            "Cache-Control": "max-age=3600",
+            "x-upsert": "true" if upsert else "false"
+        }
+        attempts = 0
+
+        async def send():
+            nonlocal attempts
+            attempts += 1
+            return await self._send("POST", self._object_url(path), headers, content=data)
+
+        response = await self._call(f"upload {path}", send)
+        if attempts > 1 and self._is_duplicate(response):
+            # An earlier attempt stored the file, only its response was lost
+            return
+        self._check(response, path)
+
+    async def put_file(self, path: str, local_path: Path, content_type: str = "application/octet-stream"):
+        """Files over UPLOAD_CHUNK_SIZE use the resumable (TUS) endpoint, one part in memory at a time"""
+        size = local_path.stat().st_size
+        if size <= UPLOAD_CHUNK_SIZE:
+            return await super().put_file(path, local_path, content_type)
+
+        tus_headers = {"Tus-Resumable": "1.0.0"}
+        metadata = {"bucketName": self.bucket, "objectName": path, "contentType": content_type}
+        response = await self._request(
+            f"start upload {path}", "POST", f"{self.base_url}/upload/resumable",
+            headers={
+                **tus_headers,
+                "Upload-Length": str(size),
+                "Upload-Metadata": ",".join(
+                    f"{key} {_b64(value)}" for key, value in metadata.items()
+                ),
+                "x-upsert": "true"
+            }
+        )
+        self._check(response, path)
+        upload_url = response.headers["Location"]
+
+        offset = 0
+        with open(local_path, 'rb') as f:
+            while offset < size:
+                f.seek(offset)
+                part = await asyncio.to_thread(f.read, UPLOAD_CHUNK_SIZE)
+                response = await self._request(
+                    f"upload {path} at {offset}", "PATCH", upload_url,
+                    headers={
+                        **tus_headers,
+                        "Upload-Offset": str(offset),
+                        "Content-Type": "application/offset+octet-stream"
+                    },
+                    content=part
+                )
+                if response.status_code == 409:
+                    # A retried part had already been stored; continue from the server's offset
+                    response = await self._request(f"resume {path}", "HEAD", upload_url, headers=tus_headers)
+                    self._check(response, path)
+                    offset = int(response.headers["Upload-Offset"])
+                    continue
+                self._check(response, path)
+                offset = int(response.headers.get("Upload-Offset", offset + len(part)))
+        local_path.unlink(missing_ok=True)
+
+    async def get(self, path: str) -> bytes:
+        response = await self._request(f"download {path}", "GET", self._object_url(path))
+        self._check(response, path)
+        return response.content
+
+    async def exists(self, path: str) -> bool:
+        response = await self._request(f"check {path}", "HEAD", self._object_url(path))
+        if self._is_missing(response):
+            return False
+        self._check(response, path)
+        return True
+
+    async def delete(self, paths: Iterable[str]):
+        paths = list(paths)
+        for start in range(0, len(paths), DELETE_BATCH_SIZE):
+            response = await self._request(
+                "delete", "DELETE", f"{self.base_url}/object/{self.bucket}",
+                json={"prefixes": paths[start:start + DELETE_BATCH_SIZE]}
+            )
+            self._check(response)
+
+    def public_url(self, path: str) -> str:
+        """Public URL of a file (built locally, no request)"""
+        return f"{self.base_url}/object/public/{self.bucket}/{quote(path)}"
+
+    async def urls(self, paths: List[str]) -> Dict[str, str]:
+        """Public URLs, or for a private bucket signed URLs from one request"""
+        if self.public or not paths:
+            return {path: self.public_url(path) for path in paths}
+        response = await self._request(
+            "sign URLs", "POST", f"{self.base_url}/object/sign/{self.bucket}",
+            json={"expiresIn": SIGNED_URL_EXPIRES, "paths": paths}
+        )
+        self._check(response)
+        urls = {}
+        for entry in response.json():
+            signed = entry.get('signedURL') or entry.get('signedUrl')
+            if entry.get('path') and signed:
+                urls[entry['path']] = f"{self.base_url}{signed}"
+        return urls
+
+    def path_from_url(self, url: str) -> Optional[str]:
+        # https://.../object/public/certificates/2026/01/27/cert.pdf
+        # https://.../object/sign/certificates/2026/01/27/cert.pdf?token=...
+        for marker in ('/object/public/', '/object/sign/'):
+            if marker in url:
+                path = unquote(url.split(marker, 1)[-1].split('?')[0])
+                if path.startswith(self.bucket + "/"):
+                    return path[len(self.bucket) + 1:]
+                return path
+        return None
+
+    async def check(self) -> dict:
+        response = await self._request(
+            "list", "POST", f"{self.base_url}/object/list/{self.bucket}",
+            json={"prefix": "", "limit": 1}
+        )
+        self._check(response)
+        return {"bucket": self.bucket, "connected": True}
+
+
+class S3MultipartUpload(StreamingUpload):
+    """
+    Streams a file into an S3 multipart upload: each part is sent as soon as
+    it is written, up to MULTIPART_CONCURRENCY parts in flight, so only
+    those parts are held in memory and nothing is staged on disk.
+    """
+
+    def __init__(self, backend: "S3StorageBackend", path: str, content_type: str):
+        self.backend = backend
+        self.path = path
+        self.content_type = content_type
+        self.upload_id: Optional[str] = None
+        self._parts: Dict[int, str] = {}
+        self._sending: set = set()
+        self._part_count = 0
+
+    @property
+    def part_size(self) -> int:
+        return self.backend.part_size * (1 + self._part_count // MULTIPART_GROWTH_PARTS)
+
+    async def write_part(self, data: bytes):
+        if self._part_count >= MULTIPART_MAX_PARTS:
+            raise StorageError(f"S3 upload {self.path} has more than {MULTIPART_MAX_PARTS} parts")
+        if self.upload_id is None:
+            self.upload_id = (await self.backend._run(
+                f"start upload {self.path}",
+                lambda: self.backend.client.create_multipart_upload(
+                    Bucket=self.backend.bucket, Key=self.path, ContentType=self.content_type
+                )
+            ))['UploadId']
+        # Wait for a free sending slot; a failed part fails this write
+        while len(self._sending) >= MULTIPART_CONCURRENCY:
+            done, self._sending = await asyncio.wait(self._sending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        self._part_count += 1
+        self._sending.add(asyncio.create_task(self._send(self._part_count, data)))
+
+    async def _send(self, number: int, data: bytes):
+        self._parts[number] = (await self.backend._run(
+            f"upload {self.path} part {number}",
+            lambda: self.backend.client.upload_part(
+                Bucket=self.backend.bucket, Key=self.path, UploadId=self.upload_id, PartNumber=number, Body=data
+            )
+        ))['ETag']
+
+    async def _wait_for_parts(self):
+        """
+        Wait for every part in flight, raising the first part error. Parts are
+        never cancelled: their boto3 call runs on in a worker thread and could
+        land after an abort, leaving an orphaned part.
+        """
+        if self._sending:
+            await asyncio.wait(self._sending)
+        sending, self._sending = self._sending, set()
+        errors = [task.exception() for task in sending if not task.cancelled() and task.exception()]
+        if errors:
+            raise errors[0]
+
+    async def complete(self):
+        if self.upload_id is None:
+            # Nothing was written
+            await self.backend.put(self.path, b"", self.content_type)
+            return
+        try:
+            await self._wait_for_parts()
+            parts = [{'PartNumber': number, 'ETag': self._parts[number]} for number in sorted(self._parts)]
+            await self.backend._run(f"complete upload {self.path}", lambda: self.backend.client.complete_multipart_upload(
+                Bucket=self.backend.bucket, Key=self.path, UploadId=self.upload_id, MultipartUpload={'Parts': parts}
+            ))
+        except BaseException:
+            await self.abort()
+            raise
+
+    async def abort(self):
+        try:
+            await self._wait_for_parts()
+        except Exception:
+            pass  # The upload is aborted anyway
+        if self.upload_id is None:
+            return
+        upload_id, self.upload_id = self.upload_id, None
+        try:
+            await self.backend._run(f"abort upload {self.path}", lambda: self.backend.client.abort_multipart_upload(
+                Bucket=self.backend.bucket, Key=self.path, UploadId=upload_id
+            ))
+        except Exception as e:
+            print(f"Storage: Could not abort multipart upload of {self.path}: {e}")
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    S3-compatible bucket (AWS S3, MinIO, R2...) through boto3, whose calls run
+    in worker threads. Files larger than one part are sent with a multipart
+    upload, read from disk a part at a time; download URLs are presigned
+    locally without a request.
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: Optional[str],
+        access_key: Optional[str],
+        secret_key: Optional[str],
+        endpoint: Optional[str] = None,
+        region: Optional[str] = None,
+        addressing_style: str = "auto",
+        part_size: int = 8 * 1024 * 1024,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise ImportError("boto3 package not installed. Run: pip install boto3")
+        if not bucket:
+            raise ValueError("S3_BUCKET must be set for S3 storage")
+        self.bucket = bucket
+        self.part_size = max(MULTIPART_MIN_PART_SIZE, part_size)
+        # boto3 keeps its own connection pool and retries transient errors itself
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint or None,
+            region_name=region or "us-east-1",
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            config=Config(
+                signature_version="s3v4",
+                s3={"addressing_style": addressing_style or "auto"},
+                max_pool_connections=self.concurrency,
+                connect_timeout=settings.STORAGE_TIMEOUT_SECONDS,
+                read_timeout=settings.STORAGE_TIMEOUT_SECONDS,
+                retries={"max_attempts": self.retries + 1, "mode": "standard"}
+            )
+        )
+
+    @staticmethod
+    def _is_missing(error) -> bool:
+        code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+        return code in ('404', 'NoSuchKey', 'NotFound')
+
+    async def _run(self, description: str, function: Callable[[], T]) -> T:
+        """Run a boto3 call in a worker thread; its errors surface as StorageError"""
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        def call():
+            try:
+                return function()
+            except (BotoCoreError, ClientError) as e:
+                if self._is_missing(e):
+                    raise StorageFileNotFound(f"S3 {description}: not found")
+                raise StorageError(f"S3 {description} failed: {e}")
+
+        return await self._call(description, lambda: asyncio.to_thread(call))
+
+    async def put(self, path: str, data: bytes, content_type: str = "application/octet-stream", upsert: bool = False):
+        await self._run(f"upload {path}", lambda: self.client.put_object(
+            Bucket=self.bucket, Key=path, Body=data, ContentType=content_type
+        ))
+
+    async def put_file(self, path: str, local_path: Path, content_type: str = "application/octet-stream"):
+        """Streams the file from disk: in one request up to part_size, in parts beyond it"""
+        size = local_path.stat().st_size
+        if size <= self.part_size:
+            def upload():
+                with open(local_path, 'rb') as f:
+                    self.client.put_object(Bucket=self.bucket, Key=path, Body=f, ContentType=content_type)
+            await self._run(f"upload {path}", upload)
+        else:
+            await self._put_multipart(path, local_path, size, content_type)
+        local_path.unlink(missing_ok=True)
+
+    def open_upload(self, path: str, content_type: str = "application/octet-stream") -> StreamingUpload:
+        """Streamed straight into a multipart upload, without a local copy"""
+        return S3MultipartUpload(self, path, content_type)
+
+    async def _put_multipart(self, path: str, local_path: Path, size: int, content_type: str):
+        """
+        Upload a file in parts, MULTIPART_CONCURRENCY at a time, each read from
+        disk only when it is sent. The upload is aborted if any part fails.
+        """
+        # S3 allows at most 10000 parts, so very large files get larger parts
+        part_size = max(self.part_size, -(-size // MULTIPART_MAX_PARTS))
+        part_count = -(-size // part_size)
+        upload_id = (await self._run(f"start upload {path}", lambda: self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=path, ContentType=content_type
+        )))['UploadId']
+
+        sending = asyncio.Semaphore(MULTIPART_CONCURRENCY)
+        in_flight = set()  # boto3 calls already handed to a worker thread
+
+        async def upload_part(number: int) -> dict:
+            def send():
+                with open(local_path, 'rb') as f:
+                    f.seek((number - 1) * part_size)
+                    data = f.read(part_size)
+                return self.client.upload_part(
+                    Bucket=self.bucket, Key=path, UploadId=upload_id, PartNumber=number, Body=data
+                )['ETag']
+            async with sending:
+                call = asyncio.ensure_future(self._run(f"upload {path} part {number}", send))
+                in_flight.add(call)
+                return {'PartNumber': number, 'ETag': await asyncio.shield(call)}
+
+        tasks = [asyncio.create_task(upload_part(number)) for number in range(1, part_count + 1)]
+        try:
+            parts = await asyncio.gather(*tasks)
+            await self._run(f"complete upload {path}", lambda: self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=path, UploadId=upload_id, MultipartUpload={'Parts': parts}
+            ))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # A cancelled part's thread runs on; wait so it cannot land after the abort
+            if in_flight:
+                await asyncio.wait(in_flight)
+                for call in in_flight:
+                    if not call.cancelled():
+                        call.exception()
+            try:
+                await self._run(f"abort upload {path}", lambda: self.client.abort_multipart_upload(
+                    Bucket=self.bucket, Key=path, UploadId=upload_id
+                ))
+            except Exception as e:
+                print(f"Storage: Could not abort multipart upload of {path}: {e}")
+            raise
+
+    async def get(self, path: str) -> bytes:
+        return await self._run(
+            f"download {path}",
+            lambda: self.client.get_object(Bucket=self.bucket, Key=path)['Body'].read()
+        )
+
+    async def exists(self, path: str) -> bool:
+        try:
+            await self._run(f"check {path}", lambda: self.client.head_object(Bucket=self.bucket, Key=path))
+            return True
+        except StorageFileNotFound:
+            return False
+
+    async def delete(self, paths: Iterable[str]):
+        """One DeleteObjects request per DELETE_BATCH_SIZE paths"""
+        paths = list(dict.fromkeys(paths))
+        for start in range(0, len(paths), DELETE_BATCH_SIZE):
+            batch = paths[start:start + DELETE_BATCH_SIZE]
+            response = await self._run(f"delete {len(batch)} files", lambda batch=batch: self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': path} for path in batch], 'Quiet': True}
+            ))
+            errors = response.get('Errors') or []
+            if errors:
+                raise StorageError(
+                    f"S3 could not delete {len(errors)} files, e.g. {errors[0].get('Key')}: {errors[0].get('Message')}"
+                )
+
+    async def urls(self, paths: List[str]) -> Dict[str, str]:
+        # Presigning only signs the URL locally; no request is made
+        return {
+            path: self.client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': self.bucket, 'Key': path},
+                ExpiresIn=SIGNED_URL_EXPIRES
+            )
+            for path in paths
+        }
+
+    def path_from_url(self, url: str) -> Optional[str]:
+        # Virtual-hosted (https://bucket.host/key) or path-style (https://host/bucket/key)
+        parsed = urlparse(url)
+        path = unquote(parsed.path).lstrip('/')
+        if not path:
+            return None
+        if not (parsed.hostname or '').startswith(self.bucket + ".") and path.startswith(self.bucket + "/"):
+            return path[len(self.bucket) + 1:]
+        return path
+
+    async def check(self) -> dict:
+        await self._run("check bucket", lambda: self.client.head_bucket(Bucket=self.bucket))
+        return {"bucket": self.bucket, "connected": True}
+
+    async def close(self):
+        pass
+
+
+def create_storage_backend(storage_type: Optional[str] = None) -> StorageBackend:
+    """Backend for STORAGE_TYPE: "local", "supabase", "s3" or "memory" """
+    storage_type = (storage_type or settings.STORAGE_TYPE or "local").lower()
+    if storage_type == "supabase":
+        return SupabaseStorageBackend(
+            settings.SUPABASE_URL,
+            settings.SUPABASE_SERVICE_ROLE_KEY,
+            settings.SUPABASE_STORAGE_BUCKET or "certificates",
+            settings.SUPABASE_STORAGE_PUBLIC
+        )
+    if storage_type == "s3":
+        return S3StorageBackend(
+            settings.S3_BUCKET,
+            settings.S3_ACCESS_KEY,
+            settings.S3_SECRET_KEY,
+            settings.S3_ENDPOINT,
+            settings.S3_REGION,
+            settings.S3_ADDRESSING_STYLE,
+            settings.S3_MULTIPART_PART_SIZE_MB * 1024 * 1024
+        )
+    if storage_type == "memory":
+        return MemoryStorageBackend()
+    return LocalStorageBackend(settings.STORAGE_PATH)
+
+
+# Singleton instance
+storage_backend = create_storage_backend()
@@ -0,0 +1,451 @@
+"""
+Variable Layer
+PDF output for layered templates without laying out every certificate in
+full: the static layer is laid out once and the block holding each marked
+value is measured. Each certificate then lays out a small document with
+only its values, in absolutely positioned blocks at the measured positions
+with the same width and text styles. That page is drawn over the static
+page, a form XObject serialized once (see pdf_tools.page_form).
+
+A template is rendered this way only if the small document reproduces the
+template's own text layout exactly. Single-line values in boxes sized by
+their content (table cells, floats, inline blocks...) are also laid out
+with a short and a long probe value, and the static layout must not change.
+A certificate whose values take a different number of lines, leave their
+block or fall outside the probed widths is rendered normally instead.
+"""
+
+from collections import Counter
+from typing import NamedTuple, Optional, Dict, List, Tuple, Any, Callable
+
+from markupsafe import escape
+
+from services.layered_rendering import iter_variables, paint_signature, replace_variables
+from services.pdf_tools import PageForm, page_form
+from services.raster_fast_path import _children, _collect_marked, _field, _is_whitespace, _slot_keys
+
+# Allowed difference between the template's and the small document's text geometry (CSS px)
+_TOLERANCE = 0.01
+
+# Probe values for single-line values in content-sized boxes; the long probe
+# repeats the value to fill up to this share of its block
+_SHORT_PROBE = "."
+_LONG_PROBE_FILL = 0.95
+
+# Inherited text properties the small document does not copy; they must keep their initial value
+_INITIAL_TEXT_PROPERTIES = (
+    'direction',
+    'unicode_bidi',
+    'font_feature_settings',
+    'font_kerning',
+    'font_language_override',
+    'font_variant_alternates',
+    'font_variant_caps',
+    'font_variant_east_asian',
+    'font_variant_ligatures',
+    'font_variant_numeric',
+    'font_variant_position',
+    'font_variation_settings',
+    'hyphenate_character',
+    'hyphenate_limit_chars',
+    'hyphenate_limit_zone',
+    'tab_size',
+    'text_decoration_line',
+    'text_overflow',
+    'block_ellipsis',
+    'max_lines',
+)
+
+# Boxes whose width (in normal flow) does not depend on their content
+_FIXED_WIDTH_BOXES = ('PageBox', 'BlockBox', 'FlexBox', 'GridBox')
+# Containers that size their children from the children's content
+_SIZING_CONTAINERS = ('FlexBox', 'InlineFlexBox', 'GridBox', 'InlineGridBox')
+
+
+class VariableLayoutUnsupported(Exception):
+    """The template's variable text cannot be laid out on its own"""
+
+
+class TextBlock(NamedTuple):
+    """Where one marked value's block sits and what its small-document copy must measure"""
+    index: int  # Class b<index> in the variable stylesheet, b<index>-<depth> for its inline boxes
+    depth: int
+    left: float
+    width: float
+    lines: int
+    height: float
+    min_width: Optional[float] = None  # Widths probed for single-line values in content-sized boxes
+    max_width: Optional[float] = None
+
+
+class VariableLayout(NamedTuple):
+    """Cached static page and value blocks of a layered template; form is None when unsupported"""
+    form: Optional[PageForm]
+    css: str
+    blocks: Dict[Tuple[str, int], TextBlock]
+    reason: Optional[str] = None
+
+
+def _unwrap(box):
+    """The box behind an AbsolutePlaceholder (absolutely positioned boxes in their parent's children)"""
+    return getattr(box, '_box', box)
+
+
+def _text_boxes(box) -> list:
+    box = _unwrap(box)
+    if type(box).__name__ == 'TextBox':
+        return [box]
+    return [text for child in _children(box) for text in _text_boxes(child)]
+
+
+def _geometry(texts: list) -> List[tuple]:
+    return [
+        (text.text, text.position_x, text.position_y, text.width, text.height, getattr(text, 'baseline', 0))
+        for text in texts
+    ]
+
+
+def _same_geometry(expected: List[tuple], actual: List[tuple]) -> bool:
+    if len(expected) != len(actual):
+        return False
+    for first, second in zip(expected, actual):
+        if first[0] != second[0]:
+            return False
+        if any(abs(a - b) > _TOLERANCE for a, b in zip(first[1:], second[1:])):
+            return False
+    return True
+
+
+def _css_number(value) -> str:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise VariableLayoutUnsupported(f"computed value {value!r}")
+    return f"{value:.6f}".rstrip('0').rstrip('.')
+
+
+def _length(value) -> str:
+    """A computed length (pixels or Dimension in px) as CSS"""
+    if getattr(value, 'unit', 'px') != 'px':
+        raise VariableLayoutUnsupported(f"computed length {value!r}")
+    return _css_number(getattr(value, 'value', value)) + 'px'
+
+
+def _string(value: str) -> str:
+    return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def _color(color) -> str:
+    red, green, blue = (max(0.0, min(1.0, channel)) for channel in color.to('srgb').coordinates)
+    return (
+        f"rgba({_css_number(red * 100)}%, {_css_number(green * 100)}%, "
+        f"{_css_number(blue * 100)}%, {_css_number(color.alpha)})"
+    )
+
+
+def text_declarations(style) -> List[str]:
+    """CSS declarations reproducing the inherited text styles of a computed style"""
+    line_height = style['line_height']
+    if line_height != 'normal':
+        line_height = _length(line_height) if hasattr(line_height, 'unit') else _css_number(line_height)
+    letter_spacing = style['letter_spacing']
+    if letter_spacing != 'normal':
+        letter_spacing = _length(letter_spacing)
+    declarations = [
+        f"font-family: {', '.join(_string(name) for name in style['font_family'])}",
+        f"font-size: {_length(style['font_size'])}",
+        f"font-style: {style['font_style']}",
+        f"font-weight: {_css_number(style['font_weight'])}",
+        f"font-stretch: {style['font_stretch']}",
+        f"line-height: {line_height}",
+        f"letter-spacing: {letter_spacing}",
+        f"word-spacing: {_length(style['word_spacing'])}",
+        f"text-transform: {style['text_transform']}",
+        f"white-space: {style['white_space']}",
+        f"word-break: {style['word_break']}",
+        f"overflow-wrap: {style['overflow_wrap']}",
+        f"hyphens: {style['hyphens']}",
+        f"color: {_color(style['color'])}",
+    ]
+    if style['lang']:
+        declarations.append(f"-weasy-lang: {_string(style['lang'])}")
+    return declarations
+
+
+def _check_text_style(style, where: str):
+    from weasyprint.css.properties import INITIAL_VALUES
+    for name in _INITIAL_TEXT_PROPERTIES:
+        if name in INITIAL_VALUES and style[name] != INITIAL_VALUES[name]:
+            raise VariableLayoutUnsupported(f"{name} on {where}")
+
+
+def _is_zero(value) -> bool:
+    return value == 'auto' or getattr(value, 'value', value) == 0
+
+
+def _check_plain_inline(style, where: str):
+    """Inline boxes around a value are copied as bare spans: they must not draw or offset anything"""
+    sides = ('top', 'right', 'bottom', 'left')
+    if not all(_is_zero(style[f'{kind}_{side}']) for kind in ('margin', 'padding') for side in sides):
+        raise VariableLayoutUnsupported(f"margins or padding on {where}")
+    if any(style[f'border_{side}_style'] != 'none' and style[f'border_{side}_width'] for side in sides):
+        raise VariableLayoutUnsupported(f"borders on {where}")
+    if style['background_color'].alpha or any(kind != 'none' for kind, _ in style['background_image']):
+        raise VariableLayoutUnsupported(f"background on {where}")
+    if style['box_shadow'] or style['outline_style'] != 'none':
+        raise VariableLayoutUnsupported(f"shadow or outline on {where}")
+    if style['vertical_align'] != 'baseline' or style['position'] != 'static':
+        raise VariableLayoutUnsupported(f"vertical-align or position on {where}")
+
+
+def _content_sized(chain: list) -> bool:
+    """Whether the width of the last box of chain (page box first) can depend on its content"""
+    for parent, box in zip(chain, chain[1:]):
+        style = box.style
+        if type(parent).__name__ in _SIZING_CONTAINERS or type(box).__name__ not in _FIXED_WIDTH_BOXES:
+            return True
+        if style['float'] != 'none' and style['width'] == 'auto':
+            return True
+        if (style['position'] in ('absolute', 'fixed') and style['width'] == 'auto'
+                and 'auto' in (style['left'], style['right'])):
+            return True
+    return False
+
+
+def _line_chain(line, field: str) -> list:
+    """Inline boxes from a line down to the marker span, which must be the line's only content"""
+    chain, box = [], line
+    while True:
+        content = [child for child in _children(box) if not _is_whitespace(child)]
+        if len(content) != 1:
+            raise VariableLayoutUnsupported(f"'{field}' shares its block with other content")
+        box = _unwrap(content[0])
+        if type(box).__name__ != 'InlineBox':
+            raise VariableLayoutUnsupported(f"'{field}' is not plain inline text")
+        chain.append(box)
+        if _field(box) is not None:
+            return chain
+
+
+def _marked_blocks(document) -> List[Tuple[Tuple[str, int], Any, list]]:
+    """(key, block, ancestors) of every block container holding a marked value, in layout order"""
+    found = []
+    _collect_marked(document.pages[0]._page_box, [], found)
+    blocks, seen = [], set()
+    occurrences = Counter()
+    for field, _, ancestors in found:
+        ancestors = [_unwrap(box) for box in ancestors]
+        line_index = next(
+            (i for i in range(len(ancestors) - 1, -1, -1)
+             if type(ancestors[i]).__name__ == 'LineBox'),
+            None
+        )
+        if not line_index:
+            raise VariableLayoutUnsupported(f"'{field}' is not inline text")
+        block = ancestors[line_index - 1]
+        if id(block) in seen:
+            continue
+        seen.add(id(block))
+        blocks.append(((field, occurrences[field]), block, ancestors[:line_index - 1]))
+        occurrences[field] += 1
+    return blocks
+
+
+def _measure_block(key: Tuple[str, int], block, ancestors: list) -> Tuple[list, List[str], List[List[str]], list]:
+    """
+    Check one value block and return (lines, block declarations, inline box
+    declarations, text boxes). Raises VariableLayoutUnsupported when the
+    small document could not reproduce it.
+    """
+    field = key[0]
+    lines = [_unwrap(child) for child in _children(block)]
+    if not lines or any(type(line).__name__ != 'LineBox' for line in lines):
+        raise VariableLayoutUnsupported(f"'{field}' shares its block with other content")
+    chains = [_line_chain(line, field) for line in lines]
+    elements = [box.element for box in chains[0]]
+    if any([box.element for box in chain] != elements for chain in chains[1:]):
+        raise VariableLayoutUnsupported(f"'{field}' shares its block with other content")
+
+    for box in ancestors + [block] + chains[0]:
+        if box.style['opacity'] != 1:
+            raise VariableLayoutUnsupported(f"opacity around '{field}'")
+        if box.style['transform']:
+            raise VariableLayoutUnsupported(f"transform around '{field}'")
+    _check_text_style(block.style, f"the block of '{field}'")
+    for box in chains[0]:
+        _check_text_style(box.style, f"'{field}'")
+        _check_plain_inline(box.style, f"'{field}'")
+
+    texts = []
+    for chain in chains:
+        span_children = [_unwrap(child) for child in _children(chain[-1])]
+        if any(type(child).__name__ != 'TextBox' for child in span_children):
+            raise VariableLayoutUnsupported(f"'{field}' contains markup")
+        texts.extend(span_children)
+    for text in texts:
+        _check_text_style(text.style, f"'{field}'")
+
+    first_line = lines[0]
+    block_declarations = [
+        f"left: {_length(block.content_box_x())}",
+        f"top: {_length(first_line.position_y)}",
+        f"width: {_length(block.width)}",
+        f"text-indent: {_length(first_line.text_indent)}",
+        f"text-align-all: {block.style['text_align_all']}",
+        f"text-align-last: {block.style['text_align_last']}",
+    ] + text_declarations(block.style)
+    inline_declarations = [text_declarations(box.style) for box in chains[0]]
+    return lines, block_declarations, inline_declarations, texts
+
+
+def _stylesheet(page, rules: List[str]) -> str:
+    return "\n".join([
+        f"@page {{ size: {_length(page.width)} {_length(page.height)}; margin: 0 }}",
+        "html, body { margin: 0; padding: 0 }",
+        "div { position: absolute; margin: 0; padding: 0; border: 0 }",
+    ] + rules) + "\n"
+
+
+def variable_html(layout: VariableLayout, variables: List[Tuple[str, str]]) -> Optional[str]:
+    """Small document with one certificate's values, or None when they do not match the layout's blocks"""
+    keys = _slot_keys(variables)
+    if sorted(keys) != sorted(layout.blocks):
+        return None
+    parts = []
+    for key, (_, text) in zip(keys, variables):
+        block = layout.blocks[key]
+        spans = "".join(f'<span class="b{block.index}-{depth}">' for depth in range(block.depth))
+        parts.append(f'<div class="b{block.index}">{spans}{escape(text)}{"</span>" * block.depth}</div>')
+    return "<!DOCTYPE html><html><body>" + "".join(parts) + "</body></html>"
+
+
+def _value_boxes(document) -> Dict[int, Any]:
+    """Block box of every value in a small document, by block index"""
+    found = {}
+
+    def walk(box):
+        box = _unwrap(box)
+        element = getattr(box, 'element', None)
+        name = element.get('class') if element is not None and hasattr(element, 'get') else None
+        if type(box).__name__ == 'BlockBox' and name and name[0] == 'b' and name[1:].isdigit():
+            found[int(name[1:])] = box
+            return
+        for child in _children(box):
+            walk(child)
+
+    walk(document.pages[0]._page_box)
+    return found
+
+
+def fits_layout(layout: VariableLayout, document) -> bool:
+    """Whether a laid-out small document keeps every value within what the static layer was checked for"""
+    if len(document.pages) != 1:
+        return False
+    boxes = _value_boxes(document)
+    for block in layout.blocks.values():
+        box = boxes.get(block.index)
+        if box is None or len(_children(box)) != block.lines or abs(box.height - block.height) > _TOLERANCE:
+            return False
+        texts = _text_boxes(box)
+        if texts and (
+            min(text.position_x for text in texts) < block.left - _TOLERANCE
+            or max(text.position_x + text.width for text in texts) > block.left + block.width + _TOLERANCE
+        ):
+            return False  # Overflowing text could be clipped or overlap the static layer
+        if block.min_width is not None:
+            width = sum(text.width for text in texts)
+            if not block.min_width - _TOLERANCE <= width <= block.max_width + _TOLERANCE:
+                return False
+    return True
+
+
+def _probe_widths(document, keys: List[Tuple[str, int]]) -> Dict[Tuple[str, int], float]:
+    widths = {}
+    for key, block, _ in _marked_blocks(document):
+        if key in keys:
+            if len(_children(block)) != 1:
+                raise VariableLayoutUnsupported(f"probe value for '{key[0]}' wraps")
+            widths[key] = sum(text.width for text in _text_boxes(block))
+    if len(widths) != len(keys):
+        raise VariableLayoutUnsupported("probe values and laid-out text do not match")
+    return widths
+
+
+def build_variable_layout(
+    html_content: str,
+    render_static: Callable[[str], Any],
+    render_variables: Callable[[str, str], Any]
+) -> VariableLayout:
+    """
+    Lay out the static layer of a marked document (render_document with
+    layered=True) once, keep its page as a form XObject and measure the value
+    blocks. render_static lays out marked HTML with the template stylesheets
+    and the values hidden; render_variables lays out a small document from
+    (css, html). Raises VariableLayoutUnsupported when the small document
+    cannot reproduce the template's text layout.
+    """
+    variables = iter_variables(html_content)
+    document = render_static(html_content)
+    page = document.pages[0]
+    if len(document.pages) != 1:
+        raise VariableLayoutUnsupported("document has more than one page")
+    if any(page.bleed.values()):
+        raise VariableLayoutUnsupported("page bleed")
+
+    marked = _marked_blocks(document)
+    if sorted(key for key, _, _ in marked) != sorted(_slot_keys(variables)):
+        raise VariableLayoutUnsupported("marked values and laid-out text do not match")
+
+    blocks, rules, expected, probed = {}, [], {}, []
+    for index, (key, block, ancestors) in enumerate(marked):
+        lines, block_declarations, inline_declarations, texts = _measure_block(key, block, ancestors)
+        rules.append(f".b{index} {{ {'; '.join(block_declarations)} }}")
+        rules.extend(
+            f".b{index}-{depth} {{ {'; '.join(declarations)} }}"
+            for depth, declarations in enumerate(inline_declarations)
+        )
+        blocks[key] = TextBlock(index, len(inline_declarations), block.content_box_x(), block.width, len(lines), 0.0)
+        expected[key] = (_geometry(texts), block.width - lines[0].text_indent)
+        if _content_sized(ancestors + [block]):
+            if len(lines) != 1:
+                raise VariableLayoutUnsupported(f"'{key[0]}' wraps inside a box sized by its content")
+            probed.append(key)
+
+    css = _stylesheet(page, rules)
+    layout = VariableLayout(None, css, blocks)
+    reference = render_variables(css, variable_html(layout, variables))
+    reference_page = reference.pages[0]
+    if len(reference.pages) != 1 or (
+        abs(reference_page.width - page.width) > _TOLERANCE or abs(reference_page.height - page.height) > _TOLERANCE
+    ):
+        raise VariableLayoutUnsupported("variable layer page differs from the template page")
+    boxes = _value_boxes(reference)
+    for key, block in blocks.items():
+        box = boxes.get(block.index)
+        if box is None or not _same_geometry(expected[key][0], _geometry(_text_boxes(box))):
+            raise VariableLayoutUnsupported(f"'{key[0]}' lays out differently on its own")
+        blocks[key] = block._replace(height=box.height)
+
+    if probed:
+        values = dict(zip(_slot_keys(variables), (text for _, text in variables)))
+        short, long = {}, {}
+        for key in probed:
+            text_geometry, available = expected[key]
+            width = sum(geometry[3] for geometry in text_geometry)
+            if width <= 0:
+                raise VariableLayoutUnsupported(f"'{key[0]}' has no width")
+            short[key] = _SHORT_PROBE
+            long[key] = values[key] * max(1, int(available * _LONG_PROBE_FILL // width))
+        signature = paint_signature(document)
+        widths = []
+        for probe in (short, long):
+            probe_document = render_static(replace_variables(html_content, probe))
+            if paint_signature(probe_document) != signature:
+                raise VariableLayoutUnsupported("static layout changes with the width of values in content-sized boxes")
+            widths.append(_probe_widths(probe_document, probed))
+        for key in probed:
+            width = sum(geometry[3] for geometry in expected[key][0])
+            blocks[key] = blocks[key]._replace(
+                min_width=min(width, widths[0][key]),
+                max_width=max(width, widths[1][key])
+            )
+
+    return VariableLayout(page_form(document.write_pdf()), css, blocks)
@@ -0,0 +1,37 @@
+"""
+Shared test setup: run from backend/ with `python -m pytest`.
+Settings are read at import time, so the environment is set before any app module loads.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("STORAGE_TYPE", "memory")
+os.environ.setdefault("STORAGE_PATH", tempfile.mkdtemp(prefix="certificate-tests-"))
+os.environ.setdefault("RENDER_POOL_SIZE", "0")
+
+
+@pytest.fixture
+def db_run():
+    """Run an async test function against freshly created tables (in-memory SQLite)"""
+    def run(test):
+        from database import Base, engine
+
+        async def with_tables():
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            try:
+                await test()
+            finally:
+                async with engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.drop_all)
+                await engine.dispose()
+        asyncio.run(with_tables())
+    return run
@@ -0,0 +1,120 @@
+"""Admin certificate and user listings (routers/admin.py): keyset cursors, on SQLite"""
+import base64
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from database import async_session
+from db_models import Certificate, User
+from routers.admin import list_all_certificates, list_users
+from services.pagination import decode_cursor, encode_cursor
+
+CREATED_AT = datetime(2026, 1, 27, 12, 0, tzinfo=timezone.utc)
+ADMIN = User(id=uuid.uuid4(), is_admin=True)
+
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def test_cursor_round_trip():
+    row_id = uuid.uuid4()
+    cursor = encode_cursor(CREATED_AT, row_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (CREATED_AT, row_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    "é",
+    raw_cursor({"created_at": "2026-01-27"}),
+    raw_cursor("ab"),
+    raw_cursor(5),
+    raw_cursor([None, str(uuid.uuid4())]),
+    raw_cursor(["yesterday", str(uuid.uuid4())]),
+    raw_cursor([CREATED_AT.isoformat(), 5]),
+    raw_cursor([CREATED_AT.isoformat(), "not-a-uuid"]),
+])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+async def add_rows(rows: list):
+    async with async_session() as db:
+        db.add_all(rows)
+        await db.commit()
+
+
+async def walk(list_page, items_key: str, limit: int) -> list:
+    """Every item of a listing, following next_cursor page by page"""
+    items, cursor = [], None
+    while True:
+        async with async_session() as db:
+            page = await list_page(db=db, admin=ADMIN, limit=limit, cursor=cursor)
+        items.extend(page[items_key])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_certificates_with_equal_created_at_are_paged_once_each(db_run):
+    ids = sorted((uuid.uuid4() for _ in range(7)), reverse=True)
+
+    async def list_certificates(**kwargs):
+        return await list_all_certificates(status_filter=None, revoked_only=False, include_total=False, **kwargs)
+
+    async def test():
+        await add_rows([
+            Certificate(
+                id=row_id, certificate_id=f"NH-{number}", certificate_data={}, student_name="Ada",
+                course_name="CCNA", issue_date="2026-01-27", status="generated", created_at=CREATED_AT
+            )
+            for number, row_id in enumerate(ids)
+        ])
+        items = await walk(list_certificates, "certificates", limit=3)
+        # Ties on created_at are broken by id, newest (highest) first
+        assert [item["id"] for item in items] == [str(row_id) for row_id in ids]
+    db_run(test)
+
+
+def test_users_with_equal_created_at_are_paged_once_each(db_run):
+    ids = sorted((uuid.uuid4() for _ in range(5)), reverse=True)
+
+    async def test():
+        await add_rows([
+            User(id=row_id, email=f"user{number}@example.com", created_at=CREATED_AT)
+            for number, row_id in enumerate(ids)
+        ])
+        items = await walk(list_users, "users", limit=2)
+        assert [item["id"] for item in items] == [str(row_id) for row_id in ids]
+    db_run(test)
+
+
+def test_listing_with_malformed_cursor_is_a_400(db_run):
+    async def test():
+        async with async_session() as db:
+            with pytest.raises(HTTPException) as error:
+                await list_users(db=db, admin=ADMIN, limit=10, cursor=raw_cursor(["2026-01-27", 5]))
+        assert error.value.status_code == 400
+    db_run(test)
+
+
+def test_users_list_their_own_certificate_counts(db_run):
+    counts = {"a@example.com": 3, "b@example.com": 0, "c@example.com": 1}
+
+    async def test():
+        users = {email: User(id=uuid.uuid4(), email=email) for email in counts}
+        await add_rows(list(users.values()) + [
+            Certificate(certificate_id=f"{email}-{number}", certificate_data={}, user_id=users[email].id)
+            for email, count in counts.items()
+            for number in range(count)
+        ] + [Certificate(certificate_id="anonymous", certificate_data={})])
+        # Counts stay per user across page boundaries
+        items = await walk(list_users, "users", limit=2)
+        assert {item["email"]: item["certificate_count"] for item in items} == counts
+    db_run(test)
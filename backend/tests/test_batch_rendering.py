@@ -0,0 +1,80 @@
+"""Batched rendering of several certificates as one document (RenderingService.render_batch)"""
+import io
+
+import pytest
+from pypdf import PdfReader
+
+from services import certificate_service
+from services.certificate_service import RenderingService, batch_layout_cache
+from services.render_metrics import render_metrics
+
+PAGE = (
+    '<html><head>{head}</head><body style="margin: 0">'
+    '<div style="width: 200px; height: 100px">{{{{ student_name }}}}</div></body></html>'
+)
+STYLE = '<style>@page { size: 300px 150px; margin: 0 } div { color: navy }</style>'
+NAMES = ["Ada", "Bob", "Cy"]
+
+
+@pytest.fixture
+def rendering():
+    try:
+        from weasyprint import HTML  # noqa: F401
+    except OSError as e:
+        pytest.skip(f"WeasyPrint system libraries missing: {e}")
+    render_metrics.drain()
+    return RenderingService()
+
+
+def documents(rendering, head: str, template_id: str):
+    return [
+        rendering.render_document(PAGE.format(head=head), {'student_name': name}, template_id=template_id)
+        for name in NAMES
+    ]
+
+
+def page_counts(files: list) -> list:
+    return [len(PdfReader(io.BytesIO(certificate_files['pdf'])).pages) for certificate_files in files]
+
+
+def test_layout_key_without_stylesheet():
+    rendering = RenderingService()
+    document = rendering.render_document('<p>{{ student_name }}</p>', {'student_name': 'Ada'}, template_id="t1")
+    edited = rendering.render_document('<p>{{ student_name }}!</p>', {'student_name': 'Ada'}, template_id="t1")
+    assert document.stylesheet_key is None
+    assert document.layout_key is not None
+    assert document.layout_key != edited.layout_key
+
+    styled = rendering.render_document(PAGE.format(head=STYLE), {'student_name': 'Ada'}, template_id="t1")
+    assert styled.layout_key == styled.stylesheet_key
+
+
+@pytest.mark.parametrize("head", [STYLE, ""], ids=["stylesheet", "no_css"])
+def test_render_batch_gives_one_page_per_certificate(rendering, head):
+    rendered = documents(rendering, head, f"batch-{bool(head)}")
+    files = rendering.render_batch(
+        [document.html for document in rendered], rendered[0].css, rendered[0].stylesheet_key,
+        ['pdf', 'png'], dpi=72, layout_key=rendered[0].layout_key
+    )
+    assert len(files) == len(NAMES)
+    assert page_counts(files) == [1, 1, 1]
+    assert all(certificate_files['png'].startswith(b'\x89PNG') for certificate_files in files)
+    texts = [PdfReader(io.BytesIO(certificate_files['pdf'])).pages[0].extract_text() for certificate_files in files]
+    assert [name in text for name, text in zip(NAMES, texts)] == [True, True, True]
+    assert batch_layout_cache.get(rendered[0].layout_key) is True
+    assert render_metrics.drain()["batch_certificate"][0] == len(NAMES)
+
+
+def test_layout_that_differs_from_standalone_falls_back(rendering, monkeypatch):
+    # Every page looks different, as if the batch changed the template's layout
+    monkeypatch.setattr(certificate_service, "page_signature", lambda page: id(page))
+    rendered = documents(rendering, STYLE, "batch-differs")
+    files = rendering.render_batch(
+        [document.html for document in rendered], rendered[0].css, rendered[0].stylesheet_key,
+        ['pdf'], dpi=72, layout_key=rendered[0].layout_key
+    )
+    assert page_counts(files) == [1, 1, 1]
+    assert batch_layout_cache.get(rendered[0].layout_key) is False
+    stages = render_metrics.drain()
+    assert stages["batch_fallback"][0] == len(NAMES)
+    assert "batch_certificate" not in stages
@@ -0,0 +1,46 @@
+"""Bulk job runner (services/bulk_jobs.py) heartbeats, on SQLite"""
+import asyncio
+import uuid
+
+from sqlalchemy import select, update
+
+from database import async_session
+from db_models import BulkJob
+from services.bulk_jobs import BulkJobRunner, _JobContext, _now
+
+
+async def running_job(token: str) -> uuid.UUID:
+    async with async_session() as db:
+        job = BulkJob(
+            template_id=uuid.uuid4(),
+            status='running',
+            output_formats=['pdf'],
+            claimed_by=token,
+            heartbeat_at=_now()
+        )
+        db.add(job)
+        await db.commit()
+        return job.id
+
+
+async def heartbeat_at(job_id: uuid.UUID):
+    async with async_session() as db:
+        return await db.scalar(select(BulkJob.heartbeat_at).where(BulkJob.id == job_id))
+
+
+def test_keep_alive_refreshes_heartbeat_until_the_claim_is_lost(db_run):
+    async def test():
+        runner = BulkJobRunner(workers=1, poll_seconds=0.1, stale_seconds=3, input_idle_seconds=60)
+        job_id = await running_job("worker-a")
+        ctx = _JobContext(job_id, "worker-a", None, ['pdf'], None, None, None)
+        before = await heartbeat_at(job_id)
+
+        keep_alive = asyncio.create_task(runner._keep_alive(ctx))
+        await asyncio.sleep(1.5)
+        assert await heartbeat_at(job_id) > before
+
+        async with async_session() as db:
+            await db.execute(update(BulkJob).where(BulkJob.id == job_id).values(claimed_by="worker-b"))
+            await db.commit()
+        await asyncio.wait_for(keep_alive, timeout=3)
+    db_run(test)
@@ -0,0 +1,196 @@
+"""Bulk ZIPs (services/bulk_outputs.py) written into MemoryStorageBackend"""
+import asyncio
+import io
+import os
+import zipfile
+import zlib
+
+import pytest
+
+from services import bulk_outputs, storage
+from services.bulk_outputs import BulkZipWriter
+from services.storage import MemoryStorageBackend
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    backend = MemoryStorageBackend(retries=0)
+    monkeypatch.setattr(bulk_outputs, "storage_backend", backend)
+    return backend
+
+
+def stored_zip(backend, url: str) -> zipfile.ZipFile:
+    data = backend.files[backend.path_from_url(url)][0]
+    return zipfile.ZipFile(io.BytesIO(data))
+
+
+def certificate_files(count: int) -> dict:
+    """Incompressible PNGs and compressible text, so both kinds of entry are written"""
+    return {
+        f"NH-{number}": {'png': os.urandom(3000), 'html': f"<p>{number}</p>".encode() * 500}
+        for number in range(count)
+    }
+
+
+def write_zip(files: dict, compression_level: int = 6):
+    """Feed a BulkZipWriter from a worker thread; returns (url, writer, parts sent)"""
+    async def write():
+        writer = BulkZipWriter(compression_level)
+        parts = []
+        write_part = writer._upload.write_part
+
+        async def record(data):
+            parts.append(len(data))
+            await write_part(data)
+
+        writer._upload.write_part = record
+        for certificate_id, certificate in files.items():
+            await asyncio.to_thread(writer.add, certificate_id, certificate)
+        return await writer.close(), writer, parts
+    return run(write())
+
+
+def test_bulk_zip_is_uploaded_in_parts(memory, monkeypatch):
+    monkeypatch.setattr(storage.SpooledUpload, "part_size", 8 * 1024)
+    files = certificate_files(20)
+    url, writer, parts = write_zip(files)
+
+    assert len(parts) > 2
+    assert all(size == 8 * 1024 for size in parts[:-1])
+    archive = stored_zip(memory, url)
+    assert archive.testzip() is None
+    assert sorted(archive.namelist()) == sorted(
+        f"{certificate_id}.{fmt}" for certificate_id in files for fmt in ('png', 'html')
+    )
+    for info in archive.infolist():
+        certificate_id, fmt = info.filename.rsplit('.', 1)
+        data = files[certificate_id][fmt]
+        assert info.CRC == zlib.crc32(data)
+        assert archive.read(info) == data
+    assert writer.files_added == 40
+    assert writer.files_deflated == 20
+
+
+def test_bulk_zip_switches_to_zip64(memory, monkeypatch):
+    # Lower zipfile's limits instead of writing 65536 entries / 4 GB
+    monkeypatch.setattr(zipfile, "ZIP_FILECOUNT_LIMIT", 5)
+    monkeypatch.setattr(zipfile, "ZIP64_LIMIT", 16 * 1024)
+    files = certificate_files(10)
+    url, _, _ = write_zip(files)
+
+    data = memory.files[memory.path_from_url(url)][0]
+    # Zip64 end of central directory record and locator
+    assert b"PK\x06\x06" in data and b"PK\x06\x07" in data
+    monkeypatch.undo()
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert len(archive.namelist()) == 20
+    assert archive.testzip() is None
+
+
+def test_empty_bulk_zip_is_not_published(memory):
+    url, _, _ = write_zip({})
+    assert url is None
+    assert memory.files == {}
+
+
+def test_add_on_the_event_loop_is_refused(memory):
+    async def write():
+        writer = BulkZipWriter()
+        try:
+            with pytest.raises(RuntimeError, match="worker thread"):
+                writer._send_parts()
+        finally:
+            await writer.abort()
+    run(write())
+    assert memory.files == {}
+
+
+@pytest.mark.parametrize("fmt", ['pdf', 'png', 'jpg', 'jpeg', 'PNG'])
+def test_compressed_formats_are_stored(fmt):
+    # Even when the bytes themselves would deflate well
+    assert bulk_outputs.zip_compression(fmt, b"a" * 10000, 6) == zipfile.ZIP_STORED
+
+
+@pytest.mark.parametrize("size", [1000, 200 * 1024])
+def test_compressible_files_are_deflated(size):
+    assert bulk_outputs.zip_compression('html', b"<p>certificate</p>" * (size // 18), 6) == zipfile.ZIP_DEFLATED
+
+
+@pytest.mark.parametrize("data", [os.urandom(1000), os.urandom(200 * 1024), b""])
+def test_incompressible_files_are_stored(data):
+    assert bulk_outputs.zip_compression('svg', data, 6) == zipfile.ZIP_STORED
+
+
+def test_compression_level_zero_stores_everything():
+    assert bulk_outputs.zip_compression('html', b"a" * 10000, 0) == zipfile.ZIP_STORED
+
+
+def collect_zip(entries, prefetch: int = 2) -> bytes:
+    async def collect():
+        return b"".join([chunk async for chunk in bulk_outputs.stream_zip(entries, 6, prefetch)])
+    return run(collect())
+
+
+def test_stream_zip_lists_missing_files(memory):
+    files = {f"2026/01/27/NH-{number}.pdf": os.urandom(2000) for number in range(4)}
+    memory.files.update({path: (data, "application/pdf") for path, data in files.items()})
+    entries = [(path.rsplit('/', 1)[-1], path) for path in files]
+    entries.insert(2, ("NH-gone.pdf", "2026/01/27/NH-gone.pdf"))
+
+    archive = zipfile.ZipFile(io.BytesIO(collect_zip(entries)))
+    assert archive.testzip() is None
+    assert archive.namelist() == [f"NH-{number}.pdf" for number in range(4)] + ["missing-files.txt"]
+    for path, data in files.items():
+        assert archive.read(path.rsplit('/', 1)[-1]) == data
+    assert archive.read("missing-files.txt") == b"NH-gone.pdf\n"
+
+
+def test_stream_zip_without_missing_files_has_no_report(memory):
+    memory.files["a.png"] = (b"png", "image/png")
+    archive = zipfile.ZipFile(io.BytesIO(collect_zip([("a.png", "a.png")])))
+    assert archive.namelist() == ["a.png"]
+
+
+def test_stream_zip_fetches_within_the_prefetch_window(memory, monkeypatch):
+    reading, peak = [], []
+    get = memory.get
+
+    async def slow_get(path):
+        reading.append(path)
+        peak.append(len(reading))
+        await asyncio.sleep(0.01)
+        reading.remove(path)
+        return await get(path)
+
+    monkeypatch.setattr(memory, "get", slow_get)
+    memory.files.update({f"{number}.pdf": (b"%PDF", "application/pdf") for number in range(10)})
+    archive = zipfile.ZipFile(io.BytesIO(collect_zip([(f"{n}.pdf", f"{n}.pdf") for n in range(10)], prefetch=3)))
+    assert len(archive.namelist()) == 10
+    assert max(peak) == 3
+
+
+def test_stream_zip_stops_fetching_when_the_client_goes_away(memory, monkeypatch):
+    started = []
+    get = memory.get
+
+    async def slow_get(path):
+        started.append(path)
+        await asyncio.sleep(0.05)
+        return await get(path)
+
+    monkeypatch.setattr(memory, "get", slow_get)
+    memory.files.update({f"{number}.pdf": (b"%PDF", "application/pdf") for number in range(10)})
+
+    async def first_chunk_only():
+        stream = bulk_outputs.stream_zip([(f"{n}.pdf", f"{n}.pdf") for n in range(10)], 6, 2)
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.1)
+
+    run(first_chunk_only())
+    # The first file plus the window behind it; nothing after the client left
+    assert len(started) == 3
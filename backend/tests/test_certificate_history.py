@@ -0,0 +1,46 @@
+"""Certificate history filters (routers/certificates.py), on SQLite"""
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from database import async_session, contains_pattern
+from db_models import Certificate
+from routers.certificates import _history_filters
+
+USER_ID = uuid.uuid4()
+COURSES = ["100% Python", "1000 Python", "net_ops", "netXops", "C:\\Windows"]
+
+
+async def courses_matching(course: str) -> list:
+    async with async_session() as db:
+        db.add_all([
+            Certificate(
+                certificate_id=f"NH-{number}", user_id=USER_ID, certificate_data={},
+                student_name="Ada", course_name=course_name
+            )
+            for number, course_name in enumerate(COURSES)
+        ])
+        await db.flush()
+        result = await db.execute(
+            select(Certificate.course_name).where(*_history_filters(USER_ID, course=course))
+        )
+        return sorted(result.scalars().all())
+
+
+@pytest.mark.parametrize("course, expected", [
+    ("python", ["100% Python", "1000 Python"]),
+    ("100%", ["100% Python"]),
+    ("%", ["100% Python"]),
+    ("net_", ["net_ops"]),
+    ("_", ["net_ops"]),
+    ("c:\\w", ["C:\\Windows"]),
+])
+def test_course_filter_matches_wildcards_literally(db_run, course, expected):
+    async def test():
+        assert await courses_matching(course) == expected
+    db_run(test)
+
+
+def test_contains_pattern_escapes_like_wildcards():
+    assert contains_pattern("a%b_c\\d") == "%a\\%b\\_c\\\\d%"
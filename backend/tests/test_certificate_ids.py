@@ -0,0 +1,106 @@
+"""Block allocation of certificate IDs (services/certificate_ids.py), on SQLite"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database import Base, async_session
+from db_models import Certificate
+from services import certificate_ids
+from services.certificate_ids import (
+    CertificateIdsExhausted,
+    certificate_id_allocator,
+    format_certificate_id,
+    insert_certificates,
+)
+
+YEAR = datetime.now().year
+
+
+async def add_certificate(certificate_id: str):
+    async with async_session() as db:
+        db.add(Certificate(certificate_id=certificate_id, certificate_data={}, status="generated"))
+        await db.commit()
+
+
+async def allocate(count: int, exclude=()) -> list:
+    async with async_session() as db:
+        return await certificate_id_allocator.allocate(db, count, exclude)
+
+
+def test_allocates_sequential_blocks(db_run):
+    async def test():
+        assert await allocate(3) == [format_certificate_id(YEAR, number) for number in (1, 2, 3)]
+        assert await allocate(2) == [format_certificate_id(YEAR, number) for number in (4, 5)]
+    db_run(test)
+
+
+def test_concurrent_allocations_never_overlap(tmp_path, monkeypatch):
+    # The in-memory database is one shared connection; concurrent sessions need a file
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ids.db'}")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(certificate_ids, "async_session", sessions)
+
+    async def allocate_in_own_session():
+        async with sessions() as db:
+            return await certificate_id_allocator.allocate(db, 5)
+
+    async def test():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            return await asyncio.gather(*[allocate_in_own_session() for _ in range(8)])
+        finally:
+            await engine.dispose()
+
+    blocks = asyncio.run(test())
+    ids = [certificate_id for block in blocks for certificate_id in block]
+    assert all(len(block) == 5 for block in blocks)
+    assert sorted(ids) == [format_certificate_id(YEAR, number) for number in range(1, 41)]
+
+
+def test_skips_taken_and_excluded_ids(db_run):
+    async def test():
+        await add_certificate(format_certificate_id(YEAR, 2))
+        ids = await allocate(3, exclude=[format_certificate_id(YEAR, 3)])
+        # 2 is taken and 3 is claimed by the caller, so the block is topped up
+        assert ids == [format_certificate_id(YEAR, number) for number in (1, 4, 5)]
+    db_run(test)
+
+
+def test_exhausted_id_space_raises(db_run, monkeypatch):
+    monkeypatch.setattr(certificate_ids, "ID_SPACE", 4)
+
+    async def test():
+        assert len(await allocate(3)) == 3
+        with pytest.raises(CertificateIdsExhausted, match=str(YEAR)):
+            await allocate(1)
+    db_run(test)
+
+
+@pytest.mark.parametrize("upsert", [True, False], ids=["on_conflict", "savepoints"])
+def test_insert_certificates_skips_existing_ids(db_run, monkeypatch, upsert):
+    if not upsert:
+        # Databases without ON CONFLICT insert row by row in savepoints
+        monkeypatch.setattr(certificate_ids, "dialect_insert", lambda: None)
+
+    async def test():
+        await add_certificate("NH-2")
+        rows = [
+            {'certificate_id': f"NH-{number}", 'certificate_data': {'n': number}, 'status': "generated"}
+            for number in (1, 2, 3)
+        ]
+        async with async_session() as db:
+            inserted = await insert_certificates(db, rows)
+            await db.commit()
+        assert inserted == {"NH-1", "NH-3"}
+
+        async with async_session() as db:
+            stored = dict((await db.execute(
+                select(Certificate.certificate_id, Certificate.certificate_data)
+            )).all())
+        # The existing row is left as it was
+        assert stored == {"NH-1": {'n': 1}, "NH-2": {}, "NH-3": {'n': 3}}
+    db_run(test)
@@ -0,0 +1,48 @@
+"""Certificate search filters (services/certificate_search.py)"""
+from sqlalchemy.dialects import postgresql
+
+from services.certificate_search import CertificateSearch
+
+
+def compile_filters(filters) -> list:
+    return [
+        str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        for clause in filters
+    ]
+
+
+def test_postgres_student_filter_uses_trigram_index_when_built():
+    filters = compile_filters(CertificateSearch._postgres_filters([], "Ada Love", ["Ada", "Love"], ["Math"], True))
+    assert filters[0].endswith("to_tsquery('simple', 'math:*b')")
+    assert "ILIKE" in filters[1] and "Ada Love" in filters[1]
+
+
+def test_postgres_student_filter_uses_search_vector_without_pg_trgm():
+    filters = compile_filters(CertificateSearch._postgres_filters([], "Ada Love", ["Ada", "Love"], [], False))
+    assert len(filters) == 1
+    assert filters[0].endswith("to_tsquery('simple', 'ada:*a & love:*a')")
+
+
+def test_postgres_trigram_filter_escapes_like_wildcards():
+    name_filter = CertificateSearch._postgres_filters([], "100%_x", ["100", "_x"], [], True)[-1]
+    assert name_filter.right.value == "%100\\%\\_x%"
+    assert compile_filters([name_filter])[0].endswith("ESCAPE '\\'")
+
+
+def test_like_fallback_matches_wildcards_literally(db_run):
+    from sqlalchemy import select
+
+    from database import async_session
+    from db_models import Certificate
+
+    async def test():
+        async with async_session() as db:
+            db.add_all([
+                Certificate(certificate_id=f"NH-{number}", certificate_data={}, student_name=name, course_name="CCNA")
+                for number, name in enumerate(["ada_lovelace", "adaXlovelace"])
+            ])
+            await db.flush()
+            filters = CertificateSearch._like_filters([], ["ada_l"], [])
+            names = (await db.execute(select(Certificate.student_name).where(*filters))).scalars().all()
+        assert names == ["ada_lovelace"]
+    db_run(test)
@@ -0,0 +1,74 @@
+"""Streaming CSV ingestion (services/csv_ingest.py)"""
+import asyncio
+import io
+
+import pytest
+
+from services.csv_ingest import CsvFormatError, iter_csv_chunks, read_csv_rows
+
+HEADER = "student_name,course_name,issue_date,certificate_id,issuing_authority\r\n"
+
+
+def rows_of(data: bytes) -> list:
+    return list(read_csv_rows(io.BytesIO(data)))
+
+
+def test_valid_rows_are_validated():
+    rows = rows_of((HEADER + "Ada,CCNA,2026-01-20,NH-1,NetworkersHome\r\n").encode())
+    assert len(rows) == 1
+    assert rows[0].error is None
+    assert rows[0].line_number == 2
+    assert rows[0].certificate_data["student_name"] == "Ada"
+    assert rows[0].certificate_data["certificate_id"] == "NH-1"
+
+
+def test_byte_order_mark_is_skipped():
+    rows = rows_of(b"\xef\xbb\xbf" + (HEADER + "Ada,CCNA,2026-01-20,NH-1,NetworkersHome\r\n").encode())
+    assert rows[0].error is None
+    assert rows[0].certificate_data["student_name"] == "Ada"
+
+
+def test_invalid_rows_keep_their_line_number():
+    data = (
+        HEADER
+        + "Ada,CCNA,2026-01-20,NH-1,NetworkersHome\r\n"
+        + "Bob,,2026-01-20,NH-2,NetworkersHome\r\n"
+        + "Cy,CCNA,20-01-2026,NH-3,NetworkersHome,extra\r\n"
+    ).encode()
+    rows = rows_of(data)
+    assert [row.row_index for row in rows] == [0, 1, 2]
+    assert [row.line_number for row in rows] == [2, 3, 4]
+    assert rows[0].error is None
+    assert "course_name" in rows[1].error
+    assert rows[1].certificate_data["student_name"] == "Bob"
+    assert rows[2].error is not None
+    # The extra cell has no column name and is left out of the raw row
+    assert None not in rows[2].certificate_data
+
+
+def test_quoted_newlines_report_the_line_the_record_ends_on():
+    data = (HEADER + '"Ada\nLovelace",CCNA,2026-01-20,NH-1,NetworkersHome\r\nBob,,2026-01-20,NH-2,X\r\n').encode()
+    rows = rows_of(data)
+    assert rows[0].certificate_data["student_name"] == "Ada\nLovelace"
+    assert [row.line_number for row in rows] == [3, 4]
+
+
+def test_bad_encoding_raises_format_error():
+    data = (HEADER + "Ada,CCNA,2026-01-20,NH-1,NetworkersHome\r\n").encode() + b"\xff\xfe,CCNA\r\n"
+    with pytest.raises(CsvFormatError):
+        rows_of(data)
+
+
+def test_upload_file_is_left_open():
+    fileobj = io.BytesIO((HEADER + "Ada,CCNA,2026-01-20,NH-1,NetworkersHome\r\n").encode())
+    list(read_csv_rows(fileobj))
+    assert not fileobj.closed
+
+
+def test_chunks():
+    data = HEADER + "".join(f"S{i},CCNA,2026-01-20,NH-{i},NetworkersHome\r\n" for i in range(5))
+
+    async def chunks():
+        return [chunk async for chunk in iter_csv_chunks(io.BytesIO(data.encode()), 2)]
+
+    assert [[row.row_index for row in chunk] for chunk in asyncio.run(chunks())] == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,67 @@
+"""Concurrent bulk generation (CertificateService.generate_certificates)"""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services.certificate_service import CertificateService
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = CertificateService()
+    service.persisted = []
+
+    async def render_batch(template, chunk, output_formats, render_formats):
+        if chunk[0]["certificate_id"] == "fail":
+            raise RuntimeError("render failed")
+        await asyncio.sleep(0.2)
+        return [{"pdf": b"%PDF"} for _ in chunk]
+
+    async def persist(db, template, chunk, rendered, output_formats, user_id=None):
+        service.persisted.extend(row["certificate_id"] for row in chunk)
+        return [{"pdf": "url"} for _ in chunk]
+
+    monkeypatch.setattr(service, "_render_batch", render_batch)
+    monkeypatch.setattr(service, "_persist_certificates", persist)
+    return service
+
+
+def test_failed_chunk_cancels_the_other_chunks(service):
+    certificates = [{"certificate_id": "fail"}] + [{"certificate_id": f"NH-{i}"} for i in range(3)]
+
+    async def generate():
+        with pytest.raises(RuntimeError, match="render failed"):
+            await service.generate_certificates(
+                None, SimpleNamespace(id=1), certificates, ["pdf"], concurrency=4
+            )
+        # Nothing is recorded after the error has reached the caller
+        await asyncio.sleep(0.3)
+
+    run(generate())
+    assert service.persisted == []
+
+
+def test_cancelled_sink_finishes_before_cancellation_completes():
+    started, finished = threading.Event(), threading.Event()
+
+    def sink():
+        started.set()
+        time.sleep(0.2)
+        finished.set()
+
+    async def cancel_mid_sink():
+        task = asyncio.create_task(CertificateService._run_sink(sink))
+        await asyncio.to_thread(started.wait)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return finished.is_set()
+
+    assert run(cancel_mid_sink())
@@ -0,0 +1,48 @@
+"""Image output (RenderingService.encode_images / convert_to_images): one raster, several formats"""
+import io
+
+import pytest
+from PIL import Image
+
+from services.certificate_service import RenderingService
+
+
+def decode(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+@pytest.mark.parametrize("mode", ['RGB', 'RGBA'])
+def test_encode_images_png_and_jpg(mode):
+    image = Image.new(mode, (320, 200), (200, 30, 60, 255)[:len(mode)])
+    files = RenderingService().encode_images(image, ['png', 'jpg', 'JPEG'])
+
+    assert set(files) == {'png', 'jpg', 'JPEG'}
+    png, jpg = decode(files['png']), decode(files['jpg'])
+    assert (png.format, png.size, png.mode) == ('PNG', (320, 200), mode)
+    assert png.getpixel((5, 5))[:3] == (200, 30, 60)
+    # JPEG has no alpha channel
+    assert (jpg.format, jpg.size, jpg.mode) == ('JPEG', (320, 200), 'RGB')
+    # jpg and JPEG share one encode
+    assert files['jpg'] is files['JPEG']
+
+
+def test_convert_to_images_rasterizes_once():
+    pytest.importorskip("pypdfium2")
+    from services.rasterizers import PdfiumRasterizer
+
+    pdf = io.BytesIO()
+    Image.new('RGB', (842, 595), (10, 120, 40)).save(pdf, format='PDF', resolution=72)
+
+    rendering = RenderingService()
+    rasterizer = rendering._rasterizer = PdfiumRasterizer()
+    calls = []
+    rasterize = rasterizer.rasterize
+    rasterizer.rasterize = lambda *args: calls.append(args) or rasterize(*args)
+
+    files = rendering.convert_to_images(pdf.getvalue(), ['png', 'jpg'], dpi=144)
+    assert len(calls) == 1
+    for fmt in ('png', 'jpg'):
+        image = decode(files[fmt])
+        assert (image.size, image.mode) == ((1684, 1190), 'RGB')
@@ -0,0 +1,70 @@
+"""Moving template <style> blocks into a cached stylesheet (services/certificate_service.py)"""
+from pathlib import Path
+
+import pytest
+
+from services.certificate_service import RenderingService, extract_inline_styles
+
+TEMPLATES = sorted((Path(__file__).resolve().parent.parent / "templates").glob("*.html"))
+
+SAMPLE_DATA = {
+    'student_name': 'John Doe',
+    'course_name': 'Sample Course Certificate',
+    'issue_date': '2026-01-20',
+    'certificate_id': 'SAMPLE-001',
+    'issuing_authority': 'NetworkersHome',
+    'signature_name': 'Director',
+    'logo_url': None,
+    'signature_image_url': None
+}
+
+PAGE = '<html><head><style>{css}</style></head><body>{body}</body></html>'
+
+
+@pytest.mark.parametrize("template", TEMPLATES, ids=lambda path: path.stem)
+def test_shipped_templates_move_their_styles(template):
+    body_html, css = extract_inline_styles(template.read_text())
+    assert css
+    assert "<style" not in body_html.lower()
+
+
+@pytest.mark.parametrize("html_content, css_content", [
+    # css_content is user CSS that the template's <style> rules outrank
+    (PAGE.format(css="p { color: red }", body="<p>x</p>"), "p { color: blue }"),
+    # !important would now outrank style attributes
+    (PAGE.format(css="p { color: red !important }", body='<p style="color: blue">x</p>'), None),
+    # Presentational hints would now outrank the <style> rules
+    (PAGE.format(css="td { text-align: left }", body='<table><tr><td align="center">x</td></tr></table>'), None),
+    (PAGE.format(css="p { color: red }", body='<p><font color="blue">x</font></p>'), None),
+    (PAGE.format(css="li { list-style: disc }", body='<ol type="a"><li>x</li></ol>'), None),
+], ids=["css_content", "important", "align", "font", "list_type"])
+def test_styles_stay_in_the_document_when_the_cascade_would_change(html_content, css_content):
+    assert extract_inline_styles(html_content, css_content) == (html_content, None)
+
+
+def test_style_type_attribute_is_not_a_presentational_hint():
+    html_content = '<html><head><style type="text/css">p { color: red }</style></head><body><p>x</p></body></html>'
+    assert extract_inline_styles(html_content)[1] == "p { color: red }"
+
+
+@pytest.mark.parametrize("template", TEMPLATES, ids=lambda path: path.stem)
+def test_moved_styles_render_pixel_identical(template):
+    try:
+        from weasyprint import HTML
+    except OSError as e:
+        pytest.skip(f"WeasyPrint system libraries missing: {e}")
+    from services.rasterizers import get_rasterizer
+
+    rendering = RenderingService()
+    html_content = template.read_text()
+    document = rendering.render_document(html_content, SAMPLE_DATA, template_id=template.stem)
+    assert document.css
+
+    # Author <style> blocks, as WeasyPrint renders the unmodified template
+    original = HTML(string=rendering.render_html(html_content, SAMPLE_DATA)).write_pdf(
+        presentational_hints=True, font_config=rendering.font_config
+    )
+    moved = rendering.render_pdf(document.html, document.css, document.stylesheet_key)
+
+    rasterizer = get_rasterizer("pdfium")
+    assert rasterizer.rasterize(original, 72).tobytes() == rasterizer.rasterize(moved, 72).tobytes()
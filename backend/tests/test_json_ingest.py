@@ -0,0 +1,131 @@
+"""Streaming NDJSON / JSON array ingestion (services/json_ingest.py)"""
+import asyncio
+import json
+
+import pytest
+
+from services import json_ingest
+from services.json_ingest import JsonFormatError, batch_rows, iter_json_array_rows, iter_ndjson_rows
+
+ROW = {
+    "student_name": "Ada",
+    "course_name": "CCNA",
+    "issue_date": "2026-01-20",
+    "issuing_authority": "NetworkersHome",
+}
+
+
+async def body_of(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def split(data: bytes, size: int) -> list:
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+def parse(parser, *chunks: bytes) -> list:
+    async def rows():
+        return [row async for row in parser(body_of(*chunks))]
+    return asyncio.run(rows())
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_array_elements_split_across_chunks(size):
+    data = json.dumps([dict(ROW, student_name="Ada"), dict(ROW, student_name="Bob")]).encode()
+    rows = parse(iter_json_array_rows, *split(data, size))
+    assert [row.certificate_data["student_name"] for row in rows] == ["Ada", "Bob"]
+    assert all(row.error is None for row in rows)
+
+
+def test_array_multibyte_character_split_across_chunks():
+    data = json.dumps([dict(ROW, student_name="Zoë")], ensure_ascii=False).encode()
+    split_at = data.index("ë".encode()) + 1
+    rows = parse(iter_json_array_rows, data[:split_at], data[split_at:])
+    assert rows[0].certificate_data["student_name"] == "Zoë"
+
+
+def test_array_invalid_elements_become_failed_rows():
+    rows = parse(iter_json_array_rows, json.dumps([ROW, "text", dict(ROW, issue_date="x")]).encode())
+    assert [row.row_index for row in rows] == [0, 1, 2]
+    assert rows[0].error is None
+    assert rows[1].error == "Expected a JSON object"
+    assert "issue_date" in rows[2].error
+
+
+def test_array_empty():
+    assert parse(iter_json_array_rows, b" [ ] ") == []
+
+
+@pytest.mark.parametrize("data, message", [
+    (b'{"a": 1}', "Expected a JSON array"),
+    (b'[{"a": 1} {"b": 2}]', "Expected ','"),
+    (b'[{"a": 1}', "incomplete"),
+    (b'[{"a": 1}, {"b"', "Invalid JSON in element 1"),
+    (b'[] []', "after the JSON array"),
+    (b'[]x', "after the JSON array"),
+])
+def test_array_format_errors(data, message):
+    with pytest.raises(JsonFormatError, match=message):
+        parse(iter_json_array_rows, data)
+
+
+def test_array_element_larger_than_limit(monkeypatch):
+    monkeypatch.setattr(json_ingest, "MAX_ELEMENT_BYTES", 50)
+    data = json.dumps([dict(ROW, student_name="A" * 100)]).encode()
+    with pytest.raises(JsonFormatError, match="larger than 50 bytes"):
+        parse(iter_json_array_rows, *split(data, 10))
+
+
+def test_array_element_within_limit_spanning_chunks(monkeypatch):
+    monkeypatch.setattr(json_ingest, "MAX_ELEMENT_BYTES", 200)
+    data = json.dumps([ROW] * 3).encode()
+    assert len(parse(iter_json_array_rows, *split(data, 10))) == 3
+
+
+def test_invalid_utf8_raises_format_error():
+    with pytest.raises(JsonFormatError, match="UTF-8"):
+        parse(iter_ndjson_rows, b'{"a": "\xff"}\n')
+
+
+def test_ndjson_rows_and_line_numbers():
+    data = (json.dumps(ROW) + "\n\n" + "{not json}\n" + json.dumps(dict(ROW, student_name="Bob")) + "\n").encode()
+    rows = parse(iter_ndjson_rows, *split(data, 5))
+    assert [row.row_index for row in rows] == [0, 1, 2]
+    assert [row.line_number for row in rows] == [1, 3, 4]
+    assert rows[0].error is None
+    assert rows[1].error.startswith("Invalid JSON")
+    assert rows[2].certificate_data["student_name"] == "Bob"
+
+
+def test_ndjson_final_line_without_newline():
+    data = (json.dumps(ROW) + "\r\n" + json.dumps(dict(ROW, student_name="Bob"))).encode()
+    rows = parse(iter_ndjson_rows, *split(data, 8))
+    assert [row.certificate_data["student_name"] for row in rows] == ["Ada", "Bob"]
+    assert [row.line_number for row in rows] == [1, 2]
+
+
+def test_ndjson_line_longer_than_limit(monkeypatch):
+    monkeypatch.setattr(json_ingest, "MAX_ELEMENT_BYTES", 50)
+    with pytest.raises(JsonFormatError, match="Line 2 is longer than 50 bytes"):
+        parse(iter_ndjson_rows, b"{}\n", b"{" + b" " * 60)
+
+
+def test_batch_rows_by_size():
+    async def batches():
+        rows = iter_ndjson_rows(body_of((json.dumps(ROW) + "\n").encode() * 5))
+        return [[row.row_index for row in batch] async for batch in batch_rows(rows, 2)]
+    assert asyncio.run(batches()) == [[0, 1], [2, 3], [4]]
+
+
+def test_batch_rows_released_after_delay():
+    async def slow_body():
+        yield (json.dumps(ROW) + "\n").encode()
+        await asyncio.sleep(0.1)
+        yield (json.dumps(ROW) + "\n").encode() * 2
+
+    async def batches():
+        rows = iter_ndjson_rows(slow_body())
+        return [[row.row_index for row in batch] async for batch in batch_rows(rows, 100, max_delay=0.05)]
+    # The first row to arrive after the delay releases the batch early
+    assert asyncio.run(batches()) == [[0, 1], [2]]
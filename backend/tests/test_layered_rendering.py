@@ -0,0 +1,169 @@
+"""Layered templates: the variable layer laid out on its own (services/variable_layer.py)"""
+from collections import namedtuple
+
+import pytest
+from tinycss2.color5 import parse_color
+
+from services.layered_rendering import iter_variables, mark_variables, replace_variables
+from services.render_metrics import render_metrics
+from services.variable_layer import TextBlock, VariableLayout, text_declarations, variable_html
+
+# Shape of WeasyPrint's computed lengths
+Dimension = namedtuple('Dimension', ['value', 'unit'])
+
+TEMPLATE = """<html><head><style>
+@page { size: 600px 400px; margin: 0 }
+body { margin: 0; font-family: serif; text-align: center; background: #f5efe0 }
+.frame { border: 8px solid #b8860b; height: 384px }
+h2 { font-size: 32px; margin: 40px 0 10px; font-style: italic; color: #262626 }
+.course { font-size: 14px; line-height: 1.6; width: 240px; margin: 0 auto; color: #8b4513 }
+table { width: 100%; margin-top: 30px }
+td { width: 50%; text-align: center }
+.label { text-transform: uppercase; font-size: 10px }
+</style></head><body><div class="frame">
+<h2>{{ student_name }}</h2>
+<p class="course">{{ course_name }}</p>
+<table><tr>
+<td><p>{{ issue_date }}</p><p class="label">Dated</p></td>
+<td><p>{{ signature_name }}</p><p class="label">{{ issuing_authority }}</p></td>
+</tr></table>
+</div></body></html>"""
+
+ROW = {
+    'student_name': 'Ada Lovelace',
+    'course_name': 'Advanced Routing and Switching with Network Automation',
+    'issue_date': '2026-01-20',
+    'signature_name': 'Director',
+    'issuing_authority': 'NetworkersHome',
+}
+
+
+def style(**overrides) -> dict:
+    computed = {
+        'font_family': ('Times New Roman', "O'Brien Sans", 'serif'),
+        'font_size': 32.0,
+        'font_style': 'italic',
+        'font_weight': 700,
+        'font_stretch': 'normal',
+        'line_height': 'normal',
+        'letter_spacing': 'normal',
+        'word_spacing': 0,
+        'text_transform': 'none',
+        'white_space': 'normal',
+        'word_break': 'normal',
+        'overflow_wrap': 'normal',
+        'hyphens': 'manual',
+        'color': parse_color('#8b4513'),
+        'lang': None,
+    }
+    computed.update(overrides)
+    return computed
+
+
+def test_text_declarations_reproduce_computed_styles():
+    declarations = text_declarations(style())
+    assert "font-family: 'Times New Roman', 'O\\'Brien Sans', 'serif'" in declarations
+    assert "font-size: 32px" in declarations
+    assert "font-weight: 700" in declarations
+    assert "line-height: normal" in declarations
+    assert "color: rgba(54.509804%, 27.058824%, 7.45098%, 1)" in declarations
+    assert not any(declaration.startswith("-weasy-lang") for declaration in declarations)
+
+    declarations = text_declarations(style(
+        line_height=1.8, letter_spacing=6.0, word_spacing=Dimension(2.5, 'px'), lang='en'
+    ))
+    # Unitless line heights stay factors; lengths are absolute pixels
+    assert "line-height: 1.8" in declarations
+    assert "letter-spacing: 6px" in declarations
+    assert "word-spacing: 2.5px" in declarations
+    assert "-weasy-lang: 'en'" in declarations
+    assert "line-height: 24px" in text_declarations(style(line_height=Dimension(24.0, 'px')))
+
+
+def test_replace_variables_by_occurrence():
+    html = "<p>{a}</p><p>{b}</p><p>{a}</p>".format(**mark_variables({'a': 'Ada', 'b': 'x < y'}))
+    replaced = replace_variables(html, {('a', 1): 'Bob & Co', ('b', 0): '.'})
+    assert iter_variables(replaced) == [('a', 'Ada'), ('b', '.'), ('a', 'Bob & Co')]
+
+
+def test_variable_html_places_each_value_in_its_block():
+    layout = VariableLayout(None, "", {
+        ('student_name', 0): TextBlock(0, 1, 10.0, 200.0, 1, 40.0),
+        ('course_name', 0): TextBlock(1, 2, 10.0, 200.0, 2, 44.0),
+    })
+    html = variable_html(layout, [('student_name', 'Ada <3'), ('course_name', 'CCNA')])
+    assert '<div class="b0"><span class="b0-0">Ada &lt;3</span></div>' in html
+    assert '<div class="b1"><span class="b1-0"><span class="b1-1">CCNA</span></span></div>' in html
+    # A value the static layer was not measured with cannot be placed
+    assert variable_html(layout, [('student_name', 'Ada')]) is None
+
+
+@pytest.fixture
+def rendering():
+    try:
+        from weasyprint import HTML  # noqa: F401
+    except OSError as e:
+        pytest.skip(f"WeasyPrint system libraries missing: {e}")
+    from services.certificate_service import RenderingService
+    render_metrics.drain()
+    return RenderingService()
+
+
+def rasterize(pdf_bytes: bytes):
+    import numpy as np
+    import pypdfium2 as pdfium
+    document = pdfium.PdfDocument(pdf_bytes)
+    try:
+        return np.asarray(document[0].render(scale=2).to_pil().convert('RGB'), dtype=np.int16)
+    finally:
+        document.close()
+
+
+def render_both(rendering, row: dict, template_id: str):
+    from services.layered_rendering import strip_variable_markers
+    document = rendering.render_document(TEMPLATE, row, template_id=template_id, layered=True)
+    layered = rendering.render_layered_pdf(
+        document.html, document.css, document.stylesheet_key, document.layer_key
+    )
+    standard = rendering.render_pdf(strip_variable_markers(document.html), document.css, document.stylesheet_key)
+    return layered, standard
+
+
+def assert_same_pixels(first: bytes, second: bytes):
+    import numpy as np
+    difference = np.abs(rasterize(first) - rasterize(second))
+    assert difference.shape[:2] == (600, 900)
+    assert (difference > 48).mean() < 0.001
+
+
+def test_layered_pdf_matches_standard_render(rendering):
+    for name in ['Ada Lovelace', 'Grace Brewster Murray Hopper', 'Bo']:
+        layered, standard = render_both(rendering, {**ROW, 'student_name': name}, "layered-match")
+        assert_same_pixels(layered, standard)
+    stages = render_metrics.drain()
+    # The wrapped course name and the table cell values are laid out on their own too
+    assert stages["layered_hit"][0] == 3
+    assert "layered_fallback" not in stages and "layered_unsupported" not in stages
+    assert stages["static_layer_render"][0] == 1
+    assert stages["variable_layout"][0] == 3
+
+
+def test_value_that_needs_another_line_falls_back(rendering):
+    render_both(rendering, ROW, "layered-wrap")
+    render_metrics.drain()
+    long_name = {**ROW, 'student_name': 'Ada Augusta King, Countess of Lovelace, née Byron'}
+    layered, standard = render_both(rendering, long_name, "layered-wrap")
+    assert_same_pixels(layered, standard)
+    stages = render_metrics.drain()
+    assert stages["layered_fallback"][0] == 1
+    assert "layered_hit" not in stages
+
+
+def test_value_sharing_its_line_renders_the_template_normally(rendering):
+    template = TEMPLATE.replace("<h2>{{ student_name }}</h2>", "<h2>Awarded to {{ student_name }}</h2>")
+    document = rendering.render_document(template, ROW, template_id="layered-shared-line", layered=True)
+    layered = rendering.render_layered_pdf(document.html, document.css, document.stylesheet_key, document.layer_key)
+    assert layered.startswith(b"%PDF")
+    stages = render_metrics.drain()
+    assert stages["layered_unsupported"][0] == 1
+    assert "layered_hit" not in stages
@@ -0,0 +1,128 @@
+"""PDF helpers (services/pdf_tools.py): combined and N-up PDFs, splitting, cached page forms"""
+import io
+
+import pytest
+from PIL import Image
+from pypdf import PdfReader
+
+from services.pdf_tools import CombinedPdfWriter, _nup_grid, overlay_on_form, page_form, split_pdf_pages
+
+# A4 landscape in points
+WIDTH, HEIGHT = 842, 595
+
+
+def certificate_pdf(shade: int) -> bytes:
+    """A one-page PDF with an image XObject, so resources are copied through references"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (WIDTH, HEIGHT), (shade, 0, 0)).save(buffer, format='PDF', resolution=72)
+    return buffer.getvalue()
+
+
+def rectangle_pdf(x: int, y: int, width: int, height: int) -> bytes:
+    """A one-page PDF drawing a blue rectangle on an otherwise transparent page"""
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, NameObject
+
+    writer = PdfWriter()
+    page = writer.add_blank_page(WIDTH, HEIGHT)
+    content = DecodedStreamObject()
+    content.set_data(f"0 0 1 rg {x} {y} {width} {height} re f".encode())
+    page[NameObject('/Contents')] = writer._add_object(content)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def combine(count: int, nup: int) -> PdfReader:
+    output = io.BytesIO()
+    writer = CombinedPdfWriter(output, nup)
+    for shade in range(count):
+        writer.add_pdf(certificate_pdf(shade * 10))
+    writer.close()
+    assert writer.pages_added == count
+    return PdfReader(io.BytesIO(output.getvalue()), strict=True)
+
+
+@pytest.mark.parametrize("nup, sheet", [
+    (1, (WIDTH, HEIGHT)),
+    (2, (WIDTH, 2 * HEIGHT)),
+    (3, (WIDTH, 3 * HEIGHT)),
+    (4, (2 * WIDTH, 2 * HEIGHT)),
+])
+def test_combined_pdf_nup(nup, sheet):
+    reader = combine(6, nup)
+    # A partly filled last sheet is still written
+    assert len(reader.pages) == -(-6 // nup)
+    for page in reader.pages:
+        assert [float(value) for value in page.mediabox] == [0, 0, *sheet]
+    xobjects = reader.pages[0]['/Resources']['/XObject']
+    assert len(xobjects) == nup
+    assert len(reader.pages[-1]['/Resources']['/XObject']) == 6 - nup * (len(reader.pages) - 1)
+    # The certificate's own image survives the copy
+    form = xobjects['/C0'].get_object()
+    assert form['/Subtype'] == '/Form'
+    image = next(iter(form['/Resources']['/XObject'].values())).get_object()
+    assert (image['/Width'], image['/Height']) == (WIDTH, HEIGHT)
+
+
+def test_combined_pdf_without_pages_is_valid():
+    reader = combine(0, 1)
+    assert len(reader.pages) == 0
+
+
+def test_split_pdf_pages():
+    pdf_bytes = io.BytesIO()
+    images = [Image.new('RGB', (WIDTH, HEIGHT)) for _ in range(3)]
+    images[0].save(pdf_bytes, format='PDF', resolution=72, save_all=True, append_images=images[1:])
+    pages = split_pdf_pages(pdf_bytes.getvalue())
+    assert [len(PdfReader(io.BytesIO(page)).pages) for page in pages] == [1, 1, 1]
+
+
+@pytest.mark.parametrize("nup, grid", [(1, (1, 1)), (2, (1, 2)), (3, (1, 3)), (4, (2, 2)), (6, (2, 3)), (5, (1, 5))])
+def test_nup_grid(nup, grid):
+    assert _nup_grid(nup, WIDTH, HEIGHT) == grid
+
+
+@pytest.mark.parametrize("nup", [0, -1])
+def test_nup_grid_rejects_unsupported_values(nup):
+    with pytest.raises(ValueError):
+        _nup_grid(nup, WIDTH, HEIGHT)
+
+
+def test_combined_pdf_places_certificates_in_reading_order():
+    pdfium = pytest.importorskip("pypdfium2")
+    output = io.BytesIO()
+    writer = CombinedPdfWriter(output, nup=2)
+    writer.add_pdf(certificate_pdf(250))
+    writer.add_pdf(certificate_pdf(0))
+    writer.close()
+    document = pdfium.PdfDocument(output.getvalue())
+    try:
+        image = document[0].render(scale=0.1).to_pil().convert('RGB')
+    finally:
+        document.close()
+    # First certificate on top, second below it
+    assert image.getpixel((image.width // 2, image.height // 4))[0] > 200
+    assert image.getpixel((image.width // 2, 3 * image.height // 4))[0] < 50
+
+
+def test_overlay_on_form_draws_over_the_cached_page():
+    pdfium = pytest.importorskip("pypdfium2")
+    form = page_form(certificate_pdf(250))
+    # The cached form is written unchanged into every certificate
+    outputs = [overlay_on_form(rectangle_pdf(x, 100, 200, 100), form) for x in (100, 500)]
+    for output, x in zip(outputs, (100, 500)):
+        reader = PdfReader(io.BytesIO(output), strict=True)
+        assert len(reader.pages) == 1
+        assert [float(value) for value in reader.pages[0].mediabox] == [0, 0, WIDTH, HEIGHT]
+        document = pdfium.PdfDocument(output)
+        try:
+            image = document[0].render(scale=1).to_pil().convert('RGB')
+        finally:
+            document.close()
+        # Page coordinates start at the bottom; the image at the top
+        red, green, blue = image.getpixel((x + 100, HEIGHT - 150))
+        assert blue > 200 and red < 50
+        red, green, blue = image.getpixel((WIDTH - x - 100, HEIGHT - 150))
+        assert red > 200 and blue < 50
+        assert image.getpixel((WIDTH // 2, 50))[0] > 200
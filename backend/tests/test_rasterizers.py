@@ -0,0 +1,63 @@
+"""PDF rasterizer backends (services/rasterizers.py)"""
+import io
+import shutil
+import threading
+
+import pytest
+from PIL import Image
+
+from services.rasterizers import Pdf2ImageRasterizer, PdfiumRasterizer, Rasterizer
+
+
+def make_pdf(page_count: int = 3) -> bytes:
+    """A PDF of A4-landscape pages (842 x 595 pt), each a different colour"""
+    pages = [Image.new('RGB', (842, 595), (40 * index, 100, 200)) for index in range(page_count)]
+    buffer = io.BytesIO()
+    pages[0].save(buffer, format='PDF', resolution=72, save_all=True, append_images=pages[1:])
+    return buffer.getvalue()
+
+
+def test_base_rasterizer_is_abstract():
+    with pytest.raises(TypeError):
+        Rasterizer()
+
+
+def test_pdfium_rasterize_pages():
+    pytest.importorskip("pypdfium2")
+    images = list(PdfiumRasterizer().rasterize_pages(make_pdf(3), dpi=72))
+    assert [image.size for image in images] == [(842, 595)] * 3
+    assert all(image.mode == 'RGB' for image in images)
+    # Pages come back in order (PIL stores them as JPEG, so colours are approximate)
+    assert [round(image.getpixel((10, 10))[0] / 40) for image in images] == [0, 1, 2]
+    assert PdfiumRasterizer().rasterize(make_pdf(3), dpi=72, page_index=2).size == (842, 595)
+
+
+def test_pdfium_abandoned_generator_does_not_hold_the_lock():
+    pytest.importorskip("pypdfium2")
+    rasterizer = PdfiumRasterizer()
+    pages = rasterizer.rasterize_pages(make_pdf(3), dpi=36)
+    next(pages)
+    # Another thread can still rasterize while the generator is paused
+    result = []
+    thread = threading.Thread(
+        target=lambda: result.append(rasterizer.rasterize(make_pdf(1), dpi=36)), daemon=True
+    )
+    thread.start()
+    thread.join(timeout=10)
+    assert result and result[0].size == (421, 298)
+    pages.close()
+
+
+@pytest.mark.skipif(shutil.which("pdftoppm") is None, reason="poppler-utils not installed")
+@pytest.mark.parametrize("dpi", [72, 150])
+def test_backends_agree_on_page_count_and_size(dpi):
+    pytest.importorskip("pypdfium2")
+    pdf_bytes = make_pdf(3)
+    poppler = list(Pdf2ImageRasterizer().rasterize_pages(pdf_bytes, dpi))
+    pdfium = list(PdfiumRasterizer().rasterize_pages(pdf_bytes, dpi))
+    assert len(poppler) == len(pdfium) == 3
+    for poppler_image, pdfium_image in zip(poppler, pdfium):
+        assert poppler_image.mode == pdfium_image.mode == 'RGB'
+        # Backends may round the last pixel differently
+        assert abs(poppler_image.width - pdfium_image.width) <= 1
+        assert abs(poppler_image.height - pdfium_image.height) <= 1
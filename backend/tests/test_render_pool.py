@@ -0,0 +1,69 @@
+"""Render worker pool (services/render_pool.py): timeouts and crashed workers"""
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from services.render_pool import RenderPool
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_pool_recycles_when_every_worker_is_stuck():
+    async def test():
+        pool = RenderPool(size=1, queue_depth=0, task_timeout=0.5)
+        await pool.start()
+        stuck = pool._executor
+        try:
+            with pytest.raises(HTTPException) as error:
+                await pool.run(time.sleep, 60)
+            assert error.value.status_code == 504
+            assert pool.recycled == 1
+            assert pool._executor is not stuck
+            # The hung task's slot comes back once its worker is killed
+            pid = await asyncio.wait_for(pool.run(os.getpid), timeout=30)
+            assert pid != os.getpid()
+            assert pool.in_flight == 0
+        finally:
+            await pool.shutdown()
+    run(test())
+
+
+def test_failure_on_a_replaced_executor_keeps_the_new_one():
+    async def test():
+        pool = RenderPool(size=1, queue_depth=1, task_timeout=30)
+        await pool.start()
+        old = pool._executor
+        try:
+            task = asyncio.create_task(pool.run(time.sleep, 60))
+            await asyncio.sleep(0.5)
+            # Another caller already restarted the pool when this task's worker dies
+            pool._executor = new = pool._create_executor()
+            for process in list(old._processes.values()):
+                process.terminate()
+            with pytest.raises(HTTPException) as error:
+                await task
+            assert error.value.status_code == 500
+            assert pool._executor is new
+            assert await pool.run(os.getpid) != os.getpid()
+        finally:
+            old.shutdown(wait=False)
+            await pool.shutdown()
+    run(test())
+
+
+def test_warm_up_loads_the_shared_font_configuration():
+    try:
+        from weasyprint import HTML  # noqa: F401
+    except OSError as e:
+        pytest.skip(f"WeasyPrint system libraries missing: {e}")
+    from services.certificate_service import rendering_service
+    from services.render_pool import _warm_worker
+
+    rendering_service._font_config = None
+    _warm_worker()
+    assert rendering_service._font_config is not None
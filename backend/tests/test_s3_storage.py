@@ -0,0 +1,240 @@
+"""S3 backend (services/storage.py) against moto's in-process S3"""
+import asyncio
+import os
+import time
+
+import pytest
+
+pytest.importorskip("moto")
+from moto import mock_aws
+
+from services import storage
+from services.storage import MULTIPART_MIN_PART_SIZE, S3StorageBackend, StorageError
+
+BUCKET = "certs"
+PART = MULTIPART_MIN_PART_SIZE
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        backend = S3StorageBackend(BUCKET, "AK", "SK", region="us-east-1", part_size=PART, retries=0)
+        backend.client.create_bucket(Bucket=BUCKET)
+        yield backend
+
+
+def spy(monkeypatch, backend, method, before=None):
+    """Record the keyword arguments of every call to a boto3 client method"""
+    calls = []
+    original = getattr(backend.client, method)
+
+    def wrapper(**kwargs):
+        calls.append(kwargs)
+        if before is not None:
+            before(kwargs)
+        return original(**kwargs)
+
+    monkeypatch.setattr(backend.client, method, wrapper)
+    return calls
+
+
+def open_uploads(backend) -> list:
+    return backend.client.list_multipart_uploads(Bucket=BUCKET).get("Uploads", [])
+
+
+def write_file(path, size: int) -> bytes:
+    data = os.urandom(size)
+    path.write_bytes(data)
+    return data
+
+
+def test_put_file_small_file_is_one_request(s3, tmp_path, monkeypatch):
+    starts = spy(monkeypatch, s3, "create_multipart_upload")
+    data = write_file(tmp_path / "a.pdf", 1024)
+    run(s3.put_file("2026/01/27/a.pdf", tmp_path / "a.pdf", "application/pdf"))
+    assert starts == []
+    assert run(s3.get("2026/01/27/a.pdf")) == data
+    assert not (tmp_path / "a.pdf").exists()
+
+
+def test_put_multipart_part_sizes(s3, tmp_path, monkeypatch):
+    parts = spy(monkeypatch, s3, "upload_part")
+    data = write_file(tmp_path / "a.zip", 2 * PART + 100)
+    run(s3.put_file("bulk_zips/a.zip", tmp_path / "a.zip", "application/zip"))
+    sizes = {call["PartNumber"]: len(call["Body"]) for call in parts}
+    assert sizes == {1: PART, 2: PART, 3: 100}
+    assert run(s3.get("bulk_zips/a.zip")) == data
+    assert not (tmp_path / "a.zip").exists()
+    assert open_uploads(s3) == []
+
+
+def test_put_multipart_grows_parts_past_the_part_limit(s3, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "MULTIPART_MAX_PARTS", 2)
+    parts = spy(monkeypatch, s3, "upload_part")
+    data = write_file(tmp_path / "a.zip", 3 * PART)
+    run(s3.put_file("bulk_zips/a.zip", tmp_path / "a.zip"))
+    assert sorted(len(call["Body"]) for call in parts) == [PART + PART // 2] * 2
+    assert run(s3.get("bulk_zips/a.zip")) == data
+
+
+def test_put_multipart_completes_parts_in_order(s3, tmp_path, monkeypatch):
+    # Part 1 finishes last, so the ETags come back out of order
+    spy(monkeypatch, s3, "upload_part", before=lambda call: call["PartNumber"] == 1 and time.sleep(0.3))
+    completions = spy(monkeypatch, s3, "complete_multipart_upload")
+    data = write_file(tmp_path / "a.zip", 3 * PART)
+    run(s3.put_file("bulk_zips/a.zip", tmp_path / "a.zip"))
+    parts = completions[0]["MultipartUpload"]["Parts"]
+    assert [part["PartNumber"] for part in parts] == [1, 2, 3]
+    assert run(s3.get("bulk_zips/a.zip")) == data
+
+
+def test_put_multipart_aborts_on_failed_part(s3, tmp_path, monkeypatch):
+    def fail_part_two(call):
+        if call["PartNumber"] == 2:
+            raise s3.client.exceptions.ClientError({"Error": {"Code": "InternalError"}}, "UploadPart")
+
+    spy(monkeypatch, s3, "upload_part", before=fail_part_two)
+    aborts = spy(monkeypatch, s3, "abort_multipart_upload")
+    write_file(tmp_path / "a.zip", 3 * PART)
+    with pytest.raises(StorageError):
+        run(s3.put_file("bulk_zips/a.zip", tmp_path / "a.zip"))
+    assert len(aborts) == 1
+    assert open_uploads(s3) == []
+    assert not run(s3.exists("bulk_zips/a.zip"))
+
+
+def record_failing_parts(monkeypatch, backend) -> list:
+    """Part 1 is slow, part 2 fails; returns the order in which parts finish and the upload is aborted"""
+    events = []
+    upload_part = backend.client.upload_part
+    abort_multipart_upload = backend.client.abort_multipart_upload
+
+    def slow_or_failing_part(**kwargs):
+        if kwargs["PartNumber"] == 2:
+            raise backend.client.exceptions.ClientError({"Error": {"Code": "InternalError"}}, "UploadPart")
+        if kwargs["PartNumber"] == 1:
+            time.sleep(0.5)
+        result = upload_part(**kwargs)
+        events.append(f"part {kwargs['PartNumber']}")
+        return result
+
+    def abort(**kwargs):
+        events.append("abort")
+        return abort_multipart_upload(**kwargs)
+
+    monkeypatch.setattr(backend.client, "upload_part", slow_or_failing_part)
+    monkeypatch.setattr(backend.client, "abort_multipart_upload", abort)
+    return events
+
+
+def test_put_multipart_waits_for_parts_in_flight_before_aborting(s3, tmp_path, monkeypatch):
+    events = record_failing_parts(monkeypatch, s3)
+    write_file(tmp_path / "a.zip", 2 * PART)
+    with pytest.raises(StorageError):
+        run(s3.put_file("bulk_zips/a.zip", tmp_path / "a.zip"))
+    assert events == ["part 1", "abort"]
+    assert open_uploads(s3) == []
+
+
+def test_streaming_upload_failed_part_waits_for_parts_in_flight(s3, monkeypatch):
+    events = record_failing_parts(monkeypatch, s3)
+
+    async def upload():
+        upload = s3.open_upload("bulk_zips/a.zip", "application/zip")
+        await upload.write_part(os.urandom(PART))
+        await upload.write_part(os.urandom(PART))
+        await upload.complete()
+
+    with pytest.raises(StorageError):
+        run(upload())
+    assert events == ["part 1", "abort"]
+    assert open_uploads(s3) == []
+    assert not run(s3.exists("bulk_zips/a.zip"))
+
+
+def test_streaming_upload(s3, monkeypatch):
+    parts = spy(monkeypatch, s3, "upload_part")
+    chunks = [os.urandom(PART), os.urandom(PART), os.urandom(10)]
+
+    async def upload():
+        upload = s3.open_upload("bulk_zips/a.zip", "application/zip")
+        for chunk in chunks:
+            await upload.write_part(chunk)
+        await upload.complete()
+
+    run(upload())
+    assert sorted(call["PartNumber"] for call in parts) == [1, 2, 3]
+    assert run(s3.get("bulk_zips/a.zip")) == b"".join(chunks)
+    assert open_uploads(s3) == []
+
+
+def test_streaming_upload_part_size_grows(s3, monkeypatch):
+    monkeypatch.setattr(storage, "MULTIPART_GROWTH_PARTS", 2)
+    upload = s3.open_upload("bulk_zips/a.zip")
+    sizes = []
+    for count in range(5):
+        upload._part_count = count
+        sizes.append(upload.part_size)
+    assert sizes == [PART, PART, 2 * PART, 2 * PART, 3 * PART]
+
+
+def test_streaming_upload_abort(s3):
+    async def upload():
+        upload = s3.open_upload("bulk_zips/a.zip")
+        await upload.write_part(os.urandom(PART))
+        await upload.abort()
+
+    run(upload())
+    assert open_uploads(s3) == []
+    assert not run(s3.exists("bulk_zips/a.zip"))
+
+
+def test_streaming_upload_with_no_parts_stores_empty_file(s3):
+    run(s3.open_upload("bulk_zips/empty.zip").complete())
+    assert run(s3.get("bulk_zips/empty.zip")) == b""
+
+
+def test_delete_is_batched(s3, monkeypatch):
+    paths = [f"2026/01/27/{number}.pdf" for number in range(2500)]
+    for path in paths:
+        s3.client.put_object(Bucket=BUCKET, Key=path, Body=b"x")
+    deletes = spy(monkeypatch, s3, "delete_objects")
+    # Duplicates are sent once
+    run(s3.delete(paths + paths[:10]))
+    assert [len(call["Delete"]["Objects"]) for call in deletes] == [1000, 1000, 500]
+    assert s3.client.list_objects_v2(Bucket=BUCKET)["KeyCount"] == 0
+
+
+def test_delete_reports_errors(s3, monkeypatch):
+    monkeypatch.setattr(s3.client, "delete_objects", lambda **kwargs: {
+        "Errors": [{"Key": "a.pdf", "Code": "AccessDenied", "Message": "Access Denied"}]
+    })
+    with pytest.raises(StorageError, match="a.pdf"):
+        run(s3.delete(["a.pdf"]))
+
+
+@pytest.mark.parametrize("addressing_style", ["virtual", "path"])
+@pytest.mark.parametrize("path", ["2026/01/27/NH-2026-00001.pdf", "2026/01/27/a b+c.pdf", f"{BUCKET}/nested.pdf"])
+def test_path_from_url_round_trip(addressing_style, path):
+    with mock_aws():
+        backend = S3StorageBackend(BUCKET, "AK", "SK", region="us-east-1", addressing_style=addressing_style)
+        url = run(backend.urls([path]))[path]
+        host = url.split("/")[2]
+        if addressing_style == "virtual":
+            assert host.startswith(f"{BUCKET}.")
+        else:
+            assert not host.startswith(f"{BUCKET}.")
+        assert backend.path_from_url(url) == path
+
+
+def test_path_from_url_with_custom_endpoint():
+    with mock_aws():
+        backend = S3StorageBackend(
+            BUCKET, "AK", "SK", endpoint="http://localhost:9000", addressing_style="path"
+        )
+        assert backend.path_from_url(f"http://localhost:9000/{BUCKET}/2026/a.pdf?X-Amz-Signature=x") == "2026/a.pdf"
+        assert backend.path_from_url("http://localhost:9000/") is None
@@ -0,0 +1,69 @@
+"""Statistics counters (services/stats.py) and the admin revoke/restore endpoints, on SQLite"""
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from database import async_session
+from db_models import Certificate, StatCounter, User
+from routers.admin import RevokeCertificateRequest, restore_certificate, revoke_certificate
+from services.stats import CERTIFICATES_REVOKED, CERTIFICATES_TOTAL, RECONCILED_AT, stats_service
+
+
+async def add_certificate(certificate_id: str):
+    async with async_session() as db:
+        db.add(Certificate(certificate_id=certificate_id, certificate_data={}, status="generated"))
+        stats_service.certificates_created(db)
+        await db.commit()
+
+
+async def counter(name: str) -> int:
+    async with async_session() as db:
+        return await db.scalar(select(StatCounter.value).where(StatCounter.name == name))
+
+
+def test_reconcile_skips_when_another_process_just_ran(db_run):
+    async def test():
+        await add_certificate("NH-2026-00001")
+        first = await stats_service.reconcile(days=1, min_interval_seconds=3600)
+        assert first[CERTIFICATES_TOTAL] == 1
+        assert await counter(RECONCILED_AT) > 0
+        assert await stats_service.reconcile(days=1, min_interval_seconds=3600) is None
+        # The maintenance script always recounts
+        assert (await stats_service.reconcile(days=1))[CERTIFICATES_TOTAL] == 1
+    db_run(test)
+
+
+def test_reconcile_keeps_increments_counted_after_it(db_run):
+    async def test():
+        await add_certificate("NH-2026-00001")
+        await stats_service.reconcile(days=1)
+        await add_certificate("NH-2026-00002")
+        assert await counter(CERTIFICATES_TOTAL) == 2
+    db_run(test)
+
+
+def test_revoke_counts_once_and_restore_undoes_it(db_run):
+    async def test():
+        await add_certificate("NH-2026-00001")
+        admin = User(id=uuid.uuid4())
+        async with async_session() as db:
+            await revoke_certificate("NH-2026-00001", RevokeCertificateRequest(reason="typo"), db, admin)
+        async with async_session() as db:
+            with pytest.raises(HTTPException) as error:
+                await revoke_certificate("NH-2026-00001", RevokeCertificateRequest(), db, admin)
+            assert error.value.status_code == 400
+        assert await counter(CERTIFICATES_REVOKED) == 1
+
+        async with async_session() as db:
+            await restore_certificate("NH-2026-00001", db, admin)
+        async with async_session() as db:
+            with pytest.raises(HTTPException) as error:
+                await restore_certificate("NH-2026-00001", db, admin)
+            assert error.value.status_code == 400
+            with pytest.raises(HTTPException) as error:
+                await revoke_certificate("NH-2026-99999", RevokeCertificateRequest(), db, admin)
+            assert error.value.status_code == 404
+        assert await counter(CERTIFICATES_REVOKED) == 0
+    db_run(test)
@@ -0,0 +1,248 @@
+"""Storage backends (services/storage.py): memory and local backends, retries"""
+import asyncio
+
+import httpx
+import pytest
+
+from services import storage
+from services.storage import (
+    LocalStorageBackend,
+    MemoryStorageBackend,
+    StorageBackend,
+    StorageError,
+    StorageFileNotFound,
+    StorageTransientError,
+    SupabaseStorageBackend,
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def memory():
+    return MemoryStorageBackend(concurrency=2, retries=0)
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalStorageBackend(str(tmp_path / "files"), concurrency=2, retries=0)
+
+
+def test_base_backend_is_abstract():
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+
+def test_memory_put_get_exists(memory):
+    run(memory.put("2026/01/27/NH-2026-00001.pdf", b"%PDF", "application/pdf"))
+    assert run(memory.get("2026/01/27/NH-2026-00001.pdf")) == b"%PDF"
+    assert run(memory.exists("2026/01/27/NH-2026-00001.pdf"))
+    assert not run(memory.exists("2026/01/27/NH-2026-00002.pdf"))
+    assert memory.files["2026/01/27/NH-2026-00001.pdf"][1] == "application/pdf"
+
+
+def test_memory_get_missing_raises(memory):
+    with pytest.raises(StorageFileNotFound):
+        run(memory.get("missing.pdf"))
+    # Callers that only know the builtin still catch it
+    with pytest.raises(FileNotFoundError):
+        run(memory.get("missing.pdf"))
+
+
+def test_memory_delete_ignores_missing(memory):
+    run(memory.put("a.pdf", b"a"))
+    run(memory.put("b.pdf", b"b"))
+    run(memory.delete(["a.pdf", "missing.pdf"]))
+    assert not run(memory.exists("a.pdf"))
+    assert run(memory.exists("b.pdf"))
+
+
+def test_memory_urls_round_trip(memory):
+    paths = ["2026/01/27/a.pdf", "2026/01/27/b.png"]
+    urls = run(memory.urls(paths))
+    assert set(urls) == set(paths)
+    assert [memory.path_from_url(urls[path]) for path in paths] == paths
+    assert memory.path_from_url("https://example.com/a.pdf") is None
+
+
+def test_spooled_upload_stores_on_complete(memory):
+    async def upload():
+        upload = memory.open_upload("bulk_zips/a.zip", "application/zip")
+        await upload.write_part(b"one")
+        await upload.write_part(b"two")
+        local_path = upload.local_path
+        await upload.complete()
+        return local_path
+    local_path = run(upload())
+    assert run(memory.get("bulk_zips/a.zip")) == b"onetwo"
+    assert not local_path.exists()
+
+
+def test_spooled_upload_abort_leaves_nothing(memory):
+    async def upload():
+        upload = memory.open_upload("bulk_zips/a.zip")
+        await upload.write_part(b"one")
+        await upload.abort()
+        return upload.local_path
+    local_path = run(upload())
+    assert not run(memory.exists("bulk_zips/a.zip"))
+    assert not local_path.exists()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff delays instead of sleeping; jitter fixed at its maximum"""
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(storage.asyncio, "sleep", sleep)
+    monkeypatch.setattr(storage.random, "uniform", lambda low, high: high)
+    return delays
+
+
+def flaky(failures: int, error: Exception = None):
+    """A request that fails `failures` times before returning "ok"; counts its attempts"""
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        if len(attempts) <= failures:
+            raise error or StorageTransientError("503")
+        return "ok"
+
+    return request, attempts
+
+
+def test_call_retries_transient_errors_with_backoff(sleeps):
+    backend = MemoryStorageBackend(retries=3, backoff_seconds=0.5)
+    request, attempts = flaky(2)
+    assert run(backend._call("read a.pdf", request)) == "ok"
+    assert len(attempts) == 3
+    assert sleeps == [0.5, 1.0]
+
+
+def test_call_gives_up_after_retries(sleeps):
+    backend = MemoryStorageBackend(retries=2, backoff_seconds=0.5)
+    request, attempts = flaky(5)
+    with pytest.raises(StorageTransientError):
+        run(backend._call("read a.pdf", request))
+    assert len(attempts) == 3
+    assert sleeps == [0.5, 1.0]
+
+
+def test_call_does_not_retry_other_errors(sleeps):
+    backend = MemoryStorageBackend(retries=3, backoff_seconds=0.5)
+    request, attempts = flaky(1, StorageFileNotFound("a.pdf"))
+    with pytest.raises(StorageFileNotFound):
+        run(backend._call("read a.pdf", request))
+    assert len(attempts) == 1
+    assert sleeps == []
+
+
+def test_call_backoff_jitter_stays_within_half_to_full_delay(monkeypatch):
+    backend = MemoryStorageBackend(retries=1, backoff_seconds=2.0)
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(storage.asyncio, "sleep", sleep)
+    monkeypatch.setattr(storage.random, "uniform", lambda low, high: low)
+    request, _ = flaky(1)
+    run(backend._call("read a.pdf", request))
+    assert delays == [1.0]
+
+
+def test_call_limits_concurrent_requests():
+    backend = MemoryStorageBackend(concurrency=2)
+    running = []
+    peak = []
+
+    async def request():
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    async def many():
+        await asyncio.gather(*[backend._call("write", request) for _ in range(6)])
+
+    run(many())
+    assert max(peak) == 2
+
+
+def test_local_put_get_delete(local):
+    run(local.put("2026/01/27/a.pdf", b"%PDF"))
+    assert (local.root / "2026/01/27/a.pdf").read_bytes() == b"%PDF"
+    assert run(local.get("2026/01/27/a.pdf")) == b"%PDF"
+    run(local.delete(["2026/01/27/a.pdf", "2026/01/27/missing.pdf"]))
+    assert not run(local.exists("2026/01/27/a.pdf"))
+    with pytest.raises(StorageFileNotFound):
+        run(local.get("2026/01/27/a.pdf"))
+
+
+def test_local_urls_round_trip(local):
+    urls = run(local.urls(["2026/01/27/a b.pdf"]))
+    assert urls == {"2026/01/27/a b.pdf": "/downloads/2026/01/27/a b.pdf"}
+    assert local.path_from_url("http://localhost:8000/downloads/2026/01/27/a%20b.pdf") == "2026/01/27/a b.pdf"
+    assert local.path_from_url("https://example.com/a.pdf") is None
+
+
+def test_local_put_file_moves_file(local, tmp_path):
+    source = tmp_path / "spool.zip"
+    source.write_bytes(b"zip")
+    run(local.put_file("bulk_zips/a.zip", source))
+    assert not source.exists()
+    assert run(local.get("bulk_zips/a.zip")) == b"zip"
+
+
+@pytest.mark.parametrize("path", ["../outside.pdf", "2026/../../outside.pdf", "/etc/passwd"])
+def test_local_rejects_paths_outside_root(local, path):
+    with pytest.raises(StorageError):
+        run(local.put(path, b"x"))
+    with pytest.raises(StorageError):
+        run(local.get(path))
+    with pytest.raises(StorageError):
+        run(local.delete([path]))
+    assert not (local.root.parent / "outside.pdf").exists()
+
+
+def test_local_rejects_symlink_out_of_root(local, tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (local.root / "link").symlink_to(outside)
+    with pytest.raises(StorageError):
+        run(local.put("link/a.pdf", b"x"))
+    assert not (outside / "a.pdf").exists()
+
+
+def supabase_with(monkeypatch, handler):
+    """Supabase backend whose requests go to handler (an httpx.MockTransport handler)"""
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(storage, "get_http_client", lambda: client)
+    return SupabaseStorageBackend("https://project.supabase.co", "key", "certificates", retries=2, backoff_seconds=0)
+
+
+def test_supabase_put_retry_after_lost_response_succeeds(monkeypatch):
+    stored = {}
+
+    def handler(request):
+        if request.url.path in stored:
+            return httpx.Response(400, json={"statusCode": "409", "error": "Duplicate"})
+        # Stored, but the response never reaches the client
+        stored[request.url.path] = request.content
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    backend = supabase_with(monkeypatch, handler)
+    run(backend.put("2026/01/27/a.pdf", b"%PDF", "application/pdf"))
+    assert list(stored.values()) == [b"%PDF"]
+
+
+def test_supabase_put_of_an_existing_file_still_fails(monkeypatch):
+    backend = supabase_with(monkeypatch, lambda request: httpx.Response(409, json={"error": "Duplicate"}))
+    with pytest.raises(StorageError):
+        run(backend.put("2026/01/27/a.pdf", b"%PDF", "application/pdf"))
@@ -0,0 +1,44 @@
+"""Per-template caches are keyed by content, so edits need no invalidation (services/certificate_service.py)"""
+from services.certificate_service import CompiledTemplateCache, RenderingService
+
+PAGE = '<html><head><style>{css}</style></head><body><p>{body} {{{{ student_name }}}}</p></body></html>'
+DATA = {'student_name': 'Ada'}
+
+
+def test_edited_template_is_rendered_without_invalidation():
+    rendering = RenderingService()
+    before = rendering.render_document(PAGE.format(css="p { color: red }", body="Hello"), DATA, template_id="t1")
+    after = rendering.render_document(PAGE.format(css="p { color: red }", body="Welcome"), DATA, template_id="t1")
+    assert "Hello Ada" in before.html
+    assert "Welcome Ada" in after.html
+    assert before.stylesheet_key != after.stylesheet_key
+
+
+def test_edited_styles_get_a_new_stylesheet_key():
+    rendering = RenderingService()
+    before = rendering.render_document(PAGE.format(css="p { color: red }", body="Hi"), DATA, template_id="t1")
+    after = rendering.render_document(PAGE.format(css="p { color: blue }", body="Hi"), DATA, template_id="t1")
+    assert before.css == "p { color: red }"
+    assert after.css == "p { color: blue }"
+    assert before.stylesheet_key != after.stylesheet_key
+
+
+def test_edited_css_content_gets_a_new_stylesheet_key():
+    rendering = RenderingService()
+    html_content = '<html><body><p>{{ student_name }}</p></body></html>'
+    before = rendering.render_document(html_content, DATA, template_id="t1", css_content="p { color: red }")
+    after = rendering.render_document(html_content, DATA, template_id="t1", css_content="p { color: blue }")
+    assert before.stylesheet_key != after.stylesheet_key
+    # Layered renders key their static layer on the stylesheet too
+    layered_before = rendering.render_document(html_content, DATA, "t1", "p { color: red }", layered=True)
+    layered_after = rendering.render_document(html_content, DATA, "t1", "p { color: blue }", layered=True)
+    assert layered_before.layer_key != layered_after.layer_key
+
+
+def test_old_versions_age_out():
+    cache = CompiledTemplateCache(max_size=2)
+    for version in range(3):
+        cache.get_or_create(("t1", str(version)), lambda: version)
+    assert cache.get(("t1", "0")) is None
+    assert cache.get(("t1", "2")) == 2
+    assert cache.stats()["evictions"] == 1
@@ -18,6 +18,7 @@ CREATE TABLE users (
 
 CREATE INDEX idx_users_email ON users(email) WHERE email IS NOT NULL;
 CREATE INDEX idx_users_phone ON users(phone) WHERE phone IS NOT NULL;
+CREATE INDEX idx_users_created ON users(created_at, id);  -- Keyset pagination (newest first)
 
 -- ============================================
 -- OTP SESSIONS TABLE
@@ -49,6 +50,7 @@ CREATE TABLE templates (
     html_content    TEXT NOT NULL,
     css_content     TEXT,
     thumbnail_url   VARCHAR(500),
+    render_mode     VARCHAR(20) DEFAULT 'standard',  -- 'standard' or 'layered'
     is_active       BOOLEAN DEFAULT TRUE,
     created_by      UUID REFERENCES users(id),
     created_at      TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
@@ -69,6 +71,15 @@ CREATE TABLE certificates (
     -- Certificate data (stored as JSONB for flexibility)
     certificate_data    JSONB NOT NULL,
     
+    -- Searchable copies of certificate_data fields
+    student_name        VARCHAR(255),
+    course_name         VARCHAR(255),
+    issue_date          VARCHAR(20),  -- YYYY-MM-DD
+    search_vector       tsvector GENERATED ALWAYS AS (
+                            setweight(to_tsvector('simple', coalesce(student_name, '')), 'A') ||
+                            setweight(to_tsvector('simple', coalesce(course_name, '')), 'B')
+                        ) STORED,
+    
     -- Generated file paths
     pdf_path            VARCHAR(500),
     png_path            VARCHAR(500),
@@ -81,8 +92,38 @@ CREATE TABLE certificates (
 );
 
 CREATE UNIQUE INDEX idx_certificates_cert_id ON certificates(certificate_id);
-CREATE INDEX idx_certificates_user ON certificates(user_id);
+CREATE INDEX idx_certificates_user_created ON certificates(user_id, created_at DESC, id DESC);  -- History pages, per-user counts
 CREATE INDEX idx_certificates_status ON certificates(status);
+CREATE INDEX idx_certificates_created ON certificates(created_at, id);  -- Keyset pagination (newest first)
+CREATE INDEX idx_certificates_issue_date ON certificates(issue_date);
+CREATE INDEX idx_certificates_search ON certificates USING GIN (search_vector);  -- Full-text search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX idx_certificates_student_trgm ON certificates USING GIN (student_name gin_trgm_ops);  -- Name substring search
+
+-- ============================================
+-- CERTIFICATE ID COUNTERS (sequential NH-YYYY-NNNNN IDs)
+-- ============================================
+CREATE TABLE certificate_id_counters (
+    year                INTEGER PRIMARY KEY,
+    next_value          INTEGER NOT NULL DEFAULT 1  -- Next unallocated number of the year
+);
+
+-- ============================================
+-- STATISTICS (maintained on every change, reconciled periodically)
+-- ============================================
+CREATE TABLE stat_counters (
+    name                VARCHAR(50) PRIMARY KEY,  -- certificates_total, certificates_revoked, users_total
+    value               BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE daily_certificate_stats (
+    day                 DATE NOT NULL,  -- UTC day of generation
+    dimension           VARCHAR(20) NOT NULL CHECK (dimension IN ('template', 'user')),
+    subject_id          VARCHAR(36) NOT NULL,  -- Template or user UUID
+    count               INTEGER NOT NULL DEFAULT 0,
+    
+    PRIMARY KEY (day, dimension, subject_id)
+);
 
 -- ============================================
 -- RATE LIMITING TABLE (for OTP)
@@ -98,3 +139,53 @@ CREATE TABLE rate_limits (
 );
 
 CREATE INDEX idx_rate_limits_lookup ON rate_limits(identifier, action_type, window_start);
+
+-- ============================================
+-- BULK JOBS TABLES (background bulk generation)
+-- ============================================
+CREATE TABLE bulk_jobs (
+    id                  UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id             UUID REFERENCES users(id) ON DELETE SET NULL,
+    template_id         UUID NOT NULL REFERENCES templates(id) ON DELETE CASCADE,
+    status              VARCHAR(20) DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    output_formats      JSONB NOT NULL,
+    options             JSONB DEFAULT '{}',     -- combined_pdf, combined_pdf_nup
+    
+    -- Progress counters
+    total               INTEGER DEFAULT 0,
+    processed           INTEGER DEFAULT 0,
+    successful          INTEGER DEFAULT 0,
+    failed              INTEGER DEFAULT 0,
+    input_complete      BOOLEAN DEFAULT TRUE,   -- FALSE while rows are still arriving
+    
+    -- Results
+    zip_url             VARCHAR(500),
+    combined_pdf_url    VARCHAR(500),
+    error               TEXT,
+    
+    -- Worker claim (a stale heartbeat lets another worker resume the job)
+    claimed_by          VARCHAR(100),
+    heartbeat_at        TIMESTAMP WITH TIME ZONE,
+    
+    created_at          TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    started_at          TIMESTAMP WITH TIME ZONE,
+    completed_at        TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX idx_bulk_jobs_status ON bulk_jobs(status, created_at);
+CREATE INDEX idx_bulk_jobs_user ON bulk_jobs(user_id);
+
+CREATE TABLE bulk_job_items (
+    id                  BIGSERIAL PRIMARY KEY,
+    job_id              UUID NOT NULL REFERENCES bulk_jobs(id) ON DELETE CASCADE,
+    row_index           INTEGER NOT NULL,
+    line_number         INTEGER,                -- CSV or NDJSON line, for error reports
+    certificate_id      VARCHAR(50),
+    certificate_data    JSONB NOT NULL,
+    status              VARCHAR(20) DEFAULT 'pending' CHECK (status IN ('pending', 'done', 'failed')),
+    error               TEXT,
+    download_urls       JSONB
+);
+
+CREATE UNIQUE INDEX idx_bulk_job_items_row ON bulk_job_items(job_id, row_index);
+CREATE INDEX idx_bulk_job_items_status ON bulk_job_items(job_id, status);
@@ -178,8 +178,8 @@ export const certificatesAPI = {
         return response.json();
     },
 
-    getHistory: async () => {
-        return request('/certificate/history');
+    getHistory: async (cursor = null) => {
+        return request(cursor ? `/certificate/history?cursor=${encodeURIComponent(cursor)}` : '/certificate/history');
     },
 
     preview: async (templateId, certificateData, elementPositions = [], elementStyles = []) => {
@@ -213,11 +213,13 @@ export const adminAPI = {
     getStats: async () => {
         return request('/admin/stats');
     },
-    getCertificates: async (page = 1, limit = 20) => {
-        return request(`/admin/certificates?page=${page}&limit=${limit}`);
+    getCertificates: async (cursor = null, limit = 20) => {
+        const query = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+        return request(`/admin/certificates?limit=${limit}${query}`);
     },
-    getUsers: async (page = 1, limit = 20) => {
-        return request(`/admin/users?page=${page}&limit=${limit}`);
+    getUsers: async (cursor = null, limit = 20) => {
+        const query = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+        return request(`/admin/users?limit=${limit}${query}`);
     },
     revokeCertificate: async (id, reason) => {
         return request(`/admin/certificates/${id}/revoke`, {
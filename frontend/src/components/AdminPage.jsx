@@ -11,6 +11,8 @@ export default function AdminPage() {
     const [activeTab, setActiveTab] = useState('certificates');
     const [page, setPage] = useState(1);
     const [totalPages, setTotalPages] = useState(1);
+    // cursors[i] fetches page i + 1; the next page's cursor is stored once a page loads
+    const [cursors, setCursors] = useState([null]);
     const [revokeModal, setRevokeModal] = useState(null);
     const [revokeReason, setRevokeReason] = useState('');
 
@@ -33,12 +35,17 @@ export default function AdminPage() {
         }
     };
 
+    const setPageCursor = (nextCursor) => {
+        setCursors(previous => [...previous.slice(0, page), nextCursor]);
+    };
+
     const fetchCertificates = async () => {
         setLoading(true);
         try {
-            const data = await adminAPI.getCertificates(page, 20);
+            const data = await adminAPI.getCertificates(cursors[page - 1], 20);
             setCertificates(data.certificates);
-            setTotalPages(data.pages);
+            setPageCursor(data.next_cursor);
+            setTotalPages(Math.max(1, Math.ceil((data.total || 0) / 20)));
         } catch (err) {
             if (err.status === 403) setIsForbidden(true);
             setError(err.message);
@@ -50,9 +57,10 @@ export default function AdminPage() {
     const fetchUsers = async () => {
         setLoading(true);
         try {
-            const data = await adminAPI.getUsers(page, 20);
+            const data = await adminAPI.getUsers(cursors[page - 1], 20);
             setUsers(data.users);
-            setTotalPages(Math.ceil(data.total / 20));
+            setPageCursor(data.next_cursor);
+            setTotalPages(Math.max(1, Math.ceil((data.total || 0) / 20)));
         } catch (err) {
             if (err.status === 403) setIsForbidden(true);
             setError(err.message);
@@ -128,10 +136,10 @@ export default function AdminPage() {
             {/* Content Tabs */}
             <div className="card-premium overflow-hidden">
                 <div className="flex border-b border-gray-100 dark:border-gray-800">
-                    <button onClick={() => { setActiveTab('certificates'); setPage(1); }} className={`flex-1 py-4 text-sm font-bold transition-colors ${activeTab === 'certificates' ? 'text-primary-600 border-b-2 border-primary-600 bg-primary-50/30' : 'text-gray-500 hover:text-gray-700 dark:hover:text-gray-300'}`}>
+                    <button onClick={() => { setActiveTab('certificates'); setPage(1); setCursors([null]); }} className={`flex-1 py-4 text-sm font-bold transition-colors ${activeTab === 'certificates' ? 'text-primary-600 border-b-2 border-primary-600 bg-primary-50/30' : 'text-gray-500 hover:text-gray-700 dark:hover:text-gray-300'}`}>
                         Certificates
                     </button>
-                    <button onClick={() => { setActiveTab('users'); setPage(1); }} className={`flex-1 py-4 text-sm font-bold transition-colors ${activeTab === 'users' ? 'text-primary-600 border-b-2 border-primary-600 bg-primary-50/30' : 'text-gray-500 hover:text-gray-700 dark:hover:text-gray-300'}`}>
+                    <button onClick={() => { setActiveTab('users'); setPage(1); setCursors([null]); }} className={`flex-1 py-4 text-sm font-bold transition-colors ${activeTab === 'users' ? 'text-primary-600 border-b-2 border-primary-600 bg-primary-50/30' : 'text-gray-500 hover:text-gray-700 dark:hover:text-gray-300'}`}>
                         Users
                     </button>
                 </div>
@@ -207,11 +215,11 @@ export default function AdminPage() {
                 </div>
 
                 {/* Pagination */}
-                {totalPages > 1 && (
+                {(page > 1 || cursors[page]) && (
                     <div className="p-4 border-t border-gray-100 dark:border-gray-800 flex justify-between items-center text-sm">
                         <button disabled={page === 1} onClick={() => setPage(p => p - 1)} className="btn-secondary !py-1 flex items-center gap-1">← Prev</button>
                         <span className="text-gray-500 font-medium tracking-widest">Page {page} of {totalPages}</span>
-                        <button disabled={page === totalPages} onClick={() => setPage(p => p + 1)} className="btn-secondary !py-1 flex items-center gap-1">Next →</button>
+                        <button disabled={!cursors[page]} onClick={() => setPage(p => p + 1)} className="btn-secondary !py-1 flex items-center gap-1">Next →</button>
                     </div>
                 )}
             </div>
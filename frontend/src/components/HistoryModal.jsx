@@ -5,6 +5,8 @@ const HistoryModal = ({ isOpen, onClose }) => {
     const [history, setHistory] = useState([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
 
     useEffect(() => {
         if (isOpen) {
@@ -18,6 +20,7 @@ const HistoryModal = ({ isOpen, onClose }) => {
         try {
             const data = await certificatesAPI.getHistory();
             setHistory(data.certificates);
+            setNextCursor(data.next_cursor);
         } catch (err) {
             console.error('Failed to fetch history:', err);
             setError('Failed to load history. Please try again.');
@@ -26,6 +29,20 @@ const HistoryModal = ({ isOpen, onClose }) => {
         }
     };
 
+    const fetchMore = async () => {
+        setLoadingMore(true);
+        try {
+            const data = await certificatesAPI.getHistory(nextCursor);
+            setHistory((previous) => [...previous, ...data.certificates]);
+            setNextCursor(data.next_cursor);
+        } catch (err) {
+            console.error('Failed to fetch history:', err);
+            setError('Failed to load history. Please try again.');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     if (!isOpen) return null;
 
     return (
@@ -115,6 +132,17 @@ const HistoryModal = ({ isOpen, onClose }) => {
                                     ))}
                                 </tbody>
                             </table>
+                            {nextCursor && (
+                                <div className="flex justify-center pt-6">
+                                    <button
+                                        onClick={fetchMore}
+                                        disabled={loadingMore}
+                                        className="px-6 py-2 text-sm font-medium text-primary-600 dark:text-primary-400 hover:underline disabled:opacity-50"
+                                    >
+                                        {loadingMore ? 'Loading...' : 'Load more'}
+                                    </button>
+                                </div>
+                            )}
                         </div>
                     )}
                 </div>